@@ -0,0 +1,29 @@
+-- Bulk assessment import.
+-- POST /api/assessments/submit/batch writes each chunk of scored submissions
+-- with one import_assessments() call, so a submission's user_assessments row
+-- and its responses are saved together or not at all: a failed chunk can be
+-- re-imported without creating duplicates. Row ids come from the backend,
+-- which is how it matches each saved row to the uploaded line.
+-- Requires assessments_schema.sql.
+
+-- submissions: [{"id": uuid, "user_id": uuid, "assessment_id": uuid,
+--   "total_score": number, "risk_level": text, "completed_at": timestamptz|null,
+--   "responses": [{"question_id": uuid, "value": number|null, "text": text|null}]}]
+create or replace function import_assessments(submissions jsonb)
+returns void as $$
+  insert into user_assessments (id, user_id, assessment_id, total_score, risk_level, completed_at)
+  select s.id, s.user_id, s.assessment_id, s.total_score, s.risk_level,
+         coalesce(s.completed_at, timezone('utc'::text, now()))
+  from jsonb_to_recordset(submissions) as s(
+    id uuid, user_id uuid, assessment_id uuid, total_score numeric, risk_level text, completed_at timestamptz
+  );
+
+  insert into user_assessment_responses (user_assessment_id, question_id, response_value, response_text)
+  select s.id, r.question_id, r.value, r.text
+  from jsonb_to_recordset(submissions) as s(id uuid, responses jsonb)
+  cross join lateral jsonb_to_recordset(s.responses) as r(question_id uuid, value numeric, text text);
+$$ language sql;
+
+-- Imports write rows for many students, so only the service role may call it
+revoke all on function import_assessments(jsonb) from public, anon, authenticated;
+grant execute on function import_assessments(jsonb) to service_role;
@@ -0,0 +1,258 @@
+# backend/activity_buffer.py
+# Write-behind buffer for user_activities.
+# Requests enqueue activity rows and return; a flusher thread coalesces them
+# into multi-row inserts once ACTIVITY_FLUSH_SIZE rows are waiting or every
+# ACTIVITY_FLUSH_INTERVAL seconds. Rows that can't be written right now are
+# spilled to a local journal file (rows only, never tokens) and replayed with
+# the service client, in ACTIVITY_FLUSH_SIZE chunks, once Supabase accepts
+# writes again. Rows the database rejects outright are logged and dropped.
+# Buffering needs the service client, since nothing else can write the rows
+# later; without it each row is written during the request with the caller's
+# token, and a failed write is reported to the caller.
+import os
+import logging
+import json
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows runs a single waitress process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_FLUSH_SIZE = int(os.environ.get("ACTIVITY_FLUSH_SIZE", "100"))
+ACTIVITY_FLUSH_INTERVAL = float(os.environ.get("ACTIVITY_FLUSH_INTERVAL", "2"))
+# Backpressure: callers wait up to ACTIVITY_ENQUEUE_TIMEOUT once this many rows are pending
+ACTIVITY_MAX_PENDING = int(os.environ.get("ACTIVITY_MAX_PENDING", "10000"))
+ACTIVITY_ENQUEUE_TIMEOUT = float(os.environ.get("ACTIVITY_ENQUEUE_TIMEOUT", "0.5"))
+ACTIVITY_JOURNAL_PATH = os.environ.get(
+    "ACTIVITY_JOURNAL_PATH", os.path.join(os.path.dirname(__file__), "activity_journal.jsonl")
+)
+# Journal entries are dropped after this many failed replays
+ACTIVITY_JOURNAL_MAX_ATTEMPTS = int(os.environ.get("ACTIVITY_JOURNAL_MAX_ATTEMPTS", "5"))
+# Postgres error classes worth retrying: connection, transaction rollback,
+# insufficient resources, operator intervention; PGRST000-003 are PostgREST
+# failing to reach the database
+TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57")
+TRANSIENT_POSTGREST_CODES = ("PGRST000", "PGRST001", "PGRST002", "PGRST003")
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def is_permanent(error):
+    # PostgREST answered and refused the rows (constraint, RLS, bad column...);
+    # retrying the same rows can't succeed. Network errors, 5xx and 429 can.
+    code = getattr(error, "code", None)
+    if code is None:
+        return False
+    if isinstance(code, int):
+        # No JSON body, so code is the HTTP status
+        return 400 <= code < 500 and code not in (408, 429)
+    code = str(code)
+    if code.startswith("PGRST"):
+        return code not in TRANSIENT_POSTGREST_CODES
+    return not code.startswith(TRANSIENT_SQLSTATE_CLASSES)
+
+
+class ActivityBuffer:
+    def __init__(self, client_for, service_client=None, flush_size=ACTIVITY_FLUSH_SIZE,
+                 flush_interval=ACTIVITY_FLUSH_INTERVAL, max_pending=ACTIVITY_MAX_PENDING,
+                 journal_path=ACTIVITY_JOURNAL_PATH):
+        # client_for(token) returns a user's client; used to write through when there is no service client
+        self.client_for = client_for
+        self.service_client = service_client
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.journal_path = journal_path
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.flushed = 0
+        self.spilled = 0
+        self.dropped = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="activity-flusher", daemon=True)
+                self._thread.start()
+
+    def add(self, token, row, timeout=ACTIVITY_ENQUEUE_TIMEOUT):
+        # Returns False if the row wasn't accepted: the buffer stayed full for
+        # the whole timeout, or (writing through) the insert failed
+        row = dict(row)
+        row.setdefault("created_at", now_iso())
+        if self.service_client is None:
+            return self._write_through(token, row)
+        self.start()
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._pending) < self.max_pending, timeout=timeout):
+                return False
+            self._pending.append(row)
+            if len(self._pending) >= self.flush_size:
+                self._cond.notify_all()
+        return True
+
+    def _write_through(self, token, row):
+        try:
+            self.client_for(token).table("user_activities").insert(row).execute()
+        except Exception as e:
+            logger.warning("Activity insert failed", extra={"error": str(e)})
+            return False
+        self.flushed += 1
+        return True
+
+    def pending(self):
+        return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or len(self._pending) >= self.flush_size,
+                    timeout=self.flush_interval
+                )
+                if self._closed:
+                    return
+            self.flush()
+
+    def _take(self):
+        with self._cond:
+            batch = list(self._pending)
+            self._pending.clear()
+            self._cond.notify_all()
+        return batch
+
+    def flush(self):
+        with self._flush_lock:
+            batch = self._take()
+            if not batch:
+                return 0
+
+            flushed = self.flushed
+            retry = self._write(self.service_client, batch)
+            written = self.flushed - flushed
+            if retry:
+                self._spill([(row, 0) for row in retry])
+            else:
+                self._replay_journal()
+            return written
+
+    def _write(self, client, rows):
+        # Returns the rows worth retrying later
+        try:
+            client.table("user_activities").insert(rows).execute()
+            self.flushed += len(rows)
+            return []
+        except Exception as e:
+            if not is_permanent(e):
+                logger.warning("Activity insert failed", extra={"rows": len(rows), "error": str(e)})
+                return rows
+            if len(rows) > 1:
+                # One bad row fails the whole insert; find it so the rest still land
+                retry = []
+                for row in rows:
+                    retry.extend(self._write(client, [row]))
+                return retry
+            self.dropped += 1
+            logger.error("Activity row rejected, dropping it",
+                         extra={"user_id": rows[0].get("user_id"), "error": str(e)})
+            return []
+
+    def _spill(self, entries):
+        self.spilled += len(entries)
+        fd = os.open(self.journal_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        with os.fdopen(fd, "a") as f:
+            for row, attempts in entries:
+                f.write(json.dumps({"row": row, "attempts": attempts}) + "\n")
+
+    def _replay_journal(self):
+        # Only called once a flush succeeded, i.e. Supabase is reachable again.
+        # Workers share the journal; one replays at a time, the rest skip.
+        if fcntl is None:
+            return self._replay()
+        with open(self.journal_path + ".lock", "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+            try:
+                self._replay()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _replay(self):
+        # New spills keep going to the journal while its rows are replayed from
+        # the .replay file. That file is trimmed after each chunk, and a replay
+        # interrupted by an outage or a restart resumes from it.
+        replay_path = self.journal_path + ".replay"
+        if not os.path.exists(replay_path):
+            try:
+                os.replace(self.journal_path, replay_path)
+            except OSError:
+                return
+
+        entries = []
+        with open(replay_path, "r") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+
+        retry = []
+        while entries:
+            chunk, entries = entries[:self.flush_size], entries[self.flush_size:]
+            failed = {id(row) for row in self._write(self.service_client, [e["row"] for e in chunk])}
+            retry.extend(
+                (entry["row"], entry.get("attempts", 0) + 1)
+                for entry in chunk
+                if id(entry["row"]) in failed and entry.get("attempts", 0) + 1 < ACTIVITY_JOURNAL_MAX_ATTEMPTS
+            )
+            if failed:
+                # Unreachable again: leave the rest for the next successful flush
+                break
+            self._rewrite(replay_path, entries)
+
+        if retry:
+            self._spill(retry)
+        if entries:
+            self._rewrite(replay_path, entries)
+        else:
+            os.remove(replay_path)
+
+    def _rewrite(self, path, entries):
+        tmp = path + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp, path)
+
+    def close(self):
+        # Flush whatever is still buffered; registered to run at interpreter exit
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def stats(self):
+        return {"pending": len(self._pending), "flushed": self.flushed, "spilled": self.spilled,
+                "dropped": self.dropped}
+
+
+def create_buffer(client_for, service_client=None):
+    buffer = ActivityBuffer(client_for, service_client)
+    atexit.register(buffer.close)
+    return buffer
@@ -0,0 +1,150 @@
+# backend/api_models.py
+# Typed request bodies, query strings and fixed-shape responses for app.py.
+# Decoded and validated by msgspec (see serialization.py); unknown keys are
+# ignored so older clients keep working, but wrong types, missing required
+# fields and oversized text are rejected up front with a 400.
+from datetime import datetime
+from typing import Annotated, Literal, Optional, Union
+
+from msgspec import Meta, Struct, UNSET, UnsetType
+
+Text = Annotated[str, Meta(max_length=100_000)]
+ShortText = Annotated[str, Meta(max_length=2_000)]
+Id = Annotated[str, Meta(min_length=1, max_length=200)]
+Number = Union[int, float]
+
+ContentKind = Literal["resource", "distortion", "symptom"]
+
+
+# --- LLM routes ---
+
+class ChatRequest(Struct):
+    message: Annotated[str, Meta(max_length=20_000)] = ""
+    model: ShortText = "llama3"
+    stream: bool = False
+    # Present (even empty) = server-side session; absent = single turn
+    session_id: Union[ShortText, None, UnsetType] = UNSET
+
+
+class AnalyzeRequest(Struct):
+    content: Text = ""
+
+
+class CrisisCheckRequest(Struct):
+    content: Text = ""
+    message: Text = ""
+
+
+class PlanRequest(Struct):
+    mood: ShortText = "Neutral"
+    journal_summary: Text = "No recent journal entry."
+
+
+# --- Assessments ---
+
+class InvalidateRequest(Struct):
+    assessment_id: Optional[Id] = None
+
+
+class AssessmentAnswer(Struct):
+    question_id: Id
+    value: Optional[Number] = None
+    text: Optional[ShortText] = None
+
+
+class SubmitRequest(Struct):
+    user_id: Id
+    assessment_id: Id
+    responses: Annotated[list[AssessmentAnswer], Meta(min_length=1, max_length=500)]
+
+
+class Submission(Struct):
+    # One row of a bulk import (JSON lines or Parquet)
+    user_id: Id
+    assessment_id: Id
+    responses: Annotated[list[AssessmentAnswer], Meta(min_length=1, max_length=500)]
+    completed_at: Optional[datetime] = None  # RFC 3339 in JSON lines
+
+
+class SubmitResponse(Struct):
+    success: bool
+    result: dict
+    analysis_status: str
+    analysis_url: str
+
+
+class AnalysisStatus(Struct):
+    id: str
+    status: str
+    ai_analysis: Optional[dict] = None
+    error: Optional[str] = None
+
+
+class AnalysisWaitQuery(Struct):
+    wait: Annotated[float, Meta(ge=0)] = 0
+
+
+# --- Student data ---
+
+class StudentQuery(Struct):
+    # Paging and field selection are parsed by pagination.py
+    user_id: Id
+    limit: Optional[str] = None
+    fields: Optional[str] = None
+    cursor: Optional[str] = None
+
+
+class DashboardQuery(Struct):
+    user_id: Id
+    days: Optional[int] = None
+
+
+class ActivityLogRequest(Struct):
+    user_id: Id
+    activity_type: Annotated[str, Meta(min_length=1, max_length=100)]
+    title: Annotated[str, Meta(min_length=1, max_length=500)]
+    details: dict = {}
+
+
+class HeartbeatResponse(Struct):
+    credited_seconds: float
+    interval: float
+
+
+# --- Cohort analytics ---
+
+class CohortQuery(Struct):
+    days: Optional[Annotated[int, Meta(ge=1, le=365)]] = None
+    weeks: Annotated[int, Meta(ge=1, le=104)] = 8
+    code: Optional[ShortText] = None
+
+
+# --- Recommendations ---
+
+class AnalysisQuery(Struct):
+    # The fields of an /analyze result the recommender uses
+    mood: ShortText = ""
+    important_terms: Annotated[list[ShortText], Meta(max_length=100)] = []
+    panic_words: Annotated[list[ShortText], Meta(max_length=100)] = []
+
+
+class RecommendRequest(Struct):
+    # Either one analysis inline or several under `analyses`
+    mood: ShortText = ""
+    important_terms: Annotated[list[ShortText], Meta(max_length=100)] = []
+    panic_words: Annotated[list[ShortText], Meta(max_length=100)] = []
+    analyses: Optional[Annotated[list[AnalysisQuery], Meta(max_length=50)]] = None
+    k: Annotated[int, Meta(ge=1, le=20)] = 3
+    kinds: Optional[list[ContentKind]] = None
+
+
+class RecommendQuery(Struct):
+    k: Optional[Annotated[int, Meta(ge=1, le=20)]] = None
+
+
+# --- Media ---
+
+class MediaQuery(Struct):
+    url: Annotated[str, Meta(min_length=1, max_length=2_000)]
+    # <audio> elements can't send an Authorization header
+    access_token: Optional[str] = None
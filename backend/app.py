@@ -1,18 +1,48 @@
 # backend/app.py
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-import requests
 import os
-import json
-from supabase import create_client, Client, ClientOptions
-
-# Serve frontend folder
-app = Flask(
-    __name__,
-    static_folder=os.path.join(os.path.dirname(__file__), "..", "campus-well-link", "dist"),
-    static_url_path="/"
-)
-CORS(app)  # only for dev
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from supabase import Client
+
+import llm_client
+from llm_client import OllamaOverloaded, OllamaUnavailable
+import llm_schemas
+from llm_cache import cache as llm_cache, make_key
+from supabase_clients import ClientCache, create_shared_client
+from assessment_jobs import JobQueue
+from scoring import engine as scoring_engine
+import assessment_import
+from catalog_cache import catalog_cache, CATALOG_MAX_AGE
+from activity_buffer import create_buffer
+from time_tracking import create_tracker
+import dashboard
+import pagination
+import crisis_detector
+from chat_sessions import create_store as create_chat_store
+from static_assets import StaticFiles, STATIC_DIR
+from cohort_analytics import store as cohort_store
+from resource_index import create_index as create_resource_index
+from media_cache import create_cache as create_media_cache, MediaNotAllowed, MediaFetchFailed
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+import metrics
+import structured_logging
+import msgspec
+import api_models
+from serialization import MsgspecJSONProvider, encode, parse_body, parse_args, json_response
+
+structured_logging.configure()
+logger = logging.getLogger("app")
+
+# The built frontend is served by static_assets (see the routes at the bottom)
+app = Flask(__name__, static_folder=None)
+app.json = MsgspecJSONProvider(app)
+CORS(app, expose_headers=["X-Next-Cursor", "Link"])  # only for dev
 
 # Initialize Supabase Client
 SUPABASE_URL = os.environ.get("VITE_SUPABASE_URL")
@@ -36,42 +66,336 @@ if not SUPABASE_URL or not SUPABASE_KEY:
                         elif key == "VITE_SUPABASE_PUBLISHABLE_KEY":
                             SUPABASE_KEY = value
     except Exception as e:
-        print(f"Error reading .env: {e}")
+        logger.error("Error reading .env", extra={"error": str(e)})
+
+supabase: Client = create_shared_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
+client_cache = ClientCache(SUPABASE_URL, SUPABASE_KEY) if supabase else None
+
+# Shared pool for fanning out independent Supabase queries
+io_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("IO_POOL_WORKERS", "8")), thread_name_prefix="io")
+CATALOG_ADMIN_TOKEN = os.environ.get("CATALOG_ADMIN_TOKEN")
+
+def get_request_token():
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        return None
+    return auth_header.replace("Bearer ", "")
+
+def client_for_token(token):
+    return client_cache.get(token) if token else supabase
+
+def get_request_client():
+    # Authenticated client for the caller's token, reused across requests
+    return client_for_token(get_request_token())
+
+# Token -> user id lookups hit Supabase Auth, so cache them briefly
+TOKEN_USER_TTL = 300
+_token_users = {}
+
+def user_id_for_token(token):
+    if not token or not supabase:
+        return None
+    cached = _token_users.get(token)
+    if cached and cached[0] > time.time():
+        return cached[1]
+    try:
+        user_id = supabase.auth.get_user(token).user.id
+    except Exception as e:
+        logger.warning("Token lookup failed", extra={"error": str(e)})
+        return None
+    if len(_token_users) > 10000:
+        _token_users.clear()
+    _token_users[token] = (time.time() + TOKEN_USER_TTL, user_id)
+    return user_id
+
+# Counselor-only endpoints check the caller's profiles.role (users can't
+# change their own role; see cohort_analytics.sql)
+STAFF_ROLES = ("counselor", "admin")
+STAFF_ROLE_TTL = 300
+_staff_roles = {}
+
+def is_staff(token):
+    if not token or not supabase:
+        return False
+    cached = _staff_roles.get(token)
+    if cached and cached[0] > time.time():
+        return cached[1]
+    try:
+        user_id = user_id_for_token(token)
+        if user_id is None:
+            return False
+        profile = supabase.table("profiles").select("role").eq("id", user_id).single().execute()
+        staff = profile.data.get("role") in STAFF_ROLES
+    except Exception as e:
+        logger.warning("Role lookup failed", extra={"error": str(e)})
+        return False
+    if len(_staff_roles) > 1000:
+        _staff_roles.clear()
+    _staff_roles[token] = (time.time() + STAFF_ROLE_TTL, staff)
+    return staff
+
+# Service role for work that spans users (cohort exports, bulk imports, buffered writes, assessment summaries); None if not configured
+SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+service_client = create_shared_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY) if SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY else None
+# Background AI summaries of submitted assessments. They are written back with
+# the service role, so the key is required while they are enabled
+ASSESSMENT_ANALYSIS = os.environ.get("ASSESSMENT_ANALYSIS", "1") == "1"
+if ASSESSMENT_ANALYSIS and SUPABASE_URL and service_client is None:
+    raise RuntimeError("ASSESSMENT_ANALYSIS needs SUPABASE_SERVICE_ROLE_KEY; set the key or ASSESSMENT_ANALYSIS=0")
+
+# Activity rows are written behind the request in batched inserts
+activity_buffer = create_buffer(client_for_token, service_client)
+# Session time is aggregated in memory and flushed in bulk
+time_tracker = create_tracker(client_for_token, service_client)
+
+# --- Metrics and request logging ---
+
+# Optional bearer token for /metrics; unauthenticated when unset
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+# Requests slower than this are always logged; the rest are sampled
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", "2"))
+
+HTTP_SECONDS = metrics.histogram(
+    "http_request_seconds", "Request duration until the response is fully sent", ["method", "route", "status"]
+)
+LLM_PARSE_SECONDS = metrics.histogram(
+    "llm_json_parse_seconds", "Time to parse an LLM JSON reply", ["route"], buckets=(0.0001, 0.001, 0.01, 0.1, 1)
+)
+LLM_PARSE_FAILURES = metrics.counter("llm_parse_failures_total", "LLM replies that did not match the route's schema", ["route"])
+LLM_REPAIRS = metrics.counter("llm_repairs_total", "Repair calls after an invalid LLM reply", ["route", "outcome"])
+LLM_FALLBACKS = metrics.counter("llm_fallbacks_total", "Responses served without a usable LLM result", ["route", "reason"])
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
+metrics.register_collector("llm_cache", llm_cache.stats, types={"hits": "counter", "misses": "counter"},
+                           documentation="LLM response cache")
+metrics.register_collector("activity_buffer", activity_buffer.stats,
+                           types={"flushed": "counter", "spilled": "counter", "dropped": "counter"},
+                           documentation="Activity write-behind buffer")
+metrics.register_collector("time_tracker", time_tracker.stats,
+                           types={"heartbeats": "counter", "flushed_minutes": "counter", "failed_flushes": "counter"},
+                           documentation="Session time tracker")
+chat_sessions = create_chat_store()
+metrics.register_collector("chat_sessions", chat_sessions.stats,
+                           types={"created": "counter", "evicted": "counter", "expired": "counter",
+                                  "compactions": "counter", "failed_compactions": "counter", "truncated": "counter"},
+                           documentation="Server-side chat sessions")
+metrics.register_collector("supabase_clients", lambda: {"cached": len(client_cache) if client_cache else 0},
+                           documentation="Per-token Supabase clients")
 
-OLLAMA_CHAT_URL = "http://127.0.0.1:11434/api/chat"
+# Invalid replies get this many follow-up calls quoting the validation errors
+LLM_REPAIR_ATTEMPTS = int(os.environ.get("LLM_REPAIR_ATTEMPTS", "1"))
+# A repair is skipped unless at least this much of the caller's timeout is left
+LLM_REPAIR_MIN_SECONDS = 5
+
+class InvalidLLMOutput(ValueError):
+    def __init__(self, errors, content):
+        super().__init__("LLM reply does not match the schema: " + "; ".join(errors))
+        self.errors = errors
+        self.content = content
+
+def parse_llm_json(content, route, schema):
+    # Timed parse + schema validation; failures are counted per route
+    with LLM_PARSE_SECONDS.time(phase="json_parse", route=route):
+        parsed, errors = schema.validate(llm_schemas.extract_json(content))
+    if errors:
+        LLM_PARSE_FAILURES.inc(route=route)
+        raise InvalidLLMOutput(errors, content)
+    return parsed
+
+def generate_json(payload, schema, route, timeout):
+    # One schema-constrained Ollama call, plus up to LLM_REPAIR_ATTEMPTS repairs
+    # within the same overall timeout. Raises InvalidLLMOutput or the call's error.
+    deadline = time.monotonic() + timeout
+    payload = dict(payload, format=schema.format())
+    content = llm_client.chat(payload, timeout=timeout).get("message", {}).get("content", "")
+    attempt = 0
+    while True:
+        try:
+            result = parse_llm_json(content, route, schema)
+            if attempt:
+                LLM_REPAIRS.inc(route=route, outcome="fixed")
+            return result
+        except InvalidLLMOutput as e:
+            remaining = deadline - time.monotonic()
+            if attempt >= LLM_REPAIR_ATTEMPTS or remaining < LLM_REPAIR_MIN_SECONDS:
+                if attempt:
+                    LLM_REPAIRS.inc(route=route, outcome="failed")
+                raise
+            attempt += 1
+            payload = dict(payload, messages=payload["messages"] + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": (
+                    f"That reply was not valid: {'; '.join(e.errors)}. Reply with only a JSON object "
+                    f"matching this schema: {llm_schemas.describe(schema)}"
+                )},
+            ])
+            content = llm_client.chat(payload, timeout=remaining).get("message", {}).get("content", "")
+
+@app.errorhandler(msgspec.DecodeError)
+def invalid_request(e):
+    # Malformed JSON or a body/query that doesn't match its api_models type
+    # (ValidationError is a DecodeError subclass)
+    return jsonify({"error": f"Invalid request: {e}"}), 400
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.request_phases = metrics.start_request()
+
+@app.after_request
+def record_request(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+    method = request.method
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    status = response.status_code
+    phases = g.request_phases
+
+    # Observed on close so streamed responses are timed until their last byte
+    def finish():
+        elapsed = time.perf_counter() - started
+        HTTP_SECONDS.observe(elapsed, method=method, route=route, status=status)
+        fields = {"method": method, "route": route, "status": status, "duration_ms": round(elapsed * 1000, 1)}
+        fields.update({f"{name}_ms": round(seconds * 1000, 1) for name, seconds in phases.items()})
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            logger.warning("Slow request", extra=fields)
+        else:
+            logger.info("Request", extra=dict(fields, sampled=True))
+
+    response.call_on_close(finish)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    if METRICS_TOKEN and get_request_token() != METRICS_TOKEN:
+        return jsonify({"error": "Forbidden"}), 403
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def overloaded_response(e, key="error", crisis=None):
+    # Fast load-shedding: tell the client to back off instead of queueing forever
+    body = {key: f"AI service is busy, please try again shortly ({e})"}
+    if crisis is not None:
+        body["crisis"] = crisis
+    resp = jsonify(body)
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(getattr(e, "retry_after", llm_client.OLLAMA_RETRY_AFTER))
+    return resp
+
+def sse_event(data):
+    return f"data: {encode(data).decode()}\n\n"
+
+def relay_stream(stream, first=None, on_complete=None):
+    # Relay Ollama's NDJSON chunks to the client as Server-Sent Events;
+    # on_complete gets the full reply once the stream ends cleanly
+    tokens = []
+    try:
+        if first is not None:
+            yield sse_event(first)
+        for chunk in stream:
+            if chunk.get("error"):
+                yield sse_event({"error": chunk["error"], "done": True})
+                return
+            token = chunk.get("message", {}).get("content", "")
+            if token:
+                tokens.append(token)
+                yield sse_event({"token": token})
+        if on_complete is not None:
+            on_complete("".join(tokens))
+        yield sse_event({"done": True})
+    except Exception as e:
+        yield sse_event({"error": f"Error: stream from Ollama API interrupted ({e})", "done": True})
+    finally:
+        stream.close()
+
+def wants_stream(req):
+    if req.stream:
+        return True
+    return "text/event-stream" in request.headers.get("Accept", "")
 
 @app.route("/chat", methods=["POST"])
 def chat():
-    data = request.get_json() or {}
-    user_message = data.get("message", "")
-    model_name = data.get("model", "llama3")
+    req = parse_body(api_models.ChatRequest)
+    user_message = req.message
+    model_name = req.model
+    # Keyword screen runs before (and independently of) the model
+    crisis = crisis_detector.scan(user_message)
+
+    # Multi-turn: any "session_id" key (empty for a new conversation) keeps the
+    # history server-side; the id to send next time comes back in the reply
+    conversation = None
+    if req.session_id is not msgspec.UNSET:
+        conversation = chat_sessions.get_or_create(req.session_id, user_id_for_token(get_request_token()))
+        messages = conversation.prompt(user_message)
+    else:
+        messages = [{"role": "user", "content": user_message}]
 
     payload = {
         "model": model_name,
-        "messages": [
-            {"role": "user", "content": user_message}
-        ],
+        "messages": messages,
         "stream": False
     }
 
+    def remember(reply):
+        if conversation is not None and reply:
+            chat_sessions.record(conversation, user_message, reply, model_name)
+
+    extra = {"crisis": crisis}
+    if conversation is not None:
+        extra["session_id"] = conversation.id
+
+    # Streaming mode: {"stream": true} or Accept: text/event-stream
+    if wants_stream(req):
+        try:
+            stream = llm_client.stream_chat(payload, timeout=60)
+        except OllamaOverloaded as e:
+            return overloaded_response(e, key="reply", crisis=crisis)
+        except Exception as e:
+            return jsonify({"reply": f"Error: cannot reach Ollama API ({e})", **extra}), 500
+
+        first = {}
+        if crisis["flagged"]:
+            first["crisis"] = crisis
+        if conversation is not None:
+            first["session_id"] = conversation.id
+        response = Response(
+            stream_with_context(relay_stream(stream, first=first or None, on_complete=remember)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+        response.call_on_close(stream.close)
+        return response
+
     try:
-        r = requests.post(OLLAMA_CHAT_URL, json=payload, timeout=60)
-        r.raise_for_status()
+        resp = llm_client.chat(payload, timeout=60)
+    except OllamaOverloaded as e:
+        return overloaded_response(e, key="reply", crisis=crisis)
     except Exception as e:
-        return jsonify({"reply": f"Error: cannot reach Ollama API ({e})"}), 500
+        return jsonify({"reply": f"Error: cannot reach Ollama API ({e})", **extra}), 500
 
-    resp = r.json()
     reply = resp.get("message", {}).get("content", "")
+    remember(reply)
+
+    return jsonify({"reply": reply, **extra})
+
+def merge_crisis(analysis, crisis):
+    # Keyword matches can only raise the model's risk level, never lower it
+    merged = dict(analysis)
+    merged["risk_level"] = crisis_detector.escalate(merged.get("risk_level"), crisis)
+    panic_words = list(merged.get("panic_words") or [])
+    merged["panic_words"] = panic_words + [m for m in crisis["matches"] if m not in panic_words]
+    merged["crisis"] = crisis
+    return merged
 
-    return jsonify({"reply": reply})
+def crisis_only_analysis(crisis):
+    # Keyword-only result for when the model can't be used, so flagged text is
+    # never lost to an LLM failure
+    return merge_crisis({"mood": "Neutral", "risk_level": crisis["risk_level"], "summary": "",
+                         "analysis_pending": True}, crisis)
 
 @app.route("/analyze", methods=["POST"])
 def analyze():
-    data = request.get_json() or {}
-    content = data.get("content", "")
-    
+    content = parse_body(api_models.AnalyzeRequest).content
+
     system_prompt = (
         "Analyze this text. Return a JSON object with keys: "
         "'mood', 'risk_level' (Low/Medium/High), 'summary', 'routine', "
@@ -85,33 +409,80 @@ def analyze():
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": content}
         ],
-        "stream": False,
-        "format": "json"
+        "stream": False
     }
 
+    # Keyword screen first: microseconds, and still works when Ollama is slow or down
+    crisis = crisis_detector.scan(content)
+
+    cache_key = make_key(payload["model"], system_prompt, content)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return jsonify(merge_crisis(cached, crisis))
+
     try:
-        r = requests.post(OLLAMA_CHAT_URL, json=payload, timeout=60)
-        r.raise_for_status()
+        analysis_result = generate_json(payload, llm_schemas.ANALYSIS, "analyze", timeout=60)
+    except OllamaUnavailable:
+        # Circuit open: answer now with the keyword result instead of an error
+        LLM_FALLBACKS.inc(route="analyze", reason="circuit_open")
+        return jsonify(crisis_only_analysis(crisis))
+    except OllamaOverloaded as e:
+        if crisis["flagged"]:
+            LLM_FALLBACKS.inc(route="analyze", reason="crisis_only")
+            return jsonify(crisis_only_analysis(crisis))
+        return overloaded_response(e)
+    except InvalidLLMOutput as e:
+        logger.warning("Invalid analysis from model", extra={"errors": e.errors})
+        LLM_FALLBACKS.inc(route="analyze", reason="invalid_output")
+        return jsonify(crisis_only_analysis(crisis))
     except Exception as e:
+        if crisis["flagged"]:
+            LLM_FALLBACKS.inc(route="analyze", reason="crisis_only")
+            return jsonify(crisis_only_analysis(crisis))
         return jsonify({"error": f"Error: cannot reach Ollama API ({e})"}), 500
 
-    resp = r.json()
-    reply_content = resp.get("message", {}).get("content", "{}")
-    
-    try:
-        analysis_result = json.loads(reply_content)
-        print("\n--- AI Analysis Result ---")
-        print(json.dumps(analysis_result, indent=2))
-        print("--------------------------\n")
-        return jsonify(analysis_result)
-    except Exception:
-        return jsonify({"error": "Failed to parse AI response"}), 500
+    llm_cache.set(cache_key, analysis_result)
+    logger.debug("AI analysis result", extra={"risk_level": analysis_result.get("risk_level"),
+                                              "mood": analysis_result.get("mood"), "sampled": True})
+    return jsonify(merge_crisis(analysis_result, crisis))
+
+@app.route("/api/crisis/check", methods=["POST"])
+def crisis_check():
+    # Keyword screen on its own, for callers that can't wait on /analyze
+    req = parse_body(api_models.CrisisCheckRequest)
+    return jsonify(crisis_detector.scan(req.content or req.message))
+
+# Served whenever the model can't produce a plan
+MOCK_PLAN = {
+    "tasks": [
+        {
+            "category": "Sleep",
+            "title": "Digital Sunset",
+            "description": "Turn off all screens 1 hour before bed to improve melatonin production."
+        },
+        {
+            "category": "Nutrition",
+            "title": "Hydration Boost",
+            "description": "Drink a glass of water immediately after waking up."
+        },
+        {
+            "category": "Movement",
+            "title": "10-Minute Walk",
+            "description": "Take a brisk walk outside to get some fresh air and sunlight."
+        },
+        {
+            "category": "Mindfulness",
+            "title": "5-Minute Breathing",
+            "description": "Practice box breathing (4-4-4-4) for 5 minutes to reduce stress."
+        }
+    ]
+}
 
 @app.route("/generate_plan", methods=["POST"])
 def generate_plan():
-    data = request.get_json() or {}
-    mood = data.get("mood", "Neutral")
-    journal_summary = data.get("journal_summary", "No recent journal entry.")
+    req = parse_body(api_models.PlanRequest)
+    mood = req.mood
+    journal_summary = req.journal_summary
 
     system_prompt = (
         f"You are a wellness coach. Create a daily wellness plan for a student based on their mood: {mood} "
@@ -124,58 +495,63 @@ def generate_plan():
         "messages": [
             {"role": "system", "content": system_prompt}
         ],
-        "stream": False,
-        "format": "json"
+        "stream": False
     }
 
+    # The prompt is just mood + summary, so identical plans repeat constantly
+    cache_key = make_key(payload["model"], system_prompt, None)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return jsonify(cached)
+
     try:
-        r = requests.post(OLLAMA_CHAT_URL, json=payload, timeout=60)
-        r.raise_for_status()
+        plan_result = generate_json(payload, llm_schemas.PLAN, "generate_plan", timeout=60)
+    except InvalidLLMOutput as e:
+        logger.warning("Invalid plan from model, returning mock plan", extra={"errors": e.errors})
+        LLM_FALLBACKS.inc(route="generate_plan", reason="invalid_output")
+        return jsonify(MOCK_PLAN)
     except Exception as e:
-        print(f"Ollama not reachable, returning mock data: {e}")
-        return jsonify({
-            "tasks": [
-                {
-                    "category": "Sleep",
-                    "title": "Digital Sunset",
-                    "description": "Turn off all screens 1 hour before bed to improve melatonin production."
-                },
-                {
-                    "category": "Nutrition",
-                    "title": "Hydration Boost",
-                    "description": "Drink a glass of water immediately after waking up."
-                },
-                {
-                    "category": "Movement",
-                    "title": "10-Minute Walk",
-                    "description": "Take a brisk walk outside to get some fresh air and sunlight."
-                },
-                {
-                    "category": "Mindfulness",
-                    "title": "5-Minute Breathing",
-                    "description": "Practice box breathing (4-4-4-4) for 5 minutes to reduce stress."
-                }
-            ]
-        })
+        # Also covers OllamaOverloaded and an open circuit: a generic plan beats a 503 here
+        logger.warning("Ollama not reachable, returning mock plan", extra={"error": str(e)})
+        LLM_FALLBACKS.inc(route="generate_plan", reason="mock_plan")
+        return jsonify(MOCK_PLAN)
 
-    resp = r.json()
-    reply_content = resp.get("message", {}).get("content", "{}")
-
-    try:
-        plan_result = json.loads(reply_content)
-        return jsonify(plan_result)
-    except Exception:
-        return jsonify({"error": "Failed to parse AI response"}), 500
+    llm_cache.set(cache_key, plan_result)
+    return jsonify(plan_result)
 
 # --- Assessment Endpoints ---
 
+def catalog_response(entry):
+    # Serve a cached catalog entry; answers 304 when If-None-Match matches
+    response = app.response_class(entry.body, mimetype="application/json")
+    response.set_etag(entry.etag)
+    response.headers["Cache-Control"] = f"public, max-age={CATALOG_MAX_AGE}, must-revalidate"
+    return response.make_conditional(request)
+
+def load_assessment_details(assessment_id):
+    # Both queries only depend on the id, so run them side by side
+    assessment = metrics.submit_with_context(
+        io_pool, lambda: supabase.table("assessments").select("*").eq("id", assessment_id).single().execute()
+    )
+    questions = metrics.submit_with_context(
+        io_pool, lambda: supabase.table("assessment_questions").select("*").eq("assessment_id", assessment_id).order("question_order").execute()
+    )
+    return {
+        "assessment": assessment.result().data,
+        "questions": questions.result().data
+    }
+
 @app.route("/api/assessments", methods=["GET"])
 def get_assessments():
     if not supabase:
         return jsonify({"error": "Supabase not configured"}), 500
     try:
-        response = supabase.table("assessments").select("*").execute()
-        return jsonify(response.data)
+        entry = catalog_cache.get_or_load(
+            "assessments",
+            lambda: supabase.table("assessments").select("*").execute().data,
+            app.json.dumps
+        )
+        return catalog_response(entry)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -184,140 +560,256 @@ def get_assessment_details(assessment_id):
     if not supabase:
         return jsonify({"error": "Supabase not configured"}), 500
     try:
-        assessment = supabase.table("assessments").select("*").eq("id", assessment_id).single().execute()
-        questions = supabase.table("assessment_questions").select("*").eq("assessment_id", assessment_id).order("question_order").execute()
-        
-        return jsonify({
-            "assessment": assessment.data,
-            "questions": questions.data
-        })
+        entry = catalog_cache.get_or_load(
+            f"assessment:{assessment_id}",
+            lambda: load_assessment_details(assessment_id),
+            app.json.dumps
+        )
+        return catalog_response(entry)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/assessments/cache/invalidate", methods=["POST"])
+def invalidate_assessment_cache():
+    # Call after editing assessments or questions (e.g. from a Supabase webhook)
+    if not CATALOG_ADMIN_TOKEN or request.headers.get("X-Admin-Token") != CATALOG_ADMIN_TOKEN:
+        return jsonify({"error": "Forbidden"}), 403
+
+    assessment_id = parse_body(api_models.InvalidateRequest).assessment_id
+    if assessment_id:
+        cleared = catalog_cache.invalidate(f"assessment:{assessment_id}")
+        cleared += catalog_cache.invalidate("assessments")
+    else:
+        cleared = catalog_cache.invalidate()
+
+    # New instruments may have been added as well
+    if supabase:
+        try:
+            scoring_engine.refresh_codes(supabase)
+        except Exception as e:
+            logger.error("Failed to refresh assessment codes", extra={"error": str(e)})
+
+    return jsonify({"success": True, "cleared": cleared})
+
+def run_assessment_analysis(user_assessment_id, code, total_score, risk_level, responses):
+    # Runs on an assessment worker thread, after the response has been sent.
+    # The write-back uses the service role: students can't update their own
+    # rows, and their token may have expired by the time a queued job runs
+    ai_prompt = (
+        f"Analyze these assessment results for {code}. Total Score: {total_score}. Risk Level: {risk_level}. "
+        f"Responses: {encode(responses).decode()}. "
+        "Return a JSON object with keys: 'summary' (string) and 'recommendations' (list of strings)."
+    )
+
+    ai_payload = {
+        "model": "llama3",
+        "messages": [{"role": "user", "content": ai_prompt}],
+        "stream": False
+    }
+
+    ai_analysis = {}
+    try:
+        ai_analysis = generate_json(ai_payload, llm_schemas.ASSESSMENT_ANALYSIS, "assessment_analysis", timeout=30)
+    except InvalidLLMOutput as e:
+        LLM_FALLBACKS.inc(route="assessment_analysis", reason="raw_summary")
+        ai_analysis = {"summary": e.content}
+    except Exception as e:
+        logger.warning("AI analysis failed", extra={"user_assessment_id": user_assessment_id, "error": str(e)})
+        LLM_FALLBACKS.inc(route="assessment_analysis", reason="unavailable")
+        ai_analysis = {"error": "AI analysis unavailable"}
+
+    try:
+        service_client.table("user_assessments").update({"ai_analysis": ai_analysis}).eq("id", user_assessment_id).execute()
+    except Exception as e:
+        logger.error("Failed to store AI analysis", extra={"user_assessment_id": user_assessment_id, "error": str(e)})
+
+    return ai_analysis
+
+assessment_jobs = JobQueue(run_assessment_analysis)
+metrics.register_collector("assessment_jobs", assessment_jobs.stats, documentation="Assessment analysis queue")
+
 @app.route("/api/assessments/submit", methods=["POST"])
 def submit_assessment():
     if not supabase:
         return jsonify({"error": "Supabase not configured"}), 500
-    
-    data = request.get_json()
-    user_id = data.get("user_id")
-    assessment_id = data.get("assessment_id")
-    responses = data.get("responses")
-    auth_header = request.headers.get("Authorization")
 
-    if not user_id or not assessment_id or not responses:
-        return jsonify({"error": "Missing required fields"}), 400
+    req = parse_body(api_models.SubmitRequest)
+    user_id = req.user_id
+    assessment_id = req.assessment_id
+    responses = msgspec.to_builtins(req.responses)
 
     # Create authenticated client if token is present
-    client = supabase
-    if auth_header:
-        token = auth_header.replace("Bearer ", "")
-        client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(headers={'Authorization': f'Bearer {token}'}))
+    client = get_request_client()
 
     try:
-        total_score = sum(r.get("value", 0) for r in responses)
-        
-        assessment_info = client.table("assessments").select("code").eq("id", assessment_id).single().execute()
-        code = assessment_info.data.get("code")
-        
-        risk_level = "Low"
-        if code == "PHQ-9":
-            if total_score >= 20: risk_level = "Severe"
-            elif total_score >= 15: risk_level = "Moderately Severe"
-            elif total_score >= 10: risk_level = "Moderate"
-            elif total_score >= 5: risk_level = "Mild"
-        elif code == "GAD-7":
-            if total_score >= 15: risk_level = "Severe"
-            elif total_score >= 10: risk_level = "Moderate"
-            elif total_score >= 5: risk_level = "Mild"
-        elif code == "C-SSRS":
-             if total_score > 0: risk_level = "High"
-        
-        ai_prompt = (
-            f"Analyze these assessment results for {code}. Total Score: {total_score}. Risk Level: {risk_level}. "
-            f"Responses: {json.dumps(responses)}. "
-            "Return a JSON object with keys: 'summary' (string) and 'recommendations' (list of strings)."
-        )
-        
-        ai_payload = {
-            "model": "llama3",
-            "messages": [{"role": "user", "content": ai_prompt}],
-            "stream": False,
-            "format": "json"
-        }
-        
-        ai_analysis = {}
-        try:
-            r = requests.post(OLLAMA_CHAT_URL, json=ai_payload, timeout=30)
-            if r.status_code == 200:
-                ai_resp = r.json()
-                content = ai_resp.get("message", {}).get("content", "{}")
-                try:
-                    ai_analysis = json.loads(content)
-                except:
-                    ai_analysis = {"summary": content}
-        except Exception as e:
-            print(f"AI Analysis failed: {e}")
-            ai_analysis = {"error": "AI analysis unavailable"}
+        code = scoring_engine.code_for(assessment_id, client)
+        if code is None:
+            return jsonify({"error": "Assessment not found"}), 404
+
+        total_score, risk_level = scoring_engine.score(code, responses)
 
         user_assessment = client.table("user_assessments").insert({
             "user_id": user_id,
             "assessment_id": assessment_id,
             "total_score": total_score,
             "risk_level": risk_level,
-            "ai_analysis": ai_analysis
+            "ai_analysis": None
         }).execute()
         
         user_assessment_id = user_assessment.data[0]["id"]
         
-        formatted_responses = []
-        for r in responses:
-            formatted_responses.append({
-                "user_assessment_id": user_assessment_id,
-                "question_id": r["question_id"],
-                "response_value": r.get("value"),
-                "response_text": r.get("text")
-            })
-            
+        formatted_responses = [{
+            "user_assessment_id": user_assessment_id,
+            "question_id": r.question_id,
+            "response_value": r.value,
+            "response_text": r.text
+        } for r in req.responses]
+
         client.table("user_assessment_responses").insert(formatted_responses).execute()
 
         # Log activity
+        if not activity_buffer.add(get_request_token(), {
+            "user_id": user_id,
+            "activity_type": "assessment",
+            "title": f"Completed {code} Assessment",
+            "details": {"score": total_score, "risk_level": risk_level}
+        }):
+            logger.warning("Failed to log activity: buffer full or insert failed")
+
+        # AI summary happens in the background
+        analysis_status = "pending" if ASSESSMENT_ANALYSIS else "disabled"
         try:
-            client.table("user_activities").insert({
-                "user_id": user_id,
-                "activity_type": "assessment",
-                "title": f"Completed {code} Assessment",
-                "details": {"score": total_score, "risk_level": risk_level}
-            }).execute()
-        except Exception as log_error:
-            print(f"Failed to log activity: {log_error}")
-        
-        return jsonify({
-            "success": True,
-            "result": user_assessment.data[0]
-        })
+            if ASSESSMENT_ANALYSIS:
+                assessment_jobs.submit(user_assessment_id, user_assessment_id, code,
+                                       total_score, risk_level, responses, owner=user_assessment.data[0]["user_id"])
+        except queue.Full:
+            logger.warning("Assessment queue full, skipping AI analysis", extra={"user_assessment_id": user_assessment_id})
+            analysis_status = "unavailable"
+
+        return jsonify(api_models.SubmitResponse(
+            success=True,
+            result=user_assessment.data[0],
+            analysis_status=analysis_status,
+            analysis_url=f"/api/assessments/results/{user_assessment_id}/analysis"
+        ))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/assessments/submit/batch", methods=["POST"])
+def submit_assessments_batch():
+    # Bulk import: body is JSON lines, or Parquet (raw body or a "file" upload).
+    # Counselors import on behalf of students, which RLS only allows the service role to write
+    if not supabase:
+        return jsonify({"error": "Supabase not configured"}), 500
+    if not is_staff(get_request_token()):
+        return jsonify({"error": "Forbidden"}), 403
+    if service_client is None:
+        return jsonify({"error": "Bulk import requires SUPABASE_SERVICE_ROLE_KEY"}), 500
+
+    upload = request.files.get("file")
+    if upload is not None:
+        raw, content_type, filename = upload.read(), upload.mimetype, upload.filename
+    else:
+        raw, content_type, filename = request.get_data(), request.content_type, None
+
+    if not raw:
+        return jsonify({"error": "Empty upload"}), 400
+
+    try:
+        rows = assessment_import.parse_upload(raw, content_type, filename)
+        results = assessment_import.import_submissions(service_client, rows)
+    except assessment_import.ImportFailed as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    imported = sum(1 for r in results if r["status"] == "ok")
+    return json_response(app, {
+        "success": imported == len(results),
+        "imported": imported,
+        "failed": len(results) - imported,
+        "results": results
+    }, list_key="results")
+
+@app.route("/api/assessments/results/<user_assessment_id>/analysis", methods=["GET"])
+def get_assessment_analysis(user_assessment_id):
+    # Poll for the background AI summary; ?wait=N long-polls up to N seconds
+    wait = min(parse_args(api_models.AnalysisWaitQuery).wait, 30)
+
+    # In-memory results are only for the student who submitted; anyone else
+    # reads the stored row, subject to RLS
+    job = assessment_jobs.get(user_assessment_id)
+    if job is not None and job.owner is not None and job.owner == user_id_for_token(get_request_token()):
+        if wait > 0:
+            job.wait(wait)
+        return jsonify(api_models.AnalysisStatus(**job.to_dict()))
+
+    # Not queued in this process (e.g. after a restart): read the row itself
+    if not supabase:
+        return jsonify({"error": "Supabase not configured"}), 500
+    client = get_request_client()
+    try:
+        row = client.table("user_assessments").select("id, ai_analysis").eq("id", user_assessment_id).single().execute()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 404
+
+    ai_analysis = row.data.get("ai_analysis")
+    status = "done" if ai_analysis is not None else "pending" if ASSESSMENT_ANALYSIS else "disabled"
+    return jsonify(api_models.AnalysisStatus(
+        id=user_assessment_id,
+        status=status,
+        ai_analysis=ai_analysis
+    ))
+
+# Paged history endpoints. Large JSONB columns (ai_analysis, details) are only
+# selected when asked for with ?fields=...
+RESULTS_PAGE_SIZE = 50
+RESULTS_MAX_PAGE_SIZE = 200
+RESULT_FIELDS = {
+    "id": "id",
+    "user_id": "user_id",
+    "assessment_id": "assessment_id",
+    "total_score": "total_score",
+    "risk_level": "risk_level",
+    "completed_at": "completed_at",
+    "ai_analysis": "ai_analysis",
+    "assessments": "assessments(name, code)",
+}
+RESULT_DEFAULT_FIELDS = ("id", "user_id", "assessment_id", "total_score", "risk_level", "completed_at", "assessments")
+
+ACTIVITY_PAGE_SIZE = 5
+ACTIVITY_MAX_PAGE_SIZE = 100
+ACTIVITY_FIELDS = {f: f for f in ("id", "user_id", "activity_type", "title", "details", "created_at")}
+ACTIVITY_DEFAULT_FIELDS = ("id", "user_id", "activity_type", "title", "created_at")
+
+def paged_response(rows, next_cursor):
+    # Body stays a plain list for old callers; the next page is in the headers
+    response = json_response(app, rows)
+    if next_cursor:
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        query = urlencode(args)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.path}?{query}>; rel="next"'
+    return response
+
 @app.route("/api/student/results", methods=["GET"])
 def get_student_results():
     if not supabase:
         return jsonify({"error": "Supabase not configured"}), 500
-    
-    user_id = request.args.get("user_id")
-    if not user_id:
-        return jsonify({"error": "User ID required"}), 400
 
-    auth_header = request.headers.get("Authorization")
-    client = supabase
-    if auth_header:
-        token = auth_header.replace("Bearer ", "")
-        client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(headers={'Authorization': f'Bearer {token}'}))
-        
+    query_args = parse_args(api_models.StudentQuery)
+    client = get_request_client()
+
     try:
-        results = client.table("user_assessments").select("*, assessments(name, code)").eq("user_id", user_id).order("completed_at", desc=True).execute()
-        return jsonify(results.data)
+        limit = pagination.parse_limit(query_args.limit, RESULTS_PAGE_SIZE, RESULTS_MAX_PAGE_SIZE)
+        select = pagination.build_select(query_args.fields, RESULT_FIELDS, RESULT_DEFAULT_FIELDS, ("completed_at", "id"))
+        query = client.table("user_assessments").select(select).eq("user_id", query_args.user_id)
+        rows, next_cursor = pagination.paginate(query, "completed_at", query_args.cursor, limit)
+        return paged_response(rows, next_cursor)
+    except pagination.BadRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -325,55 +817,225 @@ def get_student_results():
 def log_activity():
     if not supabase:
         return jsonify({"error": "Supabase not configured"}), 500
-    
-    data = request.get_json()
-    user_id = data.get("user_id")
-    activity_type = data.get("activity_type")
-    title = data.get("title")
-    details = data.get("details", {})
-    
-    auth_header = request.headers.get("Authorization")
-    client = supabase
-    if auth_header:
-        token = auth_header.replace("Bearer ", "")
-        client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(headers={'Authorization': f'Bearer {token}'}))
+
+    # Rejected rows would fail the whole batched insert, so check them now
+    activity = msgspec.to_builtins(parse_body(api_models.ActivityLogRequest))
+    # Rows may be written later with the service role, so check the owner now
+    if activity["user_id"] != user_id_for_token(get_request_token()):
+        return jsonify({"error": "Forbidden"}), 403
+    queued = activity_buffer.add(get_request_token(), activity)
+    if not queued:
+        resp = jsonify({"error": "Activity log is busy, please retry"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "1"
+        return resp
+    return jsonify({"success": True})
+
+@app.route("/api/student/recent-activity", methods=["GET"])
+def get_recent_activity():
+    if not supabase:
+        return jsonify({"error": "Supabase not configured"}), 500
+
+    query_args = parse_args(api_models.StudentQuery)
+    client = get_request_client()
 
     try:
-        client.table("user_activities").insert({
-            "user_id": user_id,
-            "activity_type": activity_type,
-            "title": title,
-            "details": details
-        }).execute()
-        return jsonify({"success": True})
+        # Last 5 activities by default; follow X-Next-Cursor for older ones
+        limit = pagination.parse_limit(query_args.limit, ACTIVITY_PAGE_SIZE, ACTIVITY_MAX_PAGE_SIZE)
+        select = pagination.build_select(query_args.fields, ACTIVITY_FIELDS, ACTIVITY_DEFAULT_FIELDS, ("created_at", "id"))
+        query = client.table("user_activities").select(select).eq("user_id", query_args.user_id)
+        rows, next_cursor = pagination.paginate(query, "created_at", query_args.cursor, limit)
+        return paged_response(rows, next_cursor)
+    except pagination.BadRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route("/api/student/recent-activity", methods=["GET"])
-def get_recent_activity():
+@app.route("/api/student/dashboard", methods=["GET"])
+def get_dashboard():
+    # Daily and weekly mood/risk/activity rollups from user_daily_rollups
     if not supabase:
         return jsonify({"error": "Supabase not configured"}), 500
-    
-    user_id = request.args.get("user_id")
+
+    query_args = parse_args(api_models.DashboardQuery)
+    user_id = query_args.user_id
+    days = query_args.days or dashboard.DASHBOARD_DEFAULT_DAYS
+    days = max(1, min(days, dashboard.DASHBOARD_MAX_DAYS))
+    end = datetime.now(timezone.utc).date()
+    start = end - timedelta(days=days - 1)
+
+    client = get_request_client()
+
+    try:
+        rows = client.table("user_daily_rollups").select("*").eq("user_id", user_id).gte("day", start.isoformat()).order("day").execute()
+        daily = dashboard.build_daily(rows.data, start, end)
+        return jsonify({
+            "daily": daily,
+            "weekly": dashboard.build_weekly(daily)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/time/heartbeat", methods=["POST"])
+def time_heartbeat():
+    # Sent by the dashboard about once a minute while a session is open
+    user_id = user_id_for_token(get_request_token())
     if not user_id:
-        return jsonify({"error": "User ID required"}), 400
+        return jsonify({"error": "Unauthorized"}), 401
+    try:
+        credited = time_tracker.heartbeat(user_id, get_request_token())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify(api_models.HeartbeatResponse(credited_seconds=credited, interval=time_tracker.heartbeat_interval))
 
-    auth_header = request.headers.get("Authorization")
-    client = supabase
-    if auth_header:
-        token = auth_header.replace("Bearer ", "")
-        client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(headers={'Authorization': f'Bearer {token}'}))
-        
+# --- Cohort Analytics (counselors) ---
+
+@app.route("/api/analytics/cohort/refresh", methods=["POST"])
+def refresh_cohort_analytics():
+    if not supabase:
+        return jsonify({"error": "Supabase not configured"}), 500
+    if not is_staff(get_request_token()):
+        return jsonify({"error": "Forbidden"}), 403
+    # Under a counselor's RLS the watermark would skip rows it can't see
+    if service_client is None:
+        return jsonify({"error": "Cohort export requires SUPABASE_SERVICE_ROLE_KEY"}), 500
     try:
-        # Fetch last 5 activities
-        activities = client.table("user_activities").select("*").eq("user_id", user_id).order("created_at", desc=True).limit(5).execute()
-        return jsonify(activities.data)
+        exported = cohort_store.export(service_client)
+        return jsonify({"success": True, "exported": exported})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/analytics/cohort/risk-distribution", methods=["GET"])
+def cohort_risk_distribution():
+    if not is_staff(get_request_token()):
+        return jsonify({"error": "Forbidden"}), 403
+    query_args = parse_args(api_models.CohortQuery)
+    return jsonify(cohort_store.risk_distribution(days=query_args.days, code=query_args.code))
+
+@app.route("/api/analytics/cohort/trend", methods=["GET"])
+def cohort_trend():
+    if not is_staff(get_request_token()):
+        return jsonify({"error": "Forbidden"}), 403
+    query_args = parse_args(api_models.CohortQuery)
+    return jsonify(cohort_store.trend(weeks=query_args.weeks, code=query_args.code))
+
+@app.route("/api/analytics/cohort/band-crossings", methods=["GET"])
+def cohort_band_crossings():
+    if not is_staff(get_request_token()):
+        return jsonify({"error": "Forbidden"}), 403
+    query_args = parse_args(api_models.CohortQuery)
+    return jsonify(cohort_store.band_crossings(days=query_args.days or 7, code=query_args.code))
+
+# --- Recommendations ---
+
+def load_content_rows(table, columns):
+    return supabase.table(table).select(columns).execute().data
+
+resource_index = create_resource_index(load_content_rows if supabase else None)
+resource_index.start()
+metrics.register_collector("resource_index", resource_index.stats,
+                           types={"embedded": "counter", "syncs": "counter", "failed_syncs": "counter",
+                                  "queries": "counter"},
+                           documentation="Recommendation embedding index")
+
+@app.route("/api/recommendations", methods=["POST"])
+def recommend_content():
+    # Body is an /analyze result ({mood, important_terms, panic_words}) or
+    # {"analyses": [...]} for several at once; optional k (per kind) and kinds.
+    # Limits (batch size, k, known kinds) are enforced by RecommendRequest
+    req = parse_body(api_models.RecommendRequest)
+    single = req.analyses is None
+    analyses = [req] if single else req.analyses
+    k = parse_args(api_models.RecommendQuery).k or req.k
+
+    results = resource_index.recommend(
+        [{"mood": a.mood, "important_terms": a.important_terms, "panic_words": a.panic_words} for a in analyses],
+        k=k, kinds=req.kinds
+    )
+    if single:
+        return jsonify({"recommendations": results[0]})
+    return jsonify({"results": [{"recommendations": r} for r in results]})
+
+@app.route("/api/recommendations/refresh", methods=["POST"])
+def refresh_recommendations():
+    # Call after editing resources or the clinical tables (e.g. from a Supabase webhook)
+    if not CATALOG_ADMIN_TOKEN or request.headers.get("X-Admin-Token") != CATALOG_ADMIN_TOKEN:
+        return jsonify({"error": "Forbidden"}), 403
+    if not supabase:
+        return jsonify({"error": "Supabase not configured"}), 500
+    try:
+        return jsonify({"success": True, **resource_index.sync()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --- Media ---
+
+def load_media_urls():
+    # Everything the app links to as playable media
+    client = service_client or supabase
+    urls = []
+    for table in ("ambient_sounds", "resources"):
+        urls.extend(row["url"] for row in client.table(table).select("url").execute().data if row.get("url"))
+    return urls
+
+media_cache = create_media_cache(catalog=load_media_urls)
+metrics.register_collector("media_cache", media_cache.stats,
+                           types={"hits": "counter", "misses": "counter", "fetched_bytes": "counter",
+                                  "fetch_failures": "counter", "evictions": "counter"},
+                           documentation="Remote audio cache behind /api/media")
+
+@app.route("/api/media", methods=["GET"])
+def media_proxy():
+    # ?url=<catalog audio URL>; fetched once, then served from disk with Range support
+    if not supabase:
+        return jsonify({"error": "Supabase not configured"}), 500
+    query_args = parse_args(api_models.MediaQuery)
+    if not user_id_for_token(get_request_token() or query_args.access_token):
+        return jsonify({"error": "Unauthorized"}), 401
+    url = query_args.url
+    try:
+        return media_cache.response(url, request)
+    except MediaNotAllowed as e:
+        return jsonify({"error": str(e)}), 403
+    except MediaFetchFailed as e:
+        logger.warning("Media fetch failed", extra={"url": url, "error": str(e)})
+        return jsonify({"error": str(e)}), 502
+
+# --- Frontend ---
+
+static_files = StaticFiles(STATIC_DIR)
+
 @app.route("/")
 def index():
-    return send_from_directory(app.static_folder, "index.html")
+    return static_files.response("index.html", request)
+
+@app.route("/<path:filename>")
+def frontend_file(filename):
+    return static_files.response(filename, request)
+
+_shutdown_lock = threading.Lock()
+_shut_down = False
+
+def shutdown(timeout=30):
+    # Graceful stop for production workers (see wsgi.py): let queued assessment
+    # analyses finish, then write out buffered activity and session time.
+    global _shut_down
+    with _shutdown_lock:
+        if _shut_down:
+            return
+        _shut_down = True
+    started = time.monotonic()
+    if not assessment_jobs.close(timeout):
+        logger.warning("Shutdown timed out with assessment analyses still queued",
+                       extra={"queued": assessment_jobs.pending()})
+    activity_buffer.close()
+    time_tracker.close()
+    chat_sessions.close()
+    resource_index.close()
+    media_cache.close()
+    io_pool.shutdown(wait=False)
+    logger.info("Shut down", extra={"seconds": round(time.monotonic() - started, 1)})
 
+# Development server; use wsgi.py in production
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=5000, debug=True)
+    app.run(host="127.0.0.1", port=5000, debug=os.environ.get("FLASK_DEBUG", "1") == "1", threaded=True)
@@ -0,0 +1,144 @@
+# backend/assessment_import.py
+# Bulk import of assessment submissions (e.g. re-scored paper PHQ-9/GAD-7 forms).
+# Accepts JSON lines or Parquet, scores every row in one vectorized pass and
+# writes user_assessments / user_assessment_responses in chunks, each through
+# one import_assessments() call (assessment_import.sql) so it lands atomically.
+import os
+import io
+import uuid
+
+import msgspec
+
+from api_models import Submission
+from scoring import engine as scoring_engine
+
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_MAX_ROWS = int(os.environ.get("IMPORT_MAX_ROWS", "20000"))
+
+PARQUET_TYPES = ("application/vnd.apache.parquet", "application/x-parquet", "application/octet-stream")
+
+
+class ImportFailed(Exception):
+    """Raised when the upload as a whole can't be parsed."""
+
+
+def parse_jsonl(raw):
+    rows = []
+    for line_no, line in enumerate(raw.decode("utf-8").splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rows.append(msgspec.json.decode(line))
+        except msgspec.DecodeError as e:
+            raise ImportFailed(f"Line {line_no} is not valid JSON ({e})")
+    return rows
+
+
+def parse_parquet(raw):
+    # Expected columns: user_id, assessment_id, responses (list<struct<question_id, value, text>>)
+    # and optionally completed_at
+    import pyarrow.parquet as pq
+    try:
+        table = pq.read_table(io.BytesIO(raw))
+    except Exception as e:
+        raise ImportFailed(f"Could not read Parquet upload ({e})")
+    return table.to_pylist()
+
+
+def parse_upload(raw, content_type, filename=None):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if (filename or "").endswith(".parquet") or content_type in PARQUET_TYPES:
+        return parse_parquet(raw)
+    return parse_jsonl(raw)
+
+
+def _validate(row):
+    # (normalized row, None) or (None, error message)
+    try:
+        submission = msgspec.convert(row, Submission, strict=False)
+    except msgspec.ValidationError as e:
+        return None, str(e)
+    return msgspec.to_builtins(submission), None
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def import_submissions(client, rows, chunk_size=IMPORT_CHUNK_SIZE):
+    if len(rows) > IMPORT_MAX_ROWS:
+        raise ImportFailed(f"Too many rows ({len(rows)} > {IMPORT_MAX_ROWS})")
+
+    results = [None] * len(rows)
+    valid = []
+    codes = []
+    rows = list(rows)
+    errors = {}
+    for i, row in enumerate(rows):
+        row, errors[i] = _validate(row)
+        if row is not None:
+            rows[i] = row
+
+    # Each distinct assessment is looked up once per upload, not once per row
+    assessment_ids = {rows[i]["assessment_id"] for i, error in errors.items() if error is None}
+    code_by_id = {assessment_id: scoring_engine.code_for(assessment_id, client) for assessment_id in assessment_ids}
+
+    for i in range(len(rows)):
+        error = errors[i]
+        code = None
+        if error is None:
+            code = code_by_id[rows[i]["assessment_id"]]
+            if code is None:
+                error = "Assessment not found"
+        if error is not None:
+            results[i] = {"row": i, "status": "error", "error": error}
+            continue
+        valid.append(i)
+        codes.append(code)
+
+    if valid:
+        totals, risk_levels = scoring_engine.score_batch(
+            codes, [[r.get("value") for r in rows[i]["responses"]] for i in valid]
+        )
+        scored = list(zip(valid, totals.tolist(), risk_levels.tolist()))
+    else:
+        scored = []
+
+    for chunk in _chunks(scored, chunk_size):
+        # Ids are assigned here so results match rows without relying on the
+        # order PostgREST returns them in
+        submissions = []
+        for i, total_score, risk_level in chunk:
+            submissions.append({
+                "id": str(uuid.uuid4()),
+                "user_id": rows[i]["user_id"],
+                "assessment_id": rows[i]["assessment_id"],
+                "total_score": total_score,
+                "risk_level": risk_level,
+                "completed_at": str(rows[i]["completed_at"]) if rows[i].get("completed_at") else None,
+                "responses": [
+                    {"question_id": r["question_id"], "value": r.get("value"), "text": r.get("text")}
+                    for r in rows[i]["responses"]
+                ],
+            })
+
+        try:
+            # One transaction per chunk (assessment_import.sql): a failed chunk saves nothing
+            client.rpc("import_assessments", {"submissions": submissions}).execute()
+        except Exception as e:
+            for i, _, _ in chunk:
+                results[i] = {"row": i, "status": "error", "error": str(e)}
+            continue
+
+        for (i, total_score, risk_level), submission in zip(chunk, submissions):
+            results[i] = {
+                "row": i,
+                "status": "ok",
+                "id": submission["id"],
+                "total_score": total_score,
+                "risk_level": risk_level
+            }
+
+    return results
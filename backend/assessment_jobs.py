@@ -0,0 +1,123 @@
+# backend/assessment_jobs.py
+# Background queue for AI analysis of submitted assessments.
+# submit_assessment stores the scored row right away and enqueues a job here;
+# worker threads run the slow LLM call and patch the row's ai_analysis later.
+import os
+import logging
+import time
+import queue
+import threading
+
+ASSESSMENT_WORKERS = int(os.environ.get("ASSESSMENT_WORKERS", "2"))
+ASSESSMENT_QUEUE_SIZE = int(os.environ.get("ASSESSMENT_QUEUE_SIZE", "1000"))
+# How long finished jobs stay queryable in memory (seconds)
+ASSESSMENT_JOB_RETENTION = float(os.environ.get("ASSESSMENT_JOB_RETENTION", "3600"))
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    def __init__(self, job_id, owner=None):
+        self.id = job_id
+        # User the result belongs to; only they may read it from memory
+        self.owner = owner
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self._event = threading.Event()
+
+    def finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self._event.set()
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
+    def to_dict(self):
+        return {"id": self.id, "status": self.status, "ai_analysis": self.result, "error": self.error}
+
+
+class JobQueue:
+    def __init__(self, handler, workers=ASSESSMENT_WORKERS, max_queue=ASSESSMENT_QUEUE_SIZE,
+                 retention=ASSESSMENT_JOB_RETENTION):
+        self.handler = handler
+        self.workers = workers
+        self.retention = retention
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._closed = False
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"assessment-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, job_id, *args, owner=None):
+        # Raises queue.Full if the backlog is at capacity or the queue is shutting down
+        if self._closed:
+            raise queue.Full("shutting down")
+        self.start()
+        job = Job(job_id, owner)
+        self._queue.put_nowait((job, args))
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def close(self, timeout):
+        # Stop taking jobs and give queued ones up to `timeout` seconds to finish.
+        # Returns True if the queue drained in time.
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for j in self._jobs.values() if j.status == RUNNING)
+            failed = sum(1 for j in self._jobs.values() if j.status == FAILED)
+        return {"queued": self._queue.qsize(), "running": running, "recent_failed": failed}
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        stale = [k for k, j in self._jobs.items() if j.finished_at and j.finished_at < cutoff]
+        for k in stale:
+            del self._jobs[k]
+
+    def _run(self):
+        while True:
+            job, args = self._queue.get()
+            job.status = RUNNING
+            try:
+                job.finish(DONE, result=self.handler(*args))
+            except Exception as e:
+                logger.error("Assessment job failed", extra={"job_id": job.id, "error": str(e)})
+                job.finish(FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
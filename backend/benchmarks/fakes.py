@@ -0,0 +1,316 @@
+# backend/benchmarks/fakes.py
+# Local stand-ins for Ollama's /api/chat, Supabase's PostgREST API and a
+# remote media origin (for /api/media), with configurable latency, so the
+# backend can be load-tested without a model, a database or the internet.
+# Run standalone to point a separately started server at them:
+#   python -m benchmarks.fakes --ollama-port 11500 --rest-port 54400 --media-port 54500
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qsl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Catalog rows the submit traffic refers to
+ASSESSMENTS = [
+    {"id": "bench-phq9", "code": "PHQ-9", "name": "Depression Screening (PHQ-9)", "question_count": 9},
+    {"id": "bench-gad7", "code": "GAD-7", "name": "Anxiety Assessment (GAD-7)", "question_count": 7},
+]
+
+
+class Latency:
+    # Fixed delay plus uniform jitter (a fraction of the delay)
+    def __init__(self, seconds=0.0, jitter=0.2):
+        self.seconds = seconds
+        self.jitter = jitter
+
+    def sample(self):
+        if self.seconds <= 0:
+            return 0.0
+        return max(0.0, self.seconds * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def sleep(self):
+        time.sleep(self.sample())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def _send_json(self, obj, status=200, headers=None):
+        out = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(out)
+
+
+# --- Ollama ---
+
+def _canned_reply(payload):
+    # Shape the reply after what each prompt asks for
+    prompt = " ".join(m.get("content", "") for m in payload.get("messages", []))
+    if not payload.get("format"):
+        return "Thanks for sharing. It sounds like a lot is going on; let's take it one step at a time."
+    if "wellness plan" in prompt:
+        return json.dumps({"tasks": [
+            {"category": c, "title": f"{c} task", "description": f"A small {c.lower()} step for today."}
+            for c in ("Sleep", "Nutrition", "Movement", "Mindfulness")
+        ]})
+    if "assessment results" in prompt:
+        return json.dumps({"summary": "Scores are in the expected range.", "recommendations": ["Keep a routine"]})
+    return json.dumps({
+        "mood": random.choice(["Good", "Okay", "Not Good"]), "risk_level": random.choice(["Low", "Low", "Medium"]),
+        "summary": "A busy day.", "routine": "Classes", "likes": ["music"], "dislikes": ["deadlines"],
+        "important_terms": ["exam"], "panic_words": [],
+    })
+
+
+class OllamaHandler(_Handler):
+    def do_POST(self):
+        payload = self._body() or {}
+        server = self.server
+        # Like Ollama, only `parallel` generations run at once; the rest wait
+        with server.slots:
+            server.first_token.sleep()
+            reply = _canned_reply(payload)
+            if not payload.get("stream"):
+                time.sleep(server.token_delay.sample() * server.tokens)
+                return self._send_json({"model": payload.get("model"), "message": {"role": "assistant", "content": reply},
+                                        "done": True})
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            words = reply.split(" ")
+            step = max(1, len(words) // max(1, server.tokens))
+            pieces = [" ".join(words[i:i + step]) + " " for i in range(0, len(words), step)]
+            for piece in pieces:
+                time.sleep(server.token_delay.sample())
+                self._chunk({"message": {"role": "assistant", "content": piece}, "done": False})
+            self._chunk({"message": {"role": "assistant", "content": ""}, "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, obj):
+        line = json.dumps(obj).encode("utf-8") + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+
+def start_ollama(port=0, first_token=0.5, token_delay=0.02, tokens=40, parallel=2, jitter=0.2):
+    server = ThreadingHTTPServer(("127.0.0.1", port), OllamaHandler)
+    server.daemon_threads = True
+    server.first_token = Latency(first_token, jitter)
+    server.token_delay = Latency(token_delay, jitter)
+    server.tokens = tokens
+    server.slots = threading.BoundedSemaphore(max(1, parallel))
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server
+
+
+# --- PostgREST ---
+
+class Tables:
+    # In-memory rows per table; enough of PostgREST for the backend's queries
+    def __init__(self):
+        self._rows = {"assessments": [dict(a) for a in ASSESSMENTS]}
+        self._lock = threading.Lock()
+
+    def insert(self, table, rows):
+        now = datetime.now(timezone.utc).isoformat()
+        stored = []
+        with self._lock:
+            target = self._rows.setdefault(table, [])
+            for row in rows:
+                row = dict(row)
+                row.setdefault("id", str(uuid.uuid4()))
+                row.setdefault("created_at", now)
+                if table == "user_assessments":
+                    row.setdefault("completed_at", now)
+                target.append(row)
+                stored.append(row)
+            # Keep memory flat during long runs
+            if len(target) > 50000:
+                del target[:len(target) - 50000]
+        return stored
+
+    def select(self, table, filters, order=None, limit=None):
+        with self._lock:
+            rows = list(self._rows.get(table, []))
+        for matches in filters:
+            rows = [r for r in rows if matches(r)]
+        # Stable sorts, last key first, for multi-column orders like created_at,id
+        for term in reversed((order or "").split(",") if order else []):
+            column, _, direction = term.partition(".")
+            rows.sort(key=lambda r: str(r.get(column) or ""), reverse=direction.startswith("desc"))
+        return rows[:limit] if limit else rows
+
+    def count(self, table):
+        with self._lock:
+            return len(self._rows.get(table, []))
+
+
+KEYSET = re.compile(r'^\((\w+)\.(lt|gt)\."([^"]*)",and\((\w+)\.eq\."([^"]*)",id\.(?:lt|gt)\."([^"]*)"\)\)$')
+
+
+def _compare(value, op, target):
+    value = str(value)
+    return value == target if op == "eq" else value < target if op == "lt" else value > target
+
+
+def _keyset(row, column, op, ts, row_id):
+    return _compare(row.get(column), op, ts) or (str(row.get(column)) == ts and _compare(row.get("id"), op, row_id))
+
+
+class RestHandler(_Handler):
+    def _route(self):
+        parts = urlsplit(self.path)
+        segments = [s for s in parts.path.split("/") if s]
+        return segments, parse_qsl(parts.query, keep_blank_values=True)
+
+    def _query(self, params):
+        # Filters become row predicates: col=eq./lt./gt.value and the keyset
+        # or=(col.gt."ts",and(col.eq."ts",id.gt."id")) used by pagination.py
+        filters, order, limit = [], None, None
+        for key, value in params:
+            if key == "order":
+                order = value
+            elif key == "limit":
+                limit = int(value)
+            elif key == "or":
+                match = KEYSET.match(value)
+                if match:
+                    column, op, ts, _, _, row_id = match.groups()
+                    filters.append(lambda r, c=column, o=op, t=ts, i=row_id: _keyset(r, c, o, t, i))
+            elif value[:3] in ("eq.", "lt.", "gt."):
+                filters.append(lambda r, c=key, o=value[:2], v=value[3:]: _compare(r.get(c), o, v))
+        return filters, order, limit
+
+    def do_GET(self):
+        self.server.latency.sleep()
+        segments, params = self._route()
+        if segments[:2] == ["auth", "v1"]:
+            return self._send_json({"id": "bench-user", "aud": "authenticated", "role": "authenticated",
+                                    "app_metadata": {}, "user_metadata": {},
+                                    "created_at": "2024-01-01T00:00:00+00:00"})
+        table = segments[-1]
+        filters, order, limit = self._query(params)
+        rows = self.server.tables.select(table, filters, order, limit)
+        if "vnd.pgrst.object" in (self.headers.get("Accept") or ""):
+            if len(rows) != 1:
+                return self._send_json({"message": "JSON object requested, multiple (or no) rows returned"}, 406)
+            return self._send_json(rows[0])
+        self._send_json(rows)
+
+    def do_POST(self):
+        self.server.latency.sleep()
+        segments, _ = self._route()
+        body = self._body()
+        if "rpc" in segments:
+            if segments[-1] == "import_assessments":
+                for submission in body["submissions"]:
+                    submission = dict(submission)
+                    responses = submission.pop("responses")
+                    if not submission.get("completed_at"):
+                        submission.pop("completed_at", None)
+                    self.server.tables.insert("user_assessments", [submission])
+                    self.server.tables.insert("user_assessment_responses", [
+                        {"user_assessment_id": submission["id"], "question_id": r["question_id"],
+                         "response_value": r["value"], "response_text": r["text"]} for r in responses
+                    ])
+            return self._send_json(None)
+        rows = self.server.tables.insert(segments[-1], body if isinstance(body, list) else [body])
+        self._send_json(rows, 201)
+
+    def do_PATCH(self):
+        self.server.latency.sleep()
+        self._body()
+        self._send_json([])
+
+
+def start_rest(port=0, latency=0.01, jitter=0.2):
+    server = ThreadingHTTPServer(("127.0.0.1", port), RestHandler)
+    server.daemon_threads = True
+    server.latency = Latency(latency, jitter)
+    server.tables = Tables()
+    threading.Thread(target=server.serve_forever, name="fake-postgrest", daemon=True).start()
+    return server
+
+
+# --- Media origin ---
+
+class MediaHandler(_Handler):
+    # GET /audio/<name>.ogg returns `size` deterministic bytes after `latency`
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if not path.startswith("/audio/") or not path.endswith(".ogg"):
+            return self._send_json({"error": "not found"}, 404)
+        with self.server.lock:
+            self.server.fetches += 1
+        self.server.latency.sleep()
+        block = (path.encode("utf-8") * 64)[:4096]
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/ogg")
+        self.send_header("Content-Length", str(self.server.size))
+        self.end_headers()
+        remaining = self.server.size
+        while remaining > 0:
+            chunk = block[:min(len(block), remaining)]
+            self.wfile.write(chunk)
+            remaining -= len(chunk)
+
+
+def start_media(port=0, latency=0.2, size=2 * 1024 * 1024, jitter=0.2):
+    server = ThreadingHTTPServer(("127.0.0.1", port), MediaHandler)
+    server.daemon_threads = True
+    server.latency = Latency(latency, jitter)
+    server.size = size
+    server.fetches = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name="fake-media", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run fake Ollama, PostgREST and media servers")
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--rest-port", type=int, default=54400)
+    parser.add_argument("--first-token", type=float, default=0.5, help="seconds before Ollama's first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds per streamed token")
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--ollama-parallel", type=int, default=2)
+    parser.add_argument("--db-latency", type=float, default=0.01, help="seconds per PostgREST call")
+    parser.add_argument("--media-port", type=int, default=54500)
+    parser.add_argument("--media-latency", type=float, default=0.2, help="seconds before the origin responds")
+    args = parser.parse_args()
+
+    start_ollama(args.ollama_port, args.first_token, args.token_delay, args.tokens, args.ollama_parallel)
+    start_rest(args.rest_port, args.db_latency)
+    start_media(args.media_port, args.media_latency)
+    print(f"OLLAMA_CHAT_URL=http://127.0.0.1:{args.ollama_port}/api/chat")
+    print(f"VITE_SUPABASE_URL=http://127.0.0.1:{args.rest_port}")
+    print("MEDIA_ALLOWED_HOSTS=127.0.0.1")
+    print(f"# media URLs: http://127.0.0.1:{args.media_port}/audio/<name>.ogg")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+# backend/benchmarks/run.py
+# Offline load test: starts the fake Ollama and PostgREST servers (fakes.py),
+# runs the backend against them and replays a weighted mix of chat, streamed
+# chat, analyze, plan and submit traffic at each concurrency level (add e.g.
+# media=2 to --mix for /api/media against the fake origin). Reports
+# throughput and p50/p95/p99 latency per route; with --baseline it exits
+# non-zero if any route's p95 regressed by more than --max-regression.
+#
+#   cd backend
+#   python -m benchmarks.run --concurrency 1,8,32 --duration 20
+#   python -m benchmarks.run --server wsgi --output bench.json
+#   python -m benchmarks.run --baseline bench.json
+import os
+import sys
+import json
+import time
+import socket
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from urllib.parse import quote
+
+import numpy as np
+import requests
+
+from benchmarks import fakes
+
+DEFAULT_MIX = "chat=4,chat_stream=1,analyze=3,plan=1,submit=1"
+
+WORDS = (
+    "today class exam friends tired happy stressed sleep project deadline walk music library "
+    "anxious calm hostel food family call lecture assignment gym coffee rain weekend grades"
+).split()
+MOODS = ["Great", "Good", "Okay", "Not Good", "Awful"]
+# Distinct tracks the media traffic asks for
+MEDIA_TRACKS = 8
+
+
+class Traffic:
+    # Builds request bodies; `repeat` is the share of analyze/plan bodies that
+    # reuse an earlier one, as students often resubmit near-identical entries
+    def __init__(self, repeat, seed=None, media_origin=None):
+        self.repeat = repeat
+        self.media_origin = media_origin
+        self.rng = random.Random(seed)
+        self.seen = {"analyze": [], "plan": []}
+
+    def _text(self, words):
+        return " ".join(self.rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def _maybe_repeat(self, route, build):
+        seen = self.seen[route]
+        if seen and self.rng.random() < self.repeat:
+            return self.rng.choice(seen)
+        body = build()
+        if len(seen) < 1000:
+            seen.append(body)
+        return body
+
+    def chat(self):
+        return "POST", "/chat", {"message": self._text(12)}
+
+    def chat_stream(self):
+        return "POST", "/chat", {"message": self._text(12), "stream": True}
+
+    def analyze(self):
+        return "POST", "/analyze", self._maybe_repeat("analyze", lambda: {"content": self._text(120)})
+
+    def plan(self):
+        return "POST", "/generate_plan", self._maybe_repeat("plan", lambda: {
+            "mood": self.rng.choice(MOODS), "journal_summary": self._text(20)
+        })
+
+    def submit(self):
+        assessment = self.rng.choice(fakes.ASSESSMENTS)
+        return "POST", "/api/assessments/submit", {
+            "user_id": f"bench-user-{self.rng.randrange(500)}",
+            "assessment_id": assessment["id"],
+            "responses": [{"question_id": f"q{i}", "value": self.rng.randrange(4)}
+                          for i in range(assessment["question_count"])],
+        }
+
+    def media(self):
+        url = f"{self.media_origin}/audio/track-{self.rng.randrange(MEDIA_TRACKS)}.ogg"
+        return "GET", f"/api/media?url={quote(url, safe='')}", None
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not hasattr(Traffic, name) or name.startswith("_"):
+            raise SystemExit(f"Unknown route in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def send(session, base_url, method, path, body, stream):
+    # Returns (status, seconds to first byte, total seconds)
+    started = time.perf_counter()
+    try:
+        r = session.request(method, base_url + path, json=body, stream=stream, timeout=120)
+        first = None
+        if stream:
+            for _ in r.iter_content(chunk_size=None):
+                if first is None:
+                    first = time.perf_counter() - started
+        else:
+            r.content
+        total = time.perf_counter() - started
+        return r.status_code, first if first is not None else total, total
+    except requests.RequestException:
+        total = time.perf_counter() - started
+        return 0, total, total
+
+
+def run_level(base_url, mix, concurrency, duration, max_requests, repeat, seed, media_origin=None):
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = {name: [] for name in names}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    issued = [0]
+
+    def worker(index):
+        traffic = Traffic(repeat, seed=None if seed is None else seed + index, media_origin=media_origin)
+        session = requests.Session()
+        # Any token passes the fake auth endpoint
+        session.headers["Authorization"] = "Bearer bench-token"
+        while time.monotonic() < deadline:
+            with lock:
+                if max_requests and issued[0] >= max_requests:
+                    return
+                issued[0] += 1
+            name = traffic.rng.choices(names, weights)[0]
+            method, path, body = getattr(traffic, name)()
+            sample = send(session, base_url, method, path, body, stream=name in ("chat_stream", "media"))
+            with lock:
+                samples[name].append(sample)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    return summarize(samples, elapsed)
+
+
+def summarize(samples, elapsed):
+    report = {}
+    for name, rows in samples.items():
+        if not rows:
+            continue
+        status = np.array([r[0] for r in rows])
+        ttfb = np.array([r[1] for r in rows]) * 1000
+        total = np.array([r[2] for r in rows]) * 1000
+        p50, p95, p99 = np.percentile(total, [50, 95, 99])
+        report[name] = {
+            "requests": len(rows),
+            "errors": int(((status < 200) | (status >= 300)).sum()),
+            "shed_503": int((status == 503).sum()),
+            "rps": round(len(rows) / elapsed, 2),
+            "p50_ms": round(float(p50), 1),
+            "p95_ms": round(float(p95), 1),
+            "p99_ms": round(float(p99), 1),
+            "max_ms": round(float(total.max()), 1),
+            "ttfb_p50_ms": round(float(np.percentile(ttfb, 50)), 1),
+        }
+    return report
+
+
+def print_report(concurrency, report):
+    print(f"\nconcurrency={concurrency}")
+    header = f"{'route':<12}{'reqs':>7}{'err':>6}{'503':>6}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'ttfb50':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, r in report.items():
+        print(f"{name:<12}{r['requests']:>7}{r['errors']:>6}{r['shed_503']:>6}{r['rps']:>9}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}{r['ttfb_p50_ms']:>10}")
+
+
+def compare(results, baseline, max_regression):
+    # p95 per (concurrency, route); returns a list of regression messages
+    problems = []
+    for level, routes in results.items():
+        for name, r in routes.items():
+            base = baseline.get(level, {}).get(name)
+            if not base or not base["p95_ms"]:
+                continue
+            change = r["p95_ms"] / base["p95_ms"] - 1
+            if change > max_regression:
+                problems.append(f"concurrency={level} {name}: p95 {base['p95_ms']}ms -> {r['p95_ms']}ms (+{change:.0%})")
+    return problems
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"Backend did not start listening on port {port}")
+
+
+def backend_env(ollama_url, rest_url, workdir):
+    return {
+        "OLLAMA_CHAT_URL": ollama_url,
+        "VITE_SUPABASE_URL": rest_url,
+        "VITE_SUPABASE_PUBLISHABLE_KEY": "bench.anon.key",
+        "SUPABASE_SERVICE_ROLE_KEY": "bench.service.key",
+        "LLM_CACHE_BACKEND": "memory",
+        "ACTIVITY_JOURNAL_PATH": os.path.join(workdir, "activity_journal.jsonl"),
+        "ANALYTICS_DIR": os.path.join(workdir, "analytics"),
+        "MEDIA_CACHE_DIR": os.path.join(workdir, "media"),
+        "MEDIA_ALLOWED_HOSTS": "127.0.0.1",
+        "LOG_LEVEL": "WARNING",
+        "SLOW_REQUEST_SECONDS": "3600",
+        "FLASK_DEBUG": "0",
+    }
+
+
+def start_backend(mode, env):
+    # Returns (base_url, stop function)
+    port = _free_port()
+    if mode == "inprocess":
+        os.environ.update(env)
+        import logging
+        from werkzeug.serving import make_server
+        import app
+        # The dev server's access log would interleave with the report
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        server = make_server("127.0.0.1", port, app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, name="bench-backend", daemon=True).start()
+        return f"http://127.0.0.1:{port}", server.shutdown
+
+    process = subprocess.Popen(
+        [sys.executable, "wsgi.py"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=dict(os.environ, **env, WEB_PORT=str(port)),
+    )
+    _wait_for_port(port)
+
+    def stop():
+        process.terminate()
+        process.wait(timeout=60)
+    return f"http://127.0.0.1:{port}", stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the backend against fake Ollama and PostgREST servers")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"route=weight list (default {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated client counts, run in turn")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per concurrency level")
+    parser.add_argument("--requests", type=int, default=0, help="stop a level after this many requests")
+    parser.add_argument("--repeat", type=float, default=0.2, help="share of analyze/plan bodies that repeat")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--server", choices=["inprocess", "wsgi"], default="inprocess",
+                        help="inprocess: threaded dev server in this process; wsgi: python wsgi.py")
+    parser.add_argument("--url", help="benchmark an already running backend instead (fakes are not started)")
+    parser.add_argument("--first-token", type=float, default=0.5, help="fake Ollama seconds to first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="fake Ollama seconds per token")
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--ollama-parallel", type=int, default=2)
+    parser.add_argument("--db-latency", type=float, default=0.01, help="fake PostgREST seconds per call")
+    parser.add_argument("--media-latency", type=float, default=0.2, help="fake media origin seconds to respond")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier --output run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 increase (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    stop = None
+    media_origin = None
+    if args.url:
+        if "media" in mix:
+            raise SystemExit("media traffic needs the fake origin, which --url does not start")
+        base_url = args.url.rstrip("/")
+    else:
+        ollama = fakes.start_ollama(first_token=args.first_token, token_delay=args.token_delay,
+                                    tokens=args.tokens, parallel=args.ollama_parallel)
+        rest = fakes.start_rest(latency=args.db_latency)
+        media = fakes.start_media(latency=args.media_latency)
+        media_origin = f"http://127.0.0.1:{media.server_port}"
+        # /api/media only serves catalog URLs
+        rest.tables.insert("ambient_sounds", [
+            {"name": f"Track {i}", "url": f"{media_origin}/audio/track-{i}.ogg"} for i in range(MEDIA_TRACKS)
+        ])
+        workdir = tempfile.mkdtemp(prefix="bench-")
+        env = backend_env(f"http://127.0.0.1:{ollama.server_port}/api/chat",
+                          f"http://127.0.0.1:{rest.server_port}", workdir)
+        base_url, stop = start_backend(args.server, env)
+
+    results = {}
+    try:
+        for level in levels:
+            report = run_level(base_url, mix, level, args.duration, args.requests, args.repeat, args.seed,
+                               media_origin)
+            results[str(level)] = report
+            print_report(level, report)
+    finally:
+        if stop:
+            stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline, args.max_regression)
+        if problems:
+            print("\nRegressions:")
+            for line in problems:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo p95 regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# backend/catalog_cache.py
+# Read-through cache for the static assessment catalog.
+# Values are stored already serialized together with an ETag so a hit costs
+# neither a Supabase round trip nor a JSON encode.
+import os
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+
+CATALOG_CACHE_TTL = float(os.environ.get("CATALOG_CACHE_TTL", "600"))
+# max-age sent to browsers; they revalidate with If-None-Match afterwards
+CATALOG_MAX_AGE = int(os.environ.get("CATALOG_MAX_AGE", "300"))
+
+
+class CatalogEntry:
+    def __init__(self, body, expires_at):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.expires_at = expires_at
+
+
+class CatalogCache:
+    def __init__(self, ttl=CATALOG_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        # One loader per key at a time, so a miss doesn't stampede Supabase.
+        # key -> [lock, waiters]; dropped when the last waiter is done
+        self._key_locks = {}
+
+    @contextmanager
+    def _key_lock(self, key):
+        with self._lock:
+            holder = self._key_locks.get(key)
+            if holder is None:
+                holder = self._key_locks[key] = [threading.Lock(), 0]
+            holder[1] += 1
+        try:
+            with holder[0]:
+                yield
+        finally:
+            with self._lock:
+                holder[1] -= 1
+                if holder[1] == 0:
+                    del self._key_locks[key]
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.time():
+            return entry
+        return None
+
+    def get_or_load(self, key, loader, serialize):
+        entry = self._fresh(key)
+        if entry is not None:
+            return entry
+
+        with self._key_lock(key):
+            entry = self._fresh(key)
+            if entry is not None:
+                return entry
+            body = serialize(loader())
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            entry = CatalogEntry(body, time.time() + self.ttl)
+            with self._lock:
+                self._entries[key] = entry
+            return entry
+
+    def invalidate(self, prefix=None):
+        with self._lock:
+            if prefix is None:
+                count = len(self._entries)
+                self._entries.clear()
+                return count
+            stale = [k for k in self._entries if k.startswith(prefix)]
+            for k in stale:
+                del self._entries[k]
+            return len(stale)
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,256 @@
+# backend/chat_sessions.py
+# Server-side conversation state for /chat.
+# Each conversation keeps the last CHAT_WINDOW_MESSAGES messages verbatim plus
+# a rolling summary of everything older, so the prompt sent to Ollama stays
+# about the same size however long the conversation runs.
+#
+# Ollama reuses its KV cache for the longest prefix shared with the previous
+# prompt while the model stays loaded (keep_alive, see llm_client). The prompt
+# is therefore only ever appended to between compactions: a turn prefills just
+# the new message. When the window overflows, all but its newest half is folded
+# into the summary by a background call, so the prefix changes once every few
+# turns instead of every turn, and the request that triggered it doesn't wait.
+#
+# Sessions are kept in SQLite (CHAT_SESSION_PATH) so every worker on the host
+# sees the same conversations; a turn may land on any of them. They expire
+# after CHAT_SESSION_TTL idle seconds and are evicted least-recently-used
+# beyond CHAT_MAX_SESSIONS.
+import os
+import json
+import time
+import uuid
+import atexit
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_client
+
+logger = logging.getLogger(__name__)
+
+CHAT_SESSION_PATH = os.environ.get("CHAT_SESSION_PATH", os.path.join(os.path.dirname(__file__), "chat_sessions.sqlite3"))
+CHAT_MAX_SESSIONS = int(os.environ.get("CHAT_MAX_SESSIONS", "1000"))
+CHAT_SESSION_TTL = float(os.environ.get("CHAT_SESSION_TTL", str(60 * 60)))
+# Recent messages (user + assistant) kept verbatim in the prompt
+CHAT_WINDOW_MESSAGES = int(os.environ.get("CHAT_WINDOW_MESSAGES", "12"))
+# Past this many verbatim messages (a compaction kept failing) the oldest are dropped unsummarized
+CHAT_MAX_MESSAGES = CHAT_WINDOW_MESSAGES * 2
+# A compaction claimed by a worker that died is retried after this long
+CHAT_COMPACTION_LEASE = 120.0
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a student and a campus "
+    "wellness assistant. Merge the earlier summary (if any) with the new messages into one "
+    "summary of at most 150 words. Keep what the student shared about themselves, how they "
+    "are feeling, advice already given and anything still unresolved. Reply with the summary only."
+)
+
+
+class ChatSession:
+    # Snapshot of a stored session, taken when the turn started
+    def __init__(self, session_id, owner, summary="", messages=None):
+        self.id = session_id
+        self.owner = owner
+        self.summary = summary
+        self.messages = messages or []
+
+    def prompt(self, user_message):
+        # Summary first, then the verbatim window, then the new message
+        prompt = []
+        if self.summary:
+            prompt.append({"role": "system", "content": f"Summary of the conversation so far: {self.summary}"})
+        return prompt + list(self.messages) + [{"role": "user", "content": user_message}]
+
+
+def _connect(path):
+    # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS chat_sessions ("
+        "id TEXT PRIMARY KEY, owner TEXT, summary TEXT NOT NULL, messages TEXT NOT NULL, "
+        "compacting_until REAL NOT NULL DEFAULT 0, last_used REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_used ON chat_sessions (last_used)")
+    return conn
+
+
+class SessionStore:
+    def __init__(self, path=CHAT_SESSION_PATH, max_sessions=CHAT_MAX_SESSIONS, ttl=CHAT_SESSION_TTL,
+                 window=CHAT_WINDOW_MESSAGES, max_messages=CHAT_MAX_MESSAGES):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.window = max(2, window)
+        self.max_messages = max(self.window, max_messages)
+        try:
+            self._conn = _connect(path)
+        except sqlite3.Error as e:
+            # Still works, but only for turns that land on this worker
+            logger.warning("Could not open chat session store, using memory", extra={"path": path, "error": str(e)})
+            self._conn = _connect(":memory:")
+        self._lock = threading.Lock()
+        # One summarizer thread is plenty, and keeps compactions from crowding out chat for Ollama slots
+        self._summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+        self.created = 0
+        self.evicted = 0
+        self.expired = 0
+        self.compactions = 0
+        self.failed_compactions = 0
+        self.truncated = 0
+
+    def _transaction(self, fn, *args):
+        # Serializes this process's threads; BEGIN IMMEDIATE serializes the other workers
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(*args)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _load(self, session_id):
+        row = self._conn.execute(
+            "SELECT owner, summary, messages, compacting_until FROM chat_sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None, 0.0
+        owner, summary, messages, compacting_until = row
+        return ChatSession(session_id, owner, summary, json.loads(messages)), compacting_until
+
+    def _save(self, session, now, compacting_until=None):
+        self._conn.execute(
+            "UPDATE chat_sessions SET summary = ?, messages = ?, last_used = ?, "
+            "compacting_until = COALESCE(?, compacting_until) WHERE id = ?",
+            (session.summary, json.dumps(session.messages), now, compacting_until, session.id)
+        )
+
+    def get_or_create(self, session_id, owner=None):
+        # Unknown, expired or someone else's id -> a fresh session with a new id
+        return self._transaction(self._get_or_create, session_id, owner, time.time())
+
+    def _get_or_create(self, session_id, owner, now):
+        self.expired += self._conn.execute(
+            "DELETE FROM chat_sessions WHERE last_used <= ?", (now - self.ttl,)
+        ).rowcount
+        session = self._load(session_id)[0] if session_id else None
+        if session is None or session.owner != owner:
+            session = ChatSession(uuid.uuid4().hex, owner)
+            self._conn.execute(
+                "INSERT INTO chat_sessions (id, owner, summary, messages, last_used) VALUES (?, ?, '', '[]', ?)",
+                (session.id, owner, now)
+            )
+            self.created += 1
+            self.evicted += self._conn.execute(
+                "DELETE FROM chat_sessions WHERE id IN ("
+                "SELECT id FROM chat_sessions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            ).rowcount
+        else:
+            self._conn.execute("UPDATE chat_sessions SET last_used = ? WHERE id = ?", (now, session_id))
+        return session
+
+    def record(self, session, user_message, reply, model):
+        # Append a completed turn; failed turns are never recorded
+        fold = self._transaction(self._record, session.id, user_message, reply, time.time())
+        if fold is None:
+            return
+        try:
+            self._summarizer.submit(self._compact, session.id, fold, model)
+        except RuntimeError:
+            # Shutting down
+            self._transaction(self._release, session.id)
+
+    def _record(self, session_id, user_message, reply, now):
+        # Re-read: another worker may have added turns or compacted since the snapshot
+        session, compacting_until = self._load(session_id)
+        if session is None:
+            # Expired or evicted mid-turn
+            return None
+        session.messages.append({"role": "user", "content": user_message})
+        session.messages.append({"role": "assistant", "content": reply})
+        if len(session.messages) > self.max_messages:
+            drop = len(session.messages) - self.window
+            del session.messages[:drop]
+            self.truncated += 1
+            logger.warning("Chat session dropped messages without summarizing",
+                           extra={"session_id": session_id, "dropped": drop})
+        if len(session.messages) <= self.window or compacting_until > now:
+            self._save(session, now)
+            return None
+        self._save(session, now, compacting_until=now + CHAT_COMPACTION_LEASE)
+        # Fold all but the newest half-window (whole turns), so the next
+        # compaction is a few turns away and the prefix stays put until then
+        keep = max(2, (self.window // 2) & ~1)
+        return {"summary": session.summary, "messages": session.messages[:len(session.messages) - keep]}
+
+    def _release(self, session_id):
+        self._conn.execute("UPDATE chat_sessions SET compacting_until = 0 WHERE id = ?", (session_id,))
+
+    def _compact(self, session_id, fold, model):
+        transcript = "\n".join(
+            f"{'Student' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in fold["messages"]
+        )
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"Earlier summary: {fold['summary'] or '(none)'}\n\nNew messages:\n{transcript}"},
+            ],
+            "stream": False,
+            "options": {"temperature": 0.2},
+        }
+        try:
+            summary = llm_client.chat(payload, timeout=60).get("message", {}).get("content", "").strip()
+            if not summary:
+                raise ValueError("empty summary")
+        except Exception as e:
+            # Busy or unreachable model: left as is, the next turn tries again
+            self._transaction(self._release, session_id)
+            self.failed_compactions += 1
+            logger.warning("Chat session summary failed", extra={"session_id": session_id, "error": str(e)})
+            return
+        if self._transaction(self._apply_summary, session_id, fold["messages"], summary):
+            self.compactions += 1
+
+    def _apply_summary(self, session_id, folded, summary):
+        session = self._load(session_id)[0]
+        if session is None:
+            return False
+        self._release(session_id)
+        # Only replace what was summarized, unless truncation got there first
+        if session.messages[:len(folded)] != folded:
+            return False
+        del session.messages[:len(folded)]
+        session.summary = summary
+        self._conn.execute(
+            "UPDATE chat_sessions SET summary = ?, messages = ? WHERE id = ?",
+            (session.summary, json.dumps(session.messages), session_id)
+        )
+        return True
+
+    def stats(self):
+        return {
+            "sessions": len(self),
+            "created": self.created,
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "compactions": self.compactions,
+            "failed_compactions": self.failed_compactions,
+            "truncated": self.truncated,
+        }
+
+    def close(self):
+        self._summarizer.shutdown(wait=False, cancel_futures=True)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+
+def create_store():
+    store = SessionStore()
+    atexit.register(store.close)
+    return store
@@ -0,0 +1,363 @@
+# backend/cohort_analytics.py
+# Counselor cohort analytics over assessment and journal history.
+# user_assessments and journals are exported incrementally (keyset watermark
+# on insertion order, (created_at, id), per table) into a local Parquet
+# store, one part file per export batch. The export must run with the service
+# role: under a user's RLS the watermark would move past rows it never saw.
+# Queries load the store once into sorted, dictionary-encoded numpy arrays and
+# answer with vectorized operations, so they stay fast at hundreds of
+# thousands of rows without touching Supabase. Part files are immutable, so a
+# worker reloads a table only when its list of parts changes (an export by
+# any worker).
+import os
+import json
+import time
+import threading
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import pagination
+from scoring import engine as scoring_engine
+
+ANALYTICS_DIR = os.environ.get("ANALYTICS_DIR", os.path.join(os.path.dirname(__file__), "analytics_store"))
+ANALYTICS_EXPORT_PAGE_SIZE = int(os.environ.get("ANALYTICS_EXPORT_PAGE_SIZE", "1000"))
+# Rows inserted within this many seconds are left for the next export, so a
+# transaction that commits late can't land behind the watermark
+ANALYTICS_EXPORT_LAG = float(os.environ.get("ANALYTICS_EXPORT_LAG", "60"))
+
+# Same bands the dashboard rollups count as high risk
+HIGH_RISK_LEVELS = ("High", "Severe", "Moderately Severe")
+
+US_PER_DAY = 86400 * 1000000
+
+
+class ExportSpec:
+    def __init__(self, table, select, schema, flatten=None, order_column="created_at"):
+        self.table = table
+        self.select = select
+        self.schema = schema
+        self.flatten = flatten
+        # Watermark column, with id as the tie-breaker
+        self.order_column = order_column
+
+    @property
+    def state_key(self):
+        # Watermarks from an older export order are not reused
+        return f"{self.table}:{self.order_column}"
+
+
+def _flatten_assessment(row):
+    embedded = row.pop("assessments", None) or {}
+    row["code"] = embedded.get("code")
+    return row
+
+
+EXPORTS = {
+    "user_assessments": ExportSpec(
+        "user_assessments",
+        "id, user_id, assessment_id, total_score, risk_level, completed_at, created_at, assessments(code)",
+        pa.schema([
+            ("id", pa.string()),
+            ("user_id", pa.string()),
+            ("assessment_id", pa.string()),
+            ("code", pa.string()),
+            # Bulk imports may carry fractional totals
+            ("total_score", pa.float64()),
+            ("risk_level", pa.string()),
+            ("completed_at", pa.timestamp("us", tz="UTC")),
+        ]),
+        flatten=_flatten_assessment
+    ),
+    # Journal text stays in Supabase; only the derived signals are exported
+    "journals": ExportSpec(
+        "journals",
+        "id, user_id, mood, risk_level, created_at",
+        pa.schema([
+            ("id", pa.string()),
+            ("user_id", pa.string()),
+            ("mood", pa.string()),
+            ("risk_level", pa.string()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+        ])
+    ),
+}
+
+
+def _encode(column):
+    # Dictionary-encode a string column: (int codes, list of distinct values)
+    encoded = pc.dictionary_encode(column.combine_chunks())
+    return encoded.indices.to_numpy(zero_copy_only=False).astype(np.int64), encoded.dictionary.to_pylist()
+
+
+def _timestamps(column):
+    return column.combine_chunks().cast(pa.int64()).to_numpy(zero_copy_only=False)
+
+
+def _week_start_days(ts_us):
+    # Days since epoch of the Monday starting each timestamp's week (1970-01-01 was a Thursday)
+    days = ts_us // US_PER_DAY
+    return days - (days + 3) % 7
+
+
+def _iso_day(days):
+    return str(np.datetime64(int(days), "D"))
+
+
+def _iso_ts(ts_us):
+    return str(np.datetime64(int(ts_us), "us")) + "Z"
+
+
+def _score(value):
+    # Whole totals stay integers in the JSON
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class AssessmentFrame:
+    # Columns sorted by (code, user, completed_at) so per-student history is contiguous
+    def __init__(self, table):
+        user, self.users = _encode(table["user_id"])
+        code, self.codes = _encode(table["code"].fill_null(""))
+        risk, self.risks = _encode(table["risk_level"].fill_null(""))
+        ts = _timestamps(table["completed_at"])
+        score = table["total_score"].combine_chunks().fill_null(0).to_numpy(zero_copy_only=False)
+
+        order = np.lexsort((ts, user, code))
+        self.user, self.code, self.risk, self.ts, self.score = user[order], code[order], risk[order], ts[order], score[order]
+
+        # Severity rank of each row's band within its own instrument (-1 if unknown)
+        rank_table = np.full((max(len(self.codes), 1), max(len(self.risks), 1)), -1, dtype=np.int64)
+        for ci, c in enumerate(self.codes):
+            instrument = scoring_engine.instruments.get(c)
+            if instrument is None:
+                continue
+            for ri, r in enumerate(self.risks):
+                if r in instrument.labels:
+                    rank_table[ci, ri] = instrument.labels.index(r)
+        self.rank = rank_table[self.code, self.risk] if len(self.code) else np.zeros(0, dtype=np.int64)
+
+        high = np.array([r in HIGH_RISK_LEVELS for r in self.risks], dtype=bool)
+        self.high = high[self.risk] if len(self.risk) else np.zeros(0, dtype=bool)
+
+        n = len(self.user)
+        same_as_prev = np.zeros(n, dtype=bool)
+        if n > 1:
+            same_as_prev[1:] = (self.user[1:] == self.user[:-1]) & (self.code[1:] == self.code[:-1])
+        self.same_as_prev = same_as_prev
+        is_last = np.ones(n, dtype=bool)
+        if n > 1:
+            is_last[:-1] = ~same_as_prev[1:]
+        self.is_last = is_last
+
+    def code_mask(self, code):
+        if code is None:
+            return np.ones(len(self.code), dtype=bool)
+        if code not in self.codes:
+            return np.zeros(len(self.code), dtype=bool)
+        return self.code == self.codes.index(code)
+
+
+class JournalFrame:
+    def __init__(self, table):
+        risk, risks = _encode(table["risk_level"].fill_null(""))
+        self.ts = _timestamps(table["created_at"])
+        high = np.array([r == "High" for r in risks], dtype=bool)
+        self.high = high[risk] if len(risk) else np.zeros(0, dtype=bool)
+
+
+class CohortStore:
+    def __init__(self, root=ANALYTICS_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._frames = {}
+
+    def _table_dir(self, name):
+        return os.path.join(self.root, name)
+
+    def _state_path(self):
+        return os.path.join(self.root, "state.json")
+
+    def _load_state(self):
+        try:
+            with open(self._state_path(), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        tmp = self._state_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self._state_path())
+
+    def export(self, client):
+        # Pull rows newer than each table's watermark into new Parquet parts.
+        # Returns the number of rows exported per table.
+        with self._export_lock:
+            os.makedirs(self.root, exist_ok=True)
+            state = self._load_state()
+            exported = {}
+            for name, spec in EXPORTS.items():
+                exported[name] = self._export_table(client, spec, state)
+            return exported
+
+    def _export_table(self, client, spec, state):
+        os.makedirs(self._table_dir(spec.table), exist_ok=True)
+        watermark = state.get(spec.state_key)
+        cutoff = _iso_ts(_now_us() - int(ANALYTICS_EXPORT_LAG * 1000000))
+        total = 0
+        while True:
+            query = client.table(spec.table).select(spec.select).lt(spec.order_column, cutoff)
+            if watermark:
+                query = query.or_(pagination.keyset_filter(spec.order_column, watermark[0], watermark[1], descending=False))
+            rows = query.order(spec.order_column).order("id").limit(ANALYTICS_EXPORT_PAGE_SIZE).execute().data
+            if not rows:
+                break
+
+            watermark = [rows[-1][spec.order_column], rows[-1]["id"]]
+            if spec.flatten:
+                rows = [spec.flatten(dict(r)) for r in rows]
+            columns = {}
+            for field in spec.schema:
+                values = pa.array([r.get(field.name) for r in rows],
+                                  type=pa.string() if pa.types.is_timestamp(field.type) else field.type)
+                columns[field.name] = values.cast(field.type)
+            part = pa.Table.from_pydict(columns, schema=spec.schema)
+
+            path = os.path.join(self._table_dir(spec.table), f"part-{time.time_ns()}.parquet")
+            pq.write_table(part, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            state[spec.state_key] = watermark
+            self._save_state(state)
+            total += len(rows)
+
+            if len(rows) < ANALYTICS_EXPORT_PAGE_SIZE:
+                break
+        return total
+
+    def _read(self, name, parts):
+        directory = self._table_dir(name)
+        if not parts:
+            return EXPORTS[name].schema.empty_table()
+        table = pa.concat_tables([pq.read_table(os.path.join(directory, p), schema=EXPORTS[name].schema) for p in parts])
+        # A crash between writing a part and saving the watermark can export rows twice
+        ids = table["id"].to_numpy(zero_copy_only=False)
+        _, first = np.unique(ids, return_index=True)
+        if len(first) != len(ids):
+            table = table.take(pa.array(np.sort(first)))
+        return table
+
+    def _parts(self, name):
+        directory = self._table_dir(name)
+        return sorted(p for p in os.listdir(directory) if p.endswith(".parquet")) if os.path.isdir(directory) else []
+
+    def _frame(self, name, factory):
+        with self._lock:
+            parts = self._parts(name)
+            cached = self._frames.get(name)
+            if cached is not None and cached[0] == parts:
+                return cached[1]
+            frame = factory(self._read(name, parts))
+            self._frames[name] = (parts, frame)
+            return frame
+
+    def assessments(self):
+        return self._frame("user_assessments", AssessmentFrame)
+
+    def journals(self):
+        return self._frame("journals", JournalFrame)
+
+    # --- Queries ---
+
+    def risk_distribution(self, days=None, code=None):
+        # Current band of every student: their latest assessment per instrument
+        f = self.assessments()
+        mask = f.is_last & f.code_mask(code)
+        if days is not None:
+            mask &= f.ts >= _now_us() - days * US_PER_DAY
+
+        distribution = {}
+        if mask.any():
+            n_risks = max(len(f.risks), 1)
+            keys, counts = np.unique(f.code[mask] * n_risks + f.risk[mask], return_counts=True)
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                c, r = f.codes[key // n_risks], f.risks[key % n_risks]
+                distribution.setdefault(c, {})[r] = count
+        return distribution
+
+    def trend(self, weeks=8, code=None):
+        # Weekly assessment counts, mean score and high-risk counts, plus journal signals
+        since = _now_us() - weeks * 7 * US_PER_DAY
+        f = self.assessments()
+        mask = f.code_mask(code) & (f.ts >= since)
+        a_weeks = _week_start_days(f.ts[mask])
+        j = self.journals()
+        j_mask = j.ts >= since
+        j_weeks = _week_start_days(j.ts[j_mask])
+
+        all_weeks = np.union1d(a_weeks, j_weeks)
+        a_idx = np.searchsorted(all_weeks, a_weeks)
+        j_idx = np.searchsorted(all_weeks, j_weeks)
+        size = len(all_weeks)
+
+        assessments = np.bincount(a_idx, minlength=size)
+        score_sum = np.bincount(a_idx, weights=f.score[mask], minlength=size)
+        high = np.bincount(a_idx, weights=f.high[mask], minlength=size)
+        journals = np.bincount(j_idx, minlength=size)
+        journal_high = np.bincount(j_idx, weights=j.high[j_mask], minlength=size)
+
+        trend = []
+        for i, week in enumerate(all_weeks.tolist()):
+            trend.append({
+                "week_start": _iso_day(week),
+                "assessments": int(assessments[i]),
+                "mean_score": round(float(score_sum[i] / assessments[i]), 2) if assessments[i] else None,
+                "high_risk_assessments": int(high[i]),
+                "journals": int(journals[i]),
+                "high_risk_journals": int(journal_high[i]),
+            })
+        return trend
+
+    def band_crossings(self, days=7, code=None):
+        # Students whose band went up compared with their previous assessment
+        # on the same instrument, for assessments taken in the last `days` days
+        f = self.assessments()
+        n = len(f.rank)
+        prev_rank = np.full(n, -1, dtype=np.int64)
+        prev_score = np.zeros(n, dtype=f.score.dtype)
+        if n > 1:
+            prev_rank[1:] = np.where(f.same_as_prev[1:], f.rank[:-1], -1)
+            prev_score[1:] = f.score[:-1]
+
+        mask = (
+            f.same_as_prev & (prev_rank >= 0) & (f.rank > prev_rank)
+            & (f.ts >= _now_us() - days * US_PER_DAY) & f.code_mask(code)
+        )
+        idx = np.flatnonzero(mask)
+        idx = idx[np.argsort(-f.ts[idx], kind="stable")]
+
+        crossings = []
+        for i in idx.tolist():
+            c = f.codes[f.code[i]]
+            labels = scoring_engine.instruments[c].labels
+            crossings.append({
+                "user_id": f.users[f.user[i]],
+                "code": c,
+                "from_risk_level": labels[prev_rank[i]],
+                "to_risk_level": f.risks[f.risk[i]],
+                "previous_score": _score(prev_score[i]),
+                "score": _score(f.score[i]),
+                "completed_at": _iso_ts(f.ts[i]),
+            })
+        return crossings
+
+
+def _now_us():
+    return time.time_ns() // 1000
+
+
+store = CohortStore()
@@ -0,0 +1,153 @@
+# backend/crisis_detector.py
+# Keyword screen for crisis language, run on journal and chat text before the LLM.
+# The lexicon (frameworks/crisis_lexicon.json, terms grouped by risk level) is
+# compiled once into an Aho-Corasick automaton, so one pass over the text finds
+# every term regardless of how many the lexicon holds.
+import os
+import json
+import re
+import threading
+from collections import deque
+
+CRISIS_LEXICON_PATH = os.environ.get(
+    "CRISIS_LEXICON_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "frameworks", "crisis_lexicon.json")
+)
+
+# Highest first; a text takes the level of its most severe match
+RISK_ORDER = ("High", "Medium")
+NO_RISK = "Low"
+
+_SEPARATORS = re.compile(r"[\s\-_]+")
+_QUOTES = str.maketrans({"’": "'", "‘": "'", "`": "'"})
+
+
+def normalize(text):
+    # Lowercase, straighten quotes, and treat runs of spaces/hyphens as one space
+    # so "Self-harm" and "self  harm" match the same entry
+    return _SEPARATORS.sub(" ", text.translate(_QUOTES).lower())
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "'"
+
+
+class CrisisMatcher:
+    def __init__(self, lexicon):
+        # lexicon: {risk_level: [term, ...]}
+        self.terms = []
+        self.levels = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for level, terms in lexicon.items():
+            for term in terms:
+                term = normalize(term).strip()
+                if term:
+                    self._add(term, level)
+        self._build()
+
+    def _add(self, term, level):
+        node = 0
+        for ch in term:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(len(self.terms))
+        self.terms.append(term)
+        self.levels.append(level)
+
+    def _build(self):
+        # Breadth-first failure links, folded into a full transition table so
+        # matching is a single dict lookup per character with no backtracking
+        self._delta = [None] * len(self._goto)
+        self._delta[0] = dict(self._goto[0])
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            fallback = self._fail[node]
+            delta = dict(self._delta[fallback])
+            delta.update(self._goto[node])
+            self._delta[node] = delta
+            self._out[node] = self._out[node] + self._out[fallback]
+            for ch, child in self._goto[node].items():
+                self._fail[child] = self._delta[fallback].get(ch, 0)
+                pending.append(child)
+
+    def find(self, text):
+        # Indices of lexicon terms found in text as whole words, in order of first appearance
+        text = normalize(text)
+        delta, out, terms = self._delta, self._out, self.terms
+        found = []
+        seen = set()
+        node = 0
+        last = len(text) - 1
+        for i, ch in enumerate(text):
+            node = delta[node].get(ch, 0)
+            if not out[node]:
+                continue
+            for t in out[node]:
+                if t in seen:
+                    continue
+                start = i - len(terms[t]) + 1
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if i < last and _is_word_char(text[i + 1]):
+                    continue
+                seen.add(t)
+                found.append(t)
+        return found
+
+    def scan(self, text):
+        found = self.find(text or "")
+        matched_levels = {self.levels[t] for t in found}
+        risk_level = next((level for level in RISK_ORDER if level in matched_levels), NO_RISK)
+        return {
+            "flagged": risk_level != NO_RISK,
+            "risk_level": risk_level,
+            "matches": [self.terms[t] for t in found],
+        }
+
+
+def load_lexicon(path=CRISIS_LEXICON_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def matcher():
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = CrisisMatcher(load_lexicon())
+    return _matcher
+
+
+def reload():
+    # Recompile after the lexicon file changes
+    global _matcher
+    compiled = CrisisMatcher(load_lexicon())
+    with _matcher_lock:
+        _matcher = compiled
+    return compiled
+
+
+def scan(text):
+    return matcher().scan(text)
+
+
+def escalate(risk_level, crisis):
+    # The more severe of an LLM risk level and the keyword screen's
+    order = RISK_ORDER + (NO_RISK,)
+    if risk_level not in order:
+        return crisis["risk_level"] if crisis["flagged"] else risk_level
+    return min(risk_level, crisis["risk_level"], key=order.index)
@@ -0,0 +1,76 @@
+# backend/dashboard.py
+# Shapes user_daily_rollups rows (see dashboard_rollups.sql) into the daily
+# and weekly series the student dashboard charts.
+from datetime import date, timedelta
+
+DASHBOARD_DEFAULT_DAYS = 7
+DASHBOARD_MAX_DAYS = 180
+# The stress assessment's maximum score, used to normalize it to 0-100
+STRESS_MAX_SCORE = 24
+
+COUNT_FIELDS = (
+    "journal_count", "journal_low_risk", "journal_medium_risk", "journal_high_risk",
+    "stress_count", "assessment_count", "assessment_high_risk", "activity_count",
+    "time_spent_minutes",
+)
+
+
+def _empty_day(day):
+    row = {field: 0 for field in COUNT_FIELDS}
+    row.update({"day": day.isoformat(), "mood_score_sum": 0, "stress_score_sum": 0})
+    return row
+
+
+def _wellness(mood, stress, last_score):
+    # Mirrors the dashboard's original client-side formula
+    if mood is not None and stress is not None:
+        return (mood + (100 - stress / STRESS_MAX_SCORE * 100)) / 2
+    if mood is not None:
+        return mood
+    if stress is not None:
+        return 100 - stress / STRESS_MAX_SCORE * 100
+    return last_score
+
+
+def build_daily(rows, start, end):
+    by_day = {row["day"]: row for row in rows}
+    daily = []
+    last_score = 50
+    day = start
+    while day <= end:
+        row = by_day.get(day.isoformat()) or _empty_day(day)
+        journal_count = row.get("journal_count") or 0
+        stress_count = row.get("stress_count") or 0
+        mood = float(row.get("mood_score_sum") or 0) / journal_count if journal_count else None
+        stress = float(row.get("stress_score_sum") or 0) / stress_count if stress_count else None
+        last_score = _wellness(mood, stress, last_score)
+
+        entry = {field: row.get(field) or 0 for field in COUNT_FIELDS}
+        entry.update({
+            "day": day.isoformat(),
+            "mood_score": round(mood, 1) if mood is not None else None,
+            "stress_score": round(stress, 1) if stress is not None else None,
+            "wellness": round(last_score),
+        })
+        daily.append(entry)
+        day += timedelta(days=1)
+    return daily
+
+
+def build_weekly(daily):
+    weeks = {}
+    for entry in daily:
+        d = date.fromisoformat(entry["day"])
+        week_start = (d - timedelta(days=d.weekday())).isoformat()
+        week = weeks.setdefault(week_start, {"week_start": week_start, "days": 0, "wellness_sum": 0,
+                                             **{field: 0 for field in COUNT_FIELDS}})
+        week["days"] += 1
+        week["wellness_sum"] += entry["wellness"]
+        for field in COUNT_FIELDS:
+            week[field] += entry[field]
+
+    weekly = []
+    for week in weeks.values():
+        week["wellness"] = round(week.pop("wellness_sum") / week["days"])
+        weekly.append(week)
+    return weekly
@@ -1,11 +1,231 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
+import os
+import logging
+import time
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
 
 # Path to your LLaMA model
-tokenizer = AutoTokenizer.from_pretrained("C:/Users/santo/OneDrive/Desktop/sih123/llama_model")
-model = AutoModelForCausalLM.from_pretrained("C:/Users/santo/OneDrive/Desktop/sih123/llama_model", device_map="auto")
+INFERENCE_MODEL_PATH = os.environ.get("INFERENCE_MODEL_PATH", "C:/Users/santo/OneDrive/Desktop/sih123/llama_model")
+INFERENCE_DEVICE_MAP = os.environ.get("INFERENCE_DEVICE_MAP", "auto")
+# Unset: transformers picks .safetensors (memory-mapped) when present, else .bin.
+# "1" requires .safetensors, "0" forces the .bin weights
+INFERENCE_USE_SAFETENSORS = os.environ.get("INFERENCE_USE_SAFETENSORS")
+# Run one short generation right after loading so the first real request isn't slow
+INFERENCE_WARMUP = os.environ.get("INFERENCE_WARMUP", "0") == "1"
+
+# The model is loaded on first use (or by start_background_load), not at import
+tokenizer = None
+model = None
+_load_lock = threading.Lock()
+_ready = threading.Event()
+
+# Batching settings: concurrent prompts arriving within the window are
+# padded and generated together, up to the batch size
+INFERENCE_MAX_BATCH_SIZE = int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", "8"))
+INFERENCE_BATCH_WINDOW_MS = float(os.environ.get("INFERENCE_BATCH_WINDOW_MS", "20"))
+# Prompt + reply length limit, as before
+INFERENCE_MAX_LENGTH = int(os.environ.get("INFERENCE_MAX_LENGTH", "256"))
+
+_DONE = object()
+
+
+def load_model():
+    # Thread-safe, load-once; returns (tokenizer, model)
+    global tokenizer, model
+    if model is not None:
+        return tokenizer, model
+
+    with _load_lock:
+        if model is not None:
+            return tokenizer, model
+
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+
+        started = time.monotonic()
+        loaded_tokenizer = AutoTokenizer.from_pretrained(INFERENCE_MODEL_PATH)
+        kwargs = {"low_cpu_mem_usage": True}
+        if INFERENCE_DEVICE_MAP:
+            kwargs["device_map"] = INFERENCE_DEVICE_MAP
+        if INFERENCE_USE_SAFETENSORS is not None:
+            kwargs["use_safetensors"] = INFERENCE_USE_SAFETENSORS == "1"
+        loaded_model = AutoModelForCausalLM.from_pretrained(INFERENCE_MODEL_PATH, **kwargs)
+        loaded_model.eval()
+
+        tokenizer = loaded_tokenizer
+        model = loaded_model
+        logger.info("Loaded model", extra={"path": INFERENCE_MODEL_PATH,
+                                           "seconds": round(time.monotonic() - started, 1)})
+
+        if INFERENCE_WARMUP:
+            warm_up()
+
+        _ready.set()
+    return tokenizer, model
+
+
+def warm_up():
+    # Called with the load lock held, before the model is reported ready
+    started = time.monotonic()
+    _generate_batch([BatchRequest("Hello")], max_length=8, loaded=(tokenizer, model))
+    logger.info("Model warm-up done", extra={"seconds": round(time.monotonic() - started, 1)})
+
+
+def start_background_load():
+    # Begin loading without blocking the caller (e.g. at server start)
+    thread = threading.Thread(target=_background_load, name="inference-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+def _background_load():
+    try:
+        load_model()
+    except Exception as e:
+        logger.error("Model load failed", extra={"error": str(e)})
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+class BatchRequest:
+    def __init__(self, prompt):
+        self.prompt = prompt
+        self.prompt_ids = []
+        self.output_ids = []
+        self.error = None
+        self.tokens = queue.Queue()
+
+    def stream(self):
+        # Yields decoded text pieces as they are generated
+        while True:
+            piece = self.tokens.get()
+            if piece is _DONE:
+                break
+            yield piece
+        if self.error is not None:
+            raise self.error
+
+
+def _generate_batch(batch, max_length, loaded=None):
+    # Greedy decoding over a left-padded batch, one forward pass per step,
+    # emitting each sequence's new text as soon as its token is chosen
+    import torch
+
+    tokenizer, model = loaded or load_model()
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+
+    enc = tokenizer([r.prompt for r in batch], return_tensors="pt", padding=True).to(model.device)
+    input_ids = enc["input_ids"]
+    attention_mask = enc["attention_mask"]
+    position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+    prompt_lengths = attention_mask.sum(-1).tolist()
+
+    for i, r in enumerate(batch):
+        r.prompt_ids = input_ids[i, -prompt_lengths[i]:].tolist()
+
+    eos_id = tokenizer.eos_token_id
+    pad_id = tokenizer.pad_token_id
+    finished = [prompt_lengths[i] >= max_length for i in range(len(batch))]
+    emitted = [""] * len(batch)
+    past = None
+
+    with torch.no_grad():
+        while not all(finished):
+            out = model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=past,
+                use_cache=True
+            )
+            past = out.past_key_values
+            next_tokens = out.logits[:, -1, :].argmax(-1).tolist()
+
+            for i, r in enumerate(batch):
+                if finished[i]:
+                    next_tokens[i] = pad_id
+                    continue
+                token = next_tokens[i]
+                if token == eos_id:
+                    finished[i] = True
+                    continue
+                r.output_ids.append(token)
+                text = tokenizer.decode(r.output_ids, skip_special_tokens=True)
+                if len(text) > len(emitted[i]):
+                    r.tokens.put(text[len(emitted[i]):])
+                    emitted[i] = text
+                if prompt_lengths[i] + len(r.output_ids) >= max_length:
+                    finished[i] = True
+
+            input_ids = torch.tensor(next_tokens, device=model.device).unsqueeze(-1)
+            attention_mask = torch.cat([attention_mask, attention_mask.new_ones((len(batch), 1))], dim=-1)
+            position_ids = position_ids[:, -1:] + 1
+
+
+class BatchScheduler:
+    def __init__(self, max_batch_size=INFERENCE_MAX_BATCH_SIZE, window_ms=INFERENCE_BATCH_WINDOW_MS,
+                 max_length=INFERENCE_MAX_LENGTH):
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = window_ms / 1000.0
+        self.max_length = max_length
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, prompt):
+        self.start()
+        request = BatchRequest(prompt)
+        self._queue.put(request)
+        return request
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                _generate_batch(batch, self.max_length)
+            except Exception as e:
+                logger.error("Inference batch failed", extra={"batch_size": len(batch), "error": str(e)})
+                for r in batch:
+                    r.error = e
+            finally:
+                for r in batch:
+                    r.tokens.put(_DONE)
+
+
+scheduler = BatchScheduler()
+
+
+def stream_reply(prompt):
+    return scheduler.submit(prompt).stream()
+
 
 def generate_reply(prompt):
-    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-    outputs = model.generate(**inputs, max_length=256)
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+    request = scheduler.submit(prompt)
+    for _ in request.stream():
+        pass
+    tokenizer, _ = load_model()
+    return tokenizer.decode(request.prompt_ids + request.output_ids, skip_special_tokens=True)
@@ -0,0 +1,154 @@
+# backend/llm_cache.py
+# Content-addressed cache for LLM results.
+# Entries are keyed by a hash of (model, system prompt, input), expire after a
+# TTL and are evicted least-recently-used once the cache is full.
+# Backend is in-process by default; set LLM_CACHE_BACKEND=sqlite to keep
+# results on disk across restarts.
+import os
+import logging
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_BACKEND = os.environ.get("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "llm_cache.sqlite3"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(24 * 60 * 60)))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "2048"))
+
+
+def make_key(model, system_prompt, user_input):
+    raw = json.dumps([model, system_prompt or "", user_input or ""], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    def __init__(self, path, max_entries):
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+        self._conn.commit()
+
+    def get(self, key, now):
+        row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= now:
+            self.delete(key)
+            return None
+        self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        return json.loads(value)
+
+    def set(self, key, value, expires_at):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), expires_at, time.time())
+        )
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self._conn.commit()
+
+    def delete(self, key):
+        self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        self._conn.commit()
+
+    def clear(self):
+        self._conn.execute("DELETE FROM llm_cache")
+        self._conn.commit()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMCache:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self.backend.get(key, time.time())
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self.backend.set(key, value, time.time() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def _make_backend():
+    if LLM_CACHE_BACKEND == "sqlite":
+        try:
+            return SQLiteBackend(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES)
+        except Exception as e:
+            logger.warning("Could not open LLM cache, using memory", extra={"path": LLM_CACHE_PATH, "error": str(e)})
+    return MemoryBackend(LLM_CACHE_MAX_ENTRIES)
+
+
+cache = LLMCache(_make_backend(), LLM_CACHE_TTL)
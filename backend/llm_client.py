@@ -0,0 +1,299 @@
+# backend/llm_client.py
+# Shared client for every call to the local Ollama server.
+# One pooled keep-alive session, plus a cap on in-flight generations with a
+# bounded wait queue so the model server is never asked to do more than it can,
+# and a circuit breaker so callers fail fast while Ollama is down.
+import os
+import json
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_CHAT_URL = os.environ.get("OLLAMA_CHAT_URL", "http://127.0.0.1:11434/api/chat")
+
+# How many generations may run on Ollama at once
+OLLAMA_MAX_IN_FLIGHT = int(os.environ.get("OLLAMA_MAX_IN_FLIGHT", "2"))
+# How many requests may wait for a free slot before we start shedding load
+OLLAMA_MAX_QUEUE = int(os.environ.get("OLLAMA_MAX_QUEUE", "8"))
+# Longest a queued request waits for a slot (seconds)
+OLLAMA_QUEUE_TIMEOUT = float(os.environ.get("OLLAMA_QUEUE_TIMEOUT", "30"))
+# Suggested Retry-After (seconds) when we shed load
+OLLAMA_RETRY_AFTER = int(os.environ.get("OLLAMA_RETRY_AFTER", "5"))
+# Seconds to establish a connection; a dead host fails here instead of after the full timeout
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "3"))
+# Circuit breaker: after this many consecutive failed calls, fail fast for the cooldown
+OLLAMA_BREAKER_FAILURES = int(os.environ.get("OLLAMA_BREAKER_FAILURES", "5"))
+OLLAMA_BREAKER_COOLDOWN = float(os.environ.get("OLLAMA_BREAKER_COOLDOWN", "30"))
+# How long Ollama keeps the model (and its prompt cache) loaded after a call; "" leaves Ollama's default
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "ollama_queue_wait_seconds", "Time spent waiting for a free Ollama slot"
+)
+REQUEST_SECONDS = metrics.histogram(
+    "ollama_request_seconds",
+    "Ollama call duration; stream_open is time to response headers, stream is the whole stream",
+    ["mode"]
+)
+ERRORS = metrics.counter("ollama_errors_total", "Failed Ollama calls", ["mode"])
+SHED = metrics.counter("ollama_shed_total", "Requests rejected by the concurrency limiter", ["reason"])
+# Prompt tokens Ollama had to evaluate, i.e. not served from its cached prefix
+PROMPT_EVAL_TOKENS = metrics.histogram(
+    "ollama_prompt_eval_tokens", "Prompt tokens evaluated per call (prefill)", ["mode"],
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+)
+
+
+class OllamaOverloaded(Exception):
+    """Raised when the wait queue is full or a slot did not free up in time."""
+
+
+class OllamaUnavailable(OllamaOverloaded):
+    """Raised without calling Ollama while the circuit breaker is open."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_outage(error):
+    # Failures that say Ollama is down or stuck, as opposed to a bad request
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = getattr(error, "response", None)
+    return isinstance(error, requests.HTTPError) and response is not None and response.status_code >= 500
+
+
+class CircuitBreaker:
+    # closed: calls go through. open: calls fail fast until the cooldown has
+    # passed. half_open: one call goes through as a probe; success closes the
+    # circuit, failure opens it for another cooldown.
+    def __init__(self, failure_threshold, cooldown):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    def before_call(self):
+        with self._lock:
+            if self._state == "closed":
+                return
+            now = time.monotonic()
+            if self._state == "open" and now - self._opened_at >= self.cooldown:
+                self._state = "half_open"
+                self._probing = False
+            if self._state == "half_open" and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            retry_after = max(1, math.ceil(self.cooldown - (now - self._opened_at)))
+        raise OllamaUnavailable("Ollama is unavailable (circuit open)", retry_after)
+
+    def record_success(self):
+        with self._lock:
+            if self._state != "closed":
+                logger.info("Ollama circuit closed")
+            self._state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self, error):
+        if not is_outage(error):
+            self.record_skipped()
+            return
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or (self._state == "closed" and self._failures >= self.failure_threshold):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.opened += 1
+                logger.warning("Ollama circuit opened", extra={"failures": self._failures, "error": str(error)})
+
+    def record_skipped(self):
+        # The call ended without saying anything about Ollama's health; let another probe through
+        with self._lock:
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": self._state != "closed",
+                "half_open": self._state == "half_open",
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_in_flight, max_queue, queue_timeout):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+
+    def acquire(self):
+        with self._cond:
+            if self._in_flight < self.max_in_flight and self._waiting == 0:
+                self._in_flight += 1
+                return
+            if self._waiting >= self.max_queue:
+                SHED.inc(reason="queue_full")
+                raise OllamaOverloaded("LLM queue is full")
+
+            self._waiting += 1
+            try:
+                ok = self._cond.wait_for(lambda: self._in_flight < self.max_in_flight, timeout=self.queue_timeout)
+            finally:
+                self._waiting -= 1
+            if not ok:
+                SHED.inc(reason="queue_timeout")
+                raise OllamaOverloaded("Timed out waiting for a free LLM slot")
+            self._in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+            }
+
+
+limiter = ConcurrencyLimiter(OLLAMA_MAX_IN_FLIGHT, OLLAMA_MAX_QUEUE, OLLAMA_QUEUE_TIMEOUT)
+metrics.register_collector("ollama_limiter", limiter.stats, documentation="Ollama concurrency limiter")
+breaker = CircuitBreaker(OLLAMA_BREAKER_FAILURES, OLLAMA_BREAKER_COOLDOWN)
+metrics.register_collector("ollama_breaker", breaker.stats, types={"opened": "counter", "rejected": "counter"},
+                           documentation="Ollama circuit breaker")
+
+# Keep-alive connection pool sized for every in-flight request plus the queue
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_MAX_IN_FLIGHT + OLLAMA_MAX_QUEUE)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
+
+
+def _acquire():
+    # Open circuit: fail before queueing for a slot
+    breaker.before_call()
+    try:
+        with QUEUE_WAIT_SECONDS.time(phase="ollama_queue"):
+            limiter.acquire()
+    except OllamaOverloaded:
+        breaker.record_skipped()
+        raise
+
+
+def _with_keep_alive(payload):
+    if OLLAMA_KEEP_ALIVE and "keep_alive" not in payload:
+        return dict(payload, keep_alive=OLLAMA_KEEP_ALIVE)
+    return payload
+
+
+def _observe_prompt(body, mode):
+    if isinstance(body, dict) and body.get("prompt_eval_count") is not None:
+        PROMPT_EVAL_TOKENS.observe(body["prompt_eval_count"], mode=mode)
+
+
+def chat(payload, timeout=60):
+    # Blocking call; returns Ollama's decoded JSON response
+    _acquire()
+    try:
+        with REQUEST_SECONDS.time(phase="ollama", mode="chat"):
+            r = session.post(OLLAMA_CHAT_URL, json=_with_keep_alive(payload),
+                             timeout=(OLLAMA_CONNECT_TIMEOUT, timeout))
+            r.raise_for_status()
+            body = r.json()
+        breaker.record_success()
+        _observe_prompt(body, "chat")
+        return body
+    except Exception as e:
+        ERRORS.inc(mode="chat")
+        breaker.record_failure(e)
+        raise
+    finally:
+        limiter.release()
+
+
+class ChatStream:
+    # Iterates Ollama's NDJSON chunks while holding a limiter slot.
+    # close() must be called to give the slot back; it is safe to call twice.
+    def __init__(self, response):
+        self._response = response
+        self._closed = False
+        self._started = time.perf_counter()
+
+    def __iter__(self):
+        for line in self._response.iter_lines():
+            if not line:
+                continue
+            try:
+                chunk = json.loads(line)
+            except ValueError:
+                continue
+            yield chunk
+            if chunk.get("done"):
+                _observe_prompt(chunk, "stream")
+                break
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        elapsed = time.perf_counter() - self._started
+        REQUEST_SECONDS.observe(elapsed, mode="stream")
+        metrics.record_phase("ollama", elapsed)
+        try:
+            self._response.close()
+        finally:
+            limiter.release()
+
+
+def stream_chat(payload, timeout=60):
+    # Acquire a slot and open the stream eagerly so callers can still
+    # answer with a proper status code if Ollama is busy or unreachable
+    _acquire()
+    try:
+        with REQUEST_SECONDS.time(mode="stream_open"):
+            r = session.post(OLLAMA_CHAT_URL, json=dict(_with_keep_alive(payload), stream=True),
+                             timeout=(OLLAMA_CONNECT_TIMEOUT, timeout), stream=True)
+            r.raise_for_status()
+    except Exception as e:
+        ERRORS.inc(mode="stream")
+        breaker.record_failure(e)
+        limiter.release()
+        raise
+    breaker.record_success()
+    return ChatStream(r)
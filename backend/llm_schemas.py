@@ -0,0 +1,157 @@
+# backend/llm_schemas.py
+# Output schemas for the endpoints that ask Ollama for JSON.
+# Each schema is sent as Ollama's `format` (JSON Schema structured output), so
+# the model is constrained while generating, and the reply is validated
+# again here because older Ollama versions and small models don't always
+# comply. Validation coerces harmless near-misses (a string where a list was
+# expected, "low" for "Low", JSON wrapped in prose or a code fence) and
+# reports the rest as errors the caller can send back for one repair attempt.
+import os
+import re
+import json
+
+# Send the schema as `format`; set to 0 for Ollama versions that only accept "json"
+OLLAMA_SCHEMA_FORMAT = os.environ.get("OLLAMA_SCHEMA_FORMAT", "1") == "1"
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+class Field:
+    def __init__(self, kind, required=True, choices=None, items=None, default=None, min_items=0):
+        # kind is str or list; items is str or a Schema for list elements
+        self.kind = kind
+        self.required = required
+        self.choices = choices
+        self.items = items
+        self.default = default
+        self.min_items = min_items
+
+    def json_schema(self):
+        if self.kind is list:
+            items = self.items.json_schema() if isinstance(self.items, Schema) else {"type": "string"}
+            schema = {"type": "array", "items": items}
+            if self.min_items:
+                schema["minItems"] = self.min_items
+            return schema
+        schema = {"type": "string"}
+        if self.choices:
+            schema["enum"] = list(self.choices)
+        return schema
+
+    def coerce(self, name, value, errors):
+        if self.kind is list:
+            if isinstance(value, str):
+                value = [part.strip() for part in value.split(",") if part.strip()]
+            if not isinstance(value, list):
+                errors.append(f"'{name}' must be a list")
+                return None
+            if isinstance(self.items, Schema):
+                out = []
+                for i, item in enumerate(value):
+                    cleaned = self.items.coerce(item, errors, prefix=f"{name}[{i}].")
+                    if cleaned is not None:
+                        out.append(cleaned)
+                value = out
+            else:
+                value = [str(v) for v in value if v is not None and not isinstance(v, (dict, list))]
+            if len(value) < self.min_items:
+                errors.append(f"'{name}' needs at least {self.min_items} item(s)")
+            return value
+
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str):
+            errors.append(f"'{name}' must be a string")
+            return None
+        value = value.strip()
+        if self.choices:
+            match = next((c for c in self.choices if c.lower() == value.lower()), None)
+            if match is None:
+                errors.append(f"'{name}' must be one of {', '.join(self.choices)}")
+                return None
+            value = match
+        return value
+
+
+class Schema:
+    def __init__(self, fields):
+        self.fields = fields
+
+    def json_schema(self):
+        return {
+            "type": "object",
+            "properties": {name: f.json_schema() for name, f in self.fields.items()},
+            "required": [name for name, f in self.fields.items() if f.required],
+        }
+
+    def format(self):
+        # Value for the `format` key of an Ollama request
+        return self.json_schema() if OLLAMA_SCHEMA_FORMAT else "json"
+
+    def coerce(self, obj, errors, prefix=""):
+        if not isinstance(obj, dict):
+            errors.append(f"'{prefix.rstrip('.') or 'reply'}' must be a JSON object")
+            return None
+        out = {}
+        for name, field in self.fields.items():
+            value = obj.get(name)
+            if value is None or value == "":
+                if field.required:
+                    errors.append(f"'{prefix}{name}' is required")
+                elif field.default is not None:
+                    out[name] = list(field.default) if isinstance(field.default, list) else field.default
+                continue
+            cleaned = field.coerce(prefix + name, value, errors)
+            if cleaned is not None:
+                out[name] = cleaned
+        return out
+
+    def validate(self, obj):
+        # (cleaned object, list of error strings)
+        errors = []
+        cleaned = self.coerce(obj, errors)
+        return cleaned, errors
+
+
+def extract_json(content):
+    # The object in a reply, tolerating a code fence or prose around it
+    text = _FENCE.sub("", (content or "").strip())
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            return json.loads(text[start:end + 1])
+        except ValueError:
+            pass
+    return None
+
+
+def describe(schema):
+    return json.dumps(schema.json_schema(), separators=(",", ":"))
+
+
+ANALYSIS = Schema({
+    "mood": Field(str),
+    "risk_level": Field(str, choices=("Low", "Medium", "High")),
+    "summary": Field(str),
+    "routine": Field(str, required=False, default=""),
+    "likes": Field(list, required=False, default=[]),
+    "dislikes": Field(list, required=False, default=[]),
+    "important_terms": Field(list, required=False, default=[]),
+    "panic_words": Field(list, required=False, default=[]),
+})
+
+PLAN_TASK = Schema({
+    "category": Field(str, choices=("Sleep", "Nutrition", "Movement", "Mindfulness")),
+    "title": Field(str),
+    "description": Field(str),
+})
+PLAN = Schema({"tasks": Field(list, items=PLAN_TASK, min_items=1)})
+
+ASSESSMENT_ANALYSIS = Schema({
+    "summary": Field(str),
+    "recommendations": Field(list, required=False, default=[]),
+})
@@ -0,0 +1,472 @@
+# backend/media_cache.py
+# Caching proxy behind /api/media for remote audio (ambient_sounds.url and
+# audio resources, which point at upload.wikimedia.org).
+# - Only URLs listed in the catalog (ambient_sounds.url, resources.url) are
+#   served, so the set of files, and of cache keys, is bounded by content we
+#   publish rather than by what callers make up.
+# - Each URL is fetched from its origin once, into MEDIA_CACHE_DIR, and then
+#   served from disk. The download runs in the background (one per URL across
+#   threads and workers); until it lands, requests are redirected to the
+#   origin so nobody waits for the whole file.
+# - The cache is bounded by MEDIA_CACHE_MAX_BYTES; least recently served
+#   files are evicted first (recency is the file's atime, set on each hit, so
+#   every worker process sees the same order).
+# - Responses support Range (206/416), ETag 304s and If-Range. The body is
+#   handed to the server's wsgi.file_wrapper positioned at the range start,
+#   so gunicorn sends it with sendfile() without copying through Python.
+# Only hosts in MEDIA_ALLOWED_HOSTS are fetched, and only audio, video and
+# image content is stored, so the endpoint can't be used as an open proxy or
+# to serve someone else's HTML from our origin.
+import os
+import json
+import time
+import atexit
+import hashlib
+import logging
+import tempfile
+import threading
+import mimetypes
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from flask import Response, redirect
+
+try:
+    import fcntl
+except ImportError:  # Windows runs a single waitress process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CACHE_DIR = os.environ.get("MEDIA_CACHE_DIR", os.path.join(os.path.dirname(__file__), "media_cache"))
+MEDIA_CACHE_MAX_BYTES = int(os.environ.get("MEDIA_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Larger files are refused rather than allowed to flush the whole cache
+MEDIA_MAX_FILE_BYTES = int(os.environ.get("MEDIA_MAX_FILE_BYTES", str(200 * 1024 ** 2)))
+MEDIA_ALLOWED_HOSTS = [
+    h.strip().lower()
+    for h in os.environ.get("MEDIA_ALLOWED_HOSTS", "upload.wikimedia.org,actions.google.com").split(",")
+    if h.strip()
+]
+MEDIA_FETCH_TIMEOUT = float(os.environ.get("MEDIA_FETCH_TIMEOUT", "30"))
+# Cache lifetime for browsers (seconds); a URL's content doesn't change
+MEDIA_MAX_AGE = int(os.environ.get("MEDIA_MAX_AGE", "604800"))
+# How long the list of catalog URLs is reused before it is reloaded (seconds)
+MEDIA_CATALOG_TTL = float(os.environ.get("MEDIA_CATALOG_TTL", "300"))
+# Background downloads at once, per worker
+MEDIA_FETCH_WORKERS = int(os.environ.get("MEDIA_FETCH_WORKERS", "2"))
+# An unknown URL reloads the catalog at most this often (seconds)
+CATALOG_REFRESH_INTERVAL = 30
+# A URL whose download failed is served from the origin this long before it is retried
+RETRY_AFTER = 300
+# Skip the atime update when the file was served this recently (seconds)
+TOUCH_INTERVAL = 60
+MAX_REDIRECTS = 5
+STALE_PART_SECONDS = 3600
+CHUNK_SIZE = 256 * 1024
+ALLOWED_TYPES = ("audio/", "video/", "image/", "application/ogg")
+# Wikimedia rejects requests without a descriptive User-Agent
+USER_AGENT = os.environ.get("MEDIA_USER_AGENT", "campus-well-link-media-cache/1.0")
+
+
+class MediaNotAllowed(Exception):
+    """Raised for URLs outside MEDIA_ALLOWED_HOSTS or the catalog."""
+
+
+class MediaFetchFailed(Exception):
+    """Raised when the origin can't provide a cacheable copy."""
+
+
+class CachedMedia:
+    def __init__(self, key, path, size, content_type, fetched_at):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+        self.fetched_at = fetched_at
+
+    @property
+    def etag(self):
+        return f"{self.key[:16]}-{self.size:x}-{int(self.fetched_at):x}"
+
+
+class _LimitedFile:
+    # Iterates `length` bytes of an open file, for servers without a file_wrapper
+    def __init__(self, f, length):
+        self.f = f
+        self.remaining = length
+
+    def __iter__(self):
+        while self.remaining > 0:
+            chunk = self.f.read(min(CHUNK_SIZE, self.remaining))
+            if not chunk:
+                break
+            self.remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        self.f.close()
+
+
+class MediaCache:
+    def __init__(self, directory=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MAX_BYTES,
+                 allowed_hosts=MEDIA_ALLOWED_HOSTS, max_file_bytes=MEDIA_MAX_FILE_BYTES,
+                 timeout=MEDIA_FETCH_TIMEOUT, session=None, catalog=None, catalog_ttl=MEDIA_CATALOG_TTL,
+                 fetch_workers=MEDIA_FETCH_WORKERS):
+        # catalog() returns the URLs that may be served; None allows any URL on an allowed host
+        self.catalog = catalog
+        self.catalog_ttl = catalog_ttl
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.allowed_hosts = set(allowed_hosts)
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        os.makedirs(directory, exist_ok=True)
+
+        # key -> CachedMedia; entries are immutable once written
+        self._entries = {}
+        # key -> [lock, users]; dropped when the last user releases it
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._catalog_urls = None
+        self._catalog_loaded_at = 0.0
+        self._catalog_lock = threading.Lock()
+        self._fetcher = ThreadPoolExecutor(max_workers=max(1, fetch_workers), thread_name_prefix="media-fetch")
+        self._in_flight = set()
+        # key -> monotonic time before which a failed download isn't retried
+        self._failed = {}
+        self._hits = 0
+        self._misses = 0
+        self._fetched_bytes = 0
+        self._fetch_failures = 0
+        self._evictions = 0
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def check_url(self, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or (parts.hostname or "").lower() not in self.allowed_hosts:
+            raise MediaNotAllowed(f"Host not allowed: {parts.hostname or url}")
+
+    def _known(self, url):
+        if self.catalog is None:
+            return True
+        now = time.monotonic()
+        with self._catalog_lock:
+            age = now - self._catalog_loaded_at
+            if (self._catalog_urls is None or age > self.catalog_ttl
+                    or (url not in self._catalog_urls and age > CATALOG_REFRESH_INTERVAL)):
+                try:
+                    self._catalog_urls = frozenset(self.catalog())
+                except Exception as e:
+                    if self._catalog_urls is None:
+                        raise MediaFetchFailed(f"Media catalog unavailable ({e})")
+                    # Keep the last list rather than reload on every request
+                    logger.warning("Media catalog reload failed", extra={"error": str(e)})
+                self._catalog_loaded_at = now
+            return url in self._catalog_urls
+
+    @contextmanager
+    def _fetch_lock(self, key):
+        # One download per URL: a thread lock within this process, plus an
+        # flock so other workers wait for the same download
+        with self._lock:
+            holder = self._locks.get(key)
+            if holder is None:
+                holder = self._locks[key] = [threading.Lock(), 0]
+            holder[1] += 1
+        try:
+            with holder[0]:
+                if fcntl is None:
+                    yield
+                    return
+                path = self._path(key, ".lock")
+                while True:
+                    f = open(path, "a")
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    # The previous holder unlinks the file on release; only the
+                    # file currently at `path` counts
+                    try:
+                        current = os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+                    except FileNotFoundError:
+                        current = False
+                    if current:
+                        break
+                    f.close()
+                try:
+                    yield
+                finally:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    f.close()
+        finally:
+            with self._lock:
+                holder[1] -= 1
+                if holder[1] == 0:
+                    del self._locks[key]
+
+    def _load(self, key):
+        # The entry on disk, or None
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        try:
+            with open(self._path(key, ".json")) as f:
+                meta = json.load(f)
+            size = os.path.getsize(self._path(key, ".media"))
+        except (OSError, ValueError):
+            return None
+        entry = CachedMedia(key, self._path(key, ".media"), size, meta["content_type"], meta["fetched_at"])
+        self._entries[key] = entry
+        return entry
+
+    def get(self, url):
+        # CachedMedia for url, or None while it is being downloaded
+        self.check_url(url)
+        if not self._known(url):
+            raise MediaNotAllowed("Not a catalog media URL")
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        entry = self._load(key)
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        if entry is None:
+            self._start_fetch(key, url)
+            return None
+        self._touch(entry)
+        return entry
+
+    def _start_fetch(self, key, url):
+        now = time.monotonic()
+        with self._lock:
+            if key in self._in_flight or self._failed.get(key, 0) > now:
+                return
+            self._failed.pop(key, None)
+            self._in_flight.add(key)
+        try:
+            self._fetcher.submit(self._background_fetch, key, url)
+        except RuntimeError:
+            # Shutting down
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def _background_fetch(self, key, url):
+        try:
+            with self._fetch_lock(key):
+                # Another worker may have fetched it while we waited
+                if self._load(key) is None:
+                    self._fetch(key, url)
+                    self._evict(keep=key)
+        except Exception as e:
+            with self._lock:
+                self._failed[key] = time.monotonic() + RETRY_AFTER
+            logger.warning("Media fetch failed", extra={"url": url, "error": str(e)})
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def _touch(self, entry):
+        try:
+            st = os.stat(entry.path)
+            now = time.time()
+            if now - st.st_atime > TOUCH_INTERVAL:
+                os.utime(entry.path, (now, st.st_mtime))
+        except OSError:
+            pass
+
+    def _open_origin(self, url):
+        # Follows redirects by hand so every hop is checked against the allowlist
+        for _ in range(MAX_REDIRECTS + 1):
+            self.check_url(url)
+            resp = self.session.get(url, stream=True, allow_redirects=False,
+                                    timeout=(min(self.timeout, 5), self.timeout))
+            if resp.is_redirect:
+                resp.close()
+                url = urljoin(url, resp.headers["Location"])
+                continue
+            return resp
+        raise MediaFetchFailed("Too many redirects")
+
+    def _fetch(self, key, url):
+        started = time.monotonic()
+        tmp_path = None
+        try:
+            with self._open_origin(url) as resp:
+                if resp.status_code != 200:
+                    raise MediaFetchFailed(f"Origin returned {resp.status_code}")
+                content_type = (resp.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+                if not content_type or content_type == "application/octet-stream":
+                    content_type = mimetypes.guess_type(urlsplit(url).path)[0] or ""
+                if not content_type.startswith(ALLOWED_TYPES):
+                    raise MediaFetchFailed(f"Not a media file ({content_type or 'unknown type'})")
+                length = int(resp.headers.get("Content-Length") or 0)
+                if length > self.max_file_bytes:
+                    raise MediaFetchFailed(f"File too large ({length} bytes)")
+
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{key}.", suffix=".part")
+                size = 0
+                with os.fdopen(fd, "wb") as out:
+                    for chunk in resp.iter_content(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.max_file_bytes:
+                            raise MediaFetchFailed(f"File too large (over {self.max_file_bytes} bytes)")
+                        out.write(chunk)
+        except requests.RequestException as e:
+            self._fetch_failed(tmp_path)
+            raise MediaFetchFailed(f"Could not fetch media ({e})")
+        except Exception:
+            self._fetch_failed(tmp_path)
+            raise
+
+        fetched_at = time.time()
+        # Metadata first: a .media file is only ever visible with its .json
+        with open(self._path(key, ".json"), "w") as f:
+            json.dump({"url": url, "content_type": content_type, "fetched_at": fetched_at}, f)
+        os.replace(tmp_path, self._path(key, ".media"))
+
+        with self._lock:
+            self._fetched_bytes += size
+        logger.info("Cached media", extra={"url": url, "bytes": size,
+                                           "seconds": round(time.monotonic() - started, 2)})
+        entry = CachedMedia(key, self._path(key, ".media"), size, content_type, fetched_at)
+        self._entries[key] = entry
+        return entry
+
+    def _fetch_failed(self, tmp_path):
+        with self._lock:
+            self._fetch_failures += 1
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _scan(self):
+        # [(atime, size, key)] for every cached file; also drops downloads
+        # abandoned by a crashed worker
+        files = []
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for item in it:
+                try:
+                    st = item.stat()
+                    if item.name.endswith(".part") and now - st.st_mtime > STALE_PART_SECONDS:
+                        os.remove(item.path)
+                except OSError:
+                    continue
+                if not item.name.endswith(".media"):
+                    continue
+                files.append((st.st_atime, st.st_size, item.name[:-len(".media")]))
+        return files
+
+    def _evict(self, keep=None):
+        files = self._scan()
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+        for _, size, key in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                # Responses already streaming keep their open file (except on Windows)
+                os.remove(self._path(key, ".media"))
+            except OSError:
+                continue
+            try:
+                os.remove(self._path(key, ".json"))
+            except OSError:
+                pass
+            self._entries.pop(key, None)
+            total -= size
+            with self._lock:
+                self._evictions += 1
+
+    def response(self, url, request):
+        entry = self.get(url)
+        f = None
+        if entry is not None:
+            try:
+                f = open(entry.path, "rb")
+            except FileNotFoundError:
+                # Evicted by another worker since it was looked up
+                self._entries.pop(entry.key, None)
+                entry = self.get(url)
+                f = open(entry.path, "rb") if entry is not None else None
+        if f is None:
+            # Not cached yet: play straight from the origin while the download runs
+            response = redirect(url, 307)
+            response.headers["Cache-Control"] = "no-store"
+            return response
+
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Cache-Control": f"public, max-age={MEDIA_MAX_AGE}",
+            "X-Content-Type-Options": "nosniff",
+        }
+        response = Response(mimetype=entry.content_type, headers=headers)
+        response.set_etag(entry.etag)
+        response.last_modified = entry.fetched_at
+
+        if request.if_none_match.contains(entry.etag):
+            f.close()
+            response.status_code = 304
+            return response
+
+        start, length = 0, entry.size
+        byte_range = request.range
+        if byte_range is not None and ("If-Range" not in request.headers or request.if_range.etag == entry.etag):
+            span = byte_range.range_for_length(entry.size)
+            if span is None and len(byte_range.ranges) == 1:
+                f.close()
+                response.status_code = 416
+                response.headers["Content-Range"] = f"bytes */{entry.size}"
+                return response
+            if span is not None:
+                start, stop = span
+                length = stop - start
+                response.status_code = 206
+                response.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{entry.size}"
+
+        f.seek(start)
+        # gunicorn sendfile()s Content-Length bytes from the current offset and
+        # waitress stops at Content-Length too; anything else reads in chunks
+        wrapper = request.environ.get("wsgi.file_wrapper")
+        response.response = wrapper(f, CHUNK_SIZE) if wrapper is not None else _LimitedFile(f, length)
+        response.direct_passthrough = True
+        response.content_length = length
+        return response
+
+    def stats(self):
+        files = self._scan()
+        with self._lock:
+            return {
+                "entries": len(files),
+                "bytes": sum(size for _, size, _ in files),
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "fetched_bytes": self._fetched_bytes,
+                "fetch_failures": self._fetch_failures,
+                "fetching": len(self._in_flight),
+                "evictions": self._evictions,
+            }
+
+    def close(self):
+        self._fetcher.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+def create_cache(**kwargs):
+    cache = MediaCache(**kwargs)
+    atexit.register(cache.close)
+    return cache
@@ -0,0 +1,194 @@
+# backend/metrics.py
+# In-process metrics in the Prometheus text exposition format, served on /metrics.
+# Counters and histograms are updated inline; components that already keep
+# their own stats (caches, limiter, buffers) register a collector that is read
+# at scrape time. Per-request phase totals (ollama, supabase, json_parse) are
+# kept in a context variable so the access log can say where a slow request
+# spent its time.
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; spans fast cache hits up to the 60s Ollama timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_metrics = []
+_collectors = []
+_registry_lock = threading.Lock()
+_phases = contextvars.ContextVar("request_phases", default=None)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, phase=None, **labels):
+        # Observe the block's duration; also add it to the current request's phase totals
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe(elapsed, **labels)
+            if phase:
+                record_phase(phase, elapsed)
+
+    def count(self, **labels):
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return series[-1] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(float(series[-2]))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def _register(metric):
+    with _registry_lock:
+        _metrics.append(metric)
+    return metric
+
+
+def counter(name, documentation, labelnames=()):
+    return _register(Counter(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def register_collector(prefix, stats, types=None, documentation=""):
+    # stats() returns a flat dict of numbers, e.g. llm_cache.stats(); each key
+    # becomes a gauge named prefix_key unless types maps it to "counter"
+    with _registry_lock:
+        _collectors.append((prefix, stats, types or {}, documentation))
+
+
+def _render_collector(prefix, stats, types, documentation):
+    lines = []
+    try:
+        values = stats()
+    except Exception:
+        return lines
+    for key, value in values.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if not isinstance(value, (int, float)):
+            continue
+        kind = types.get(key, "gauge")
+        name = f"{prefix}_{key}" + ("_total" if kind == "counter" and not key.endswith("_total") else "")
+        lines.append(f"# HELP {name} {documentation or prefix} {key.replace('_', ' ')}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {_format_value(value)}")
+    return lines
+
+
+def render():
+    lines = []
+    with _registry_lock:
+        metrics = list(_metrics)
+        collectors = list(_collectors)
+    for metric in metrics:
+        lines.extend(metric.render())
+    for collector in collectors:
+        lines.extend(_render_collector(*collector))
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- Per-request phase totals ---
+
+def start_request():
+    phases = {}
+    _phases.set(phases)
+    return phases
+
+
+def record_phase(name, seconds):
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0) + seconds
+
+
+def submit_with_context(executor, fn, *args):
+    # executor.submit that keeps the caller's request phases, so work fanned
+    # out to a thread pool is still attributed to the request
+    return executor.submit(contextvars.copy_context().run, fn, *args)
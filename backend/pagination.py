@@ -0,0 +1,81 @@
+# backend/pagination.py
+# Keyset (cursor) pagination and field projection for list endpoints.
+# Pages are ordered by (timestamp desc, id desc); the cursor is the last row's
+# pair, so each page is an index range scan no matter how deep the client goes.
+import json
+import uuid
+import base64
+from datetime import datetime
+
+
+class BadRequest(Exception):
+    pass
+
+
+def encode_cursor(ts, row_id):
+    raw = json.dumps([ts, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise BadRequest("Invalid cursor")
+    # Both end up inside a quoted or=() filter, so only accept what we issue
+    try:
+        datetime.fromisoformat(ts.replace("Z", "+00:00"))
+        row_id = str(uuid.UUID(row_id))
+    except (AttributeError, TypeError, ValueError):
+        raise BadRequest("Invalid cursor")
+    return ts, row_id
+
+
+def keyset_filter(ts_column, ts, row_id, descending=True):
+    # PostgREST or=() filter for rows strictly after (ts, id) in the given order.
+    # Values are quoted because timestamps contain reserved characters.
+    op = "lt" if descending else "gt"
+    return f'{ts_column}.{op}."{ts}",and({ts_column}.eq."{ts}",id.{op}."{row_id}")'
+
+
+def parse_limit(value, default, maximum):
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise BadRequest("limit must be an integer")
+    return max(1, min(limit, maximum))
+
+
+def build_select(requested, allowed, default, required):
+    # requested: comma-separated field names from the query string, or None.
+    # allowed maps field name -> select expression (e.g. an embedded resource).
+    if not requested:
+        fields = list(default)
+    else:
+        fields = [f.strip() for f in requested.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in allowed]
+        if unknown:
+            raise BadRequest(f"Unknown fields: {', '.join(unknown)}")
+    for field in required:
+        if field not in fields:
+            fields.append(field)
+    return ", ".join(allowed[f] for f in fields)
+
+
+def paginate(query, ts_column, cursor, limit):
+    # Applies keyset filter + ordering and fetches one extra row to detect
+    # whether another page exists. Returns (rows, next_cursor).
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        query = query.or_(keyset_filter(ts_column, ts, row_id))
+    rows = query.order(ts_column, desc=True).order("id", desc=True).limit(limit + 1).execute().data
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[ts_column], last["id"])
+    return rows, next_cursor
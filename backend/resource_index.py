@@ -0,0 +1,449 @@
+# backend/resource_index.py
+# Embedding index behind /api/recommendations.
+# Rows from resources, cbt_distortions and clinical_symptoms are embedded once
+# and kept in a memory-mapped float32 matrix (EMBEDDING_DIR/vectors.f32) with
+# a JSON sidecar describing each slot. A sync re-embeds only rows whose text
+# changed (by fingerprint), so restarts and periodic refreshes are cheap.
+# A journal's /analyze output (mood, important_terms, panic_words) becomes one
+# query vector; all queries in a request are scored with a single matrix
+# product and a top-k partition per kind, which takes well under a millisecond
+# for a catalog this size and never calls the LLM.
+#
+# Embeddings come from EMBEDDING_BACKEND: "hashing" (default) is a local
+# hashed bag of words and character 4-grams with no model to download;
+# "ollama" uses OLLAMA_EMBED_MODEL through Ollama's /api/embed.
+#
+# Slots are append-only between rewrites: a changed row keeps its slot and a
+# removed one is zeroed, so another worker's mapping of the same file never
+# sees one row's vector under another row's metadata. Writers take an flock
+# on the index directory.
+import os
+import re
+import html
+import json
+import math
+import time
+import zlib
+import atexit
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import llm_client
+
+try:
+    import fcntl
+except ImportError:  # Windows runs a single waitress process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIR = os.environ.get("EMBEDDING_DIR", os.path.join(os.path.dirname(__file__), "embeddings"))
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "hashing")
+EMBEDDING_DIM = int(os.environ.get("EMBEDDING_DIM", "1024"))
+OLLAMA_EMBED_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+OLLAMA_EMBED_URL = os.environ.get(
+    "OLLAMA_EMBED_URL", llm_client.OLLAMA_CHAT_URL.rsplit("/api/", 1)[0] + "/api/embed"
+)
+# Matches scoring below this (cosine) are noise rather than recommendations
+RECOMMEND_MIN_SCORE = float(os.environ.get("RECOMMEND_MIN_SCORE", "0.05"))
+# Seconds between background syncs with Supabase (0 disables them)
+RECOMMEND_REFRESH_INTERVAL = float(os.environ.get("RECOMMEND_REFRESH_INTERVAL", "900"))
+
+# table -> (kind, id column, columns to fetch, text columns in order of weight)
+SOURCES = {
+    "resources": ("resource", "id", "id, title, description, category, type, content",
+                  ["title", "title", "category", "description", "content"]),
+    "cbt_distortions": ("distortion", "slug", "slug, label, description, reframe",
+                        ["label", "label", "description", "reframe"]),
+    "clinical_symptoms": ("symptom", "slug",
+                          "slug, label, subtext, intervention_title, intervention_text, intervention_action",
+                          ["label", "label", "subtext", "intervention_title", "intervention_text",
+                           "intervention_action"]),
+}
+KINDS = [source[0] for source in SOURCES.values()]
+
+# Long article bodies would drown out the title and category
+MAX_TEXT_CHARS = 2000
+# Panic words say more about what would help than the mood label does
+QUERY_WEIGHTS = {"mood": 1.0, "important_terms": 1.0, "panic_words": 2.0}
+
+STOPWORDS = set(
+    "a an and are as at be but by for from has have i if in into is it its me my of on or our so "
+    "than that the their them then there these they this to was we were what when which who will "
+    "with you your yours about just not no do does did can could would should very too also".split()
+)
+_TAGS = re.compile(r"<[^>]+>")
+_WORDS = re.compile(r"[a-z][a-z']+")
+
+
+def plain_text(value):
+    if not value:
+        return ""
+    return html.unescape(_TAGS.sub(" ", str(value)))
+
+
+class HashingEmbedder:
+    # Signed feature hashing of words and character 4-grams (log-scaled counts,
+    # L2-normalized). The n-grams let "anxious" match "anxiety" and "sleeping"
+    # match "sleep" without a stemmer.
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text):
+        counts = {}
+        for word in _WORDS.findall(text.lower()):
+            word = word.strip("'")
+            if word in STOPWORDS or len(word) < 2:
+                continue
+            counts[word] = counts.get(word, 0) + 1.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - 3):
+                gram = "#" + padded[i:i + 4]
+                counts[gram] = counts.get(gram, 0) + 0.5
+        return counts
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                out[row, h % self.dim] += sign * (1.0 + math.log(count))
+        return normalize(out)
+
+
+class OllamaEmbedder:
+    def __init__(self, model=OLLAMA_EMBED_MODEL, url=OLLAMA_EMBED_URL, batch_size=32):
+        self.model = model
+        self.url = url
+        self.batch_size = batch_size
+        self.name = f"ollama-{model}"
+
+    def embed(self, texts):
+        # Embedding calls are short and don't take a generation slot
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            r = llm_client.session.post(self.url, json={"model": self.model, "input": texts[start:start + self.batch_size]},
+                                        timeout=30)
+            r.raise_for_status()
+            vectors.extend(r.json()["embeddings"])
+        return normalize(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+
+
+def create_embedder(backend=EMBEDDING_BACKEND):
+    if backend == "ollama":
+        return OllamaEmbedder()
+    if backend == "hashing":
+        return HashingEmbedder()
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
+
+def normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def row_text(row, columns):
+    text = " ".join(plain_text(row.get(c)) for c in columns)
+    return " ".join(text.split())[:MAX_TEXT_CHARS]
+
+
+def fingerprint(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def query_parts(analysis):
+    # (text, weight) pairs for one /analyze result
+    parts = []
+    for field, weight in QUERY_WEIGHTS.items():
+        value = analysis.get(field)
+        if isinstance(value, (list, tuple)):
+            value = " ".join(str(v) for v in value if v)
+        if value:
+            parts.append((str(value), weight))
+    return parts
+
+
+class ResourceIndex:
+    def __init__(self, loader=None, directory=EMBEDDING_DIR, embedder=None,
+                 refresh_interval=RECOMMEND_REFRESH_INTERVAL):
+        # loader(table, columns) returns that table's rows as dicts
+        self.loader = loader
+        self.directory = directory
+        self.embedder = embedder or create_embedder()
+        self.refresh_interval = refresh_interval
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._query_cache = OrderedDict()
+        self._matrix = None
+        self._slots = []
+        self._kind_masks = {}
+        self.synced_at = None
+        self.syncs = 0
+        self.failed_syncs = 0
+        self.embedded = 0
+        self.queries = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    # --- storage ---
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("embedder") != self.embedder.name or not os.path.exists(self.vectors_path):
+            return None
+        return meta
+
+    def _load(self):
+        # (Re)open the matrix and slot table as last written by any process
+        meta = self._read_meta()
+        matrix, slots = None, []
+        if meta and meta["slots"]:
+            matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                               shape=(meta["capacity"], meta["dim"]))
+            slots = meta["slots"]
+        masks = {kind: np.array([s is not None and s["kind"] == kind for s in slots], dtype=bool)
+                 for kind in KINDS}
+        with self._lock:
+            self._matrix = matrix
+            self._slots = slots
+            self._kind_masks = masks
+        return meta
+
+    def _write_meta(self, meta):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_path)
+
+    def _rewrite(self, slots, vectors, dim):
+        # New file with free slots dropped and room to grow; other processes
+        # keep their mapping of the old file until they reload
+        capacity = max(64, 2 * len(slots))
+        tmp = self.vectors_path + ".tmp"
+        out = np.memmap(tmp, dtype=np.float32, mode="w+", shape=(capacity, dim))
+        if len(slots):
+            out[:len(slots)] = vectors
+        out.flush()
+        del out
+        os.replace(tmp, self.vectors_path)
+        return {"embedder": self.embedder.name, "dim": dim, "capacity": capacity, "slots": slots}
+
+    def _file_lock(self):
+        handle = open(os.path.join(self.directory, ".lock"), "a")
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    # --- sync ---
+
+    def sync(self):
+        # Bring the index in line with Supabase; returns counts of changed rows
+        if self.loader is None:
+            raise RuntimeError("No loader configured")
+        with self._sync_lock:
+            try:
+                rows = self._fetch()
+            except Exception:
+                self.failed_syncs += 1
+                raise
+            handle = self._file_lock()
+            try:
+                result = self._apply(rows)
+            finally:
+                handle.close()
+            self._load()
+            self.synced_at = time.time()
+            self.syncs += 1
+            if any(result.values()):
+                logger.info("Recommendation index updated", extra=result)
+            return result
+
+    def _fetch(self):
+        rows = {}
+        for table, (kind, id_column, columns, text_columns) in SOURCES.items():
+            for row in self.loader(table, columns) or []:
+                key = f"{kind}:{row.get(id_column)}"
+                text = row_text(row, text_columns)
+                rows[key] = {
+                    "key": key, "kind": kind, "id": row.get(id_column),
+                    "title": row.get("title") or row.get("label"),
+                    "category": row.get("category") or row.get("type"),
+                    "fingerprint": fingerprint(text), "text": text,
+                }
+        return rows
+
+    def _apply(self, rows):
+        meta = self._read_meta()
+        slots = list(meta["slots"]) if meta else []
+        by_key = {s["key"]: i for i, s in enumerate(slots) if s is not None}
+
+        changed = [k for k, r in rows.items() if k in by_key and slots[by_key[k]]["fingerprint"] != r["fingerprint"]]
+        added = [k for k in rows if k not in by_key]
+        removed = [k for k in by_key if k not in rows]
+        result = {"added": len(added), "updated": len(changed), "removed": len(removed)}
+        if not (changed or added or removed) and meta:
+            return result
+
+        todo = changed + added
+        vectors = self.embedder.embed([rows[k]["text"] for k in todo]) if todo else None
+        self.embedded += len(todo)
+        fresh = {k: vectors[i] for i, k in enumerate(todo)}
+
+        def slot_meta(key):
+            return {f: rows[key][f] for f in ("key", "kind", "id", "title", "category", "fingerprint")}
+
+        dim = vectors.shape[1] if vectors is not None else (meta["dim"] if meta else 0)
+        needed = len(slots) + len(added)
+        if meta is None or needed > meta["capacity"] or meta["dim"] != dim:
+            # Rewrite: keep current slots' vectors, apply changes, compact
+            current = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                shape=(meta["capacity"], meta["dim"])) if meta else None
+            keys = [s["key"] for s in slots if s is not None and s["key"] in rows] + added
+            matrix = np.zeros((len(keys), dim), dtype=np.float32)
+            for i, key in enumerate(keys):
+                matrix[i] = fresh[key] if key in fresh else current[by_key[key]]
+            del current
+            self._write_meta(self._rewrite([slot_meta(k) for k in keys], matrix, dim))
+            return result
+
+        # In place: same slot for changed rows, zeroed slots for removed ones, appends for new
+        matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(meta["capacity"], dim))
+        for key in changed:
+            matrix[by_key[key]] = fresh[key]
+            slots[by_key[key]] = slot_meta(key)
+        for key in removed:
+            matrix[by_key[key]] = 0
+            slots[by_key[key]] = None
+        for key in added:
+            matrix[len(slots)] = fresh[key]
+            slots.append(slot_meta(key))
+        matrix.flush()
+        del matrix
+        meta["slots"] = slots
+        self._write_meta(meta)
+        return result
+
+    # --- background refresh ---
+
+    def start(self):
+        if self.loader is None or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="resource-index", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        # Sync once at startup, then every refresh_interval
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                logger.warning("Recommendation index sync failed", extra={"error": str(e)})
+            if self.refresh_interval <= 0 or self._stop.wait(self.refresh_interval):
+                return
+
+    def close(self):
+        self._stop.set()
+
+    # --- search ---
+
+    def _embed_queries(self, texts):
+        # Query strings repeat a lot (moods, common terms), so cache their vectors
+        vectors, missing = {}, []
+        with self._lock:
+            for text in texts:
+                if text in self._query_cache:
+                    self._query_cache.move_to_end(text)
+                    vectors[text] = self._query_cache[text]
+                elif text not in missing:
+                    missing.append(text)
+        if missing:
+            for text, vector in zip(missing, self.embedder.embed(missing)):
+                vectors[text] = vector
+            with self._lock:
+                for text in missing:
+                    self._query_cache[text] = vectors[text]
+                while len(self._query_cache) > 4096:
+                    self._query_cache.popitem(last=False)
+        return vectors
+
+    def search(self, queries, k=3, kinds=None, min_score=RECOMMEND_MIN_SCORE):
+        # queries: (m, dim) unit vectors -> (slots, per query {kind: [(slot, score), ...]}).
+        # The slot table is the one the scores came from; a reload may swap it right after
+        with self._lock:
+            matrix, slots, masks = self._matrix, self._slots, self._kind_masks
+        results = [{kind: [] for kind in (kinds or KINDS)} for _ in range(len(queries))]
+        if matrix is None or not len(queries):
+            return slots, results
+        scores = queries @ matrix[:len(slots)].T
+        for kind in kinds or KINDS:
+            mask = masks.get(kind)
+            if mask is None or not mask.any():
+                continue
+            candidates = np.flatnonzero(mask)
+            kind_scores = scores[:, candidates]
+            top = min(k, len(candidates))
+            best = np.argpartition(-kind_scores, top - 1, axis=1)[:, :top]
+            for q in range(len(queries)):
+                order = best[q][np.argsort(-kind_scores[q, best[q]])]
+                results[q][kind] = [(int(candidates[i]), float(kind_scores[q, i]))
+                                    for i in order if kind_scores[q, i] >= min_score]
+        return slots, results
+
+    def recommend(self, analyses, k=3, kinds=None):
+        # One list of matches per kind for each /analyze result
+        self.queries += len(analyses)
+        parts = [query_parts(a) for a in analyses]
+        vectors = self._embed_queries([text for p in parts for text, _ in p])
+        dim = next(iter(vectors.values())).shape[0] if vectors else 0
+        queries = np.zeros((len(analyses), dim), dtype=np.float32)
+        for i, p in enumerate(parts):
+            for text, weight in p:
+                queries[i] += weight * vectors[text]
+        if not dim:
+            return [{kind: [] for kind in kinds or KINDS} for _ in analyses]
+        queries = normalize(queries)
+
+        slots, results = self.search(queries, k=k, kinds=kinds)
+        out = []
+        for matches in results:
+            out.append({
+                kind: [dict({f: slots[slot][f] for f in ("id", "title", "category")}, score=round(score, 4))
+                       for slot, score in found]
+                for kind, found in matches.items()
+            })
+        return out
+
+    def stats(self):
+        with self._lock:
+            rows = sum(1 for s in self._slots if s is not None)
+            capacity = self._matrix.shape[0] if self._matrix is not None else 0
+        return {
+            "rows": rows,
+            "capacity": capacity,
+            "embedded": self.embedded,
+            "syncs": self.syncs,
+            "failed_syncs": self.failed_syncs,
+            "queries": self.queries,
+            "age_seconds": round(time.time() - self.synced_at, 1) if self.synced_at else -1,
+        }
+
+
+def create_index(loader):
+    index = ResourceIndex(loader)
+    atexit.register(index.close)
+    return index
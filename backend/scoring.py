@@ -0,0 +1,134 @@
+# backend/scoring.py
+# Data-driven scoring for assessment instruments.
+# Instrument definitions (risk bands per code) live in frameworks/instruments.json
+# and are compiled once into sorted threshold tables. Adding an instrument is a
+# data change: add its code and bands there.
+import os
+import json
+import time
+import threading
+from bisect import bisect_right
+
+import numpy as np
+
+SCORING_INSTRUMENTS_PATH = os.environ.get(
+    "SCORING_INSTRUMENTS_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "frameworks", "instruments.json")
+)
+
+DEFAULT_RISK_LEVEL = "Low"
+# An unknown assessment id is answered from memory for this long (seconds)
+SCORING_MISS_TTL = float(os.environ.get("SCORING_MISS_TTL", "60"))
+# Minimum seconds between catalog reloads triggered by unknown ids
+SCORING_REFRESH_INTERVAL = float(os.environ.get("SCORING_REFRESH_INTERVAL", "5"))
+
+
+class Instrument:
+    def __init__(self, code, name, bands, default=DEFAULT_RISK_LEVEL):
+        bands = sorted(bands, key=lambda b: b["min"])
+        self.code = code
+        self.name = name
+        self.default = default
+        # Precompiled table: thresholds[i] is the lowest score for labels[i + 1];
+        # labels[0] is the default band below the first threshold
+        self.thresholds = [b["min"] for b in bands]
+        self.labels = [default] + [b["label"] for b in bands]
+        self._np_thresholds = np.asarray(self.thresholds, dtype=np.float64)
+        self._np_labels = np.asarray(self.labels, dtype=object)
+
+    def band(self, total_score):
+        return self.labels[bisect_right(self.thresholds, total_score)]
+
+    def band_many(self, totals):
+        idx = np.searchsorted(self._np_thresholds, np.asarray(totals, dtype=np.float64), side="right")
+        return self._np_labels[idx]
+
+
+def load_instruments(path=SCORING_INSTRUMENTS_PATH):
+    with open(path, "r") as f:
+        definitions = json.load(f)
+    return {
+        code: Instrument(code, spec.get("name", code), spec.get("bands", []), spec.get("default", DEFAULT_RISK_LEVEL))
+        for code, spec in definitions.items()
+    }
+
+
+class ScoringEngine:
+    def __init__(self, instruments, miss_ttl=SCORING_MISS_TTL, refresh_interval=SCORING_REFRESH_INTERVAL):
+        self.instruments = instruments
+        self.miss_ttl = miss_ttl
+        self.refresh_interval = refresh_interval
+        # assessment id -> code, loaded from the assessments table on demand
+        self._codes = {}
+        # unknown assessment id -> expiry, so random ids can't force reloads
+        self._misses = {}
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def risk_level(self, code, total_score):
+        instrument = self.instruments.get(code)
+        if instrument is None:
+            return DEFAULT_RISK_LEVEL
+        return instrument.band(total_score)
+
+    def score(self, code, responses):
+        total_score = sum(r.get("value") or 0 for r in responses)
+        return total_score, self.risk_level(code, total_score)
+
+    def score_batch(self, codes, values):
+        # codes: one instrument code per submission
+        # values: one list of response values per submission
+        # Returns (totals, risk_levels) as arrays aligned with the input
+        lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+        flat = np.fromiter(
+            (x or 0 for v in values for x in v), dtype=np.float64, count=int(lengths.sum())
+        )
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(values) else lengths
+        totals = np.zeros(len(values), dtype=np.float64)
+        nonempty = lengths > 0
+        if nonempty.any():
+            totals[nonempty] = np.add.reduceat(flat, offsets[nonempty])
+
+        codes = np.asarray(codes, dtype=object)
+        risk_levels = np.full(len(values), DEFAULT_RISK_LEVEL, dtype=object)
+        for code in set(codes.tolist()):
+            instrument = self.instruments.get(code)
+            if instrument is None:
+                continue
+            mask = codes == code
+            risk_levels[mask] = instrument.band_many(totals[mask])
+
+        if np.all(totals == np.round(totals)):
+            totals = totals.astype(np.int64)
+        return totals, risk_levels
+
+    def code_for(self, assessment_id, client):
+        # Unknown ids reload the catalog at most once per refresh_interval and
+        # are then remembered as missing for miss_ttl
+        code = self._codes.get(assessment_id)
+        if code is not None:
+            return code
+        if self._misses.get(assessment_id, 0) > time.monotonic():
+            return None
+        with self._refresh_lock:
+            code = self._codes.get(assessment_id)
+            if code is None and time.monotonic() - self._last_refresh >= self.refresh_interval:
+                self.refresh_codes(client)
+                code = self._codes.get(assessment_id)
+        if code is None:
+            with self._lock:
+                if len(self._misses) > 10000:
+                    self._misses.clear()
+                self._misses[assessment_id] = time.monotonic() + self.miss_ttl
+        return code
+
+    def refresh_codes(self, client):
+        rows = client.table("assessments").select("id, code").execute().data or []
+        with self._lock:
+            self._codes = {row["id"]: row["code"] for row in rows}
+            self._misses = {}
+            self._last_refresh = time.monotonic()
+
+
+engine = ScoringEngine(load_instruments())
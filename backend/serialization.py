@@ -0,0 +1,89 @@
+# backend/serialization.py
+# JSON in and out of the Flask app, via msgspec.
+# - MsgspecJSONProvider replaces Flask's json module, so jsonify() and
+#   request.get_json() encode/decode in C and accept msgspec Structs.
+# - parse_body / parse_args decode and validate straight into the typed
+#   models in api_models.py in one pass; failures raise msgspec errors that
+#   app.py turns into a 400 before the route does any Supabase or Ollama work.
+# - json_response streams big lists in chunks instead of building one large
+#   string, so long result lists start flowing immediately and never sit in
+#   memory twice.
+import os
+
+import msgspec
+from flask import request
+from flask.json.provider import JSONProvider
+
+# Lists at least this long are streamed by json_response
+JSON_STREAM_MIN_ROWS = int(os.environ.get("JSON_STREAM_MIN_ROWS", "500"))
+JSON_STREAM_CHUNK_ROWS = int(os.environ.get("JSON_STREAM_CHUNK_ROWS", "500"))
+
+
+def _enc_hook(obj):
+    # Types msgspec doesn't know: numpy scalars/arrays and Markup
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise NotImplementedError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def encode(obj):
+    return msgspec.json.encode(obj, enc_hook=_enc_hook)
+
+
+def decode(data, type=None):
+    # Lenient about numbers sent as strings ("3") and the like
+    if type is None:
+        return msgspec.json.decode(data)
+    return msgspec.json.decode(data, type=type, strict=False)
+
+
+class MsgspecJSONProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        return encode(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return decode(s)
+
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip of the default implementation
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(encode(obj) + b"\n", mimetype="application/json")
+
+
+def parse_body(model):
+    # An empty body is {} so models with defaults still work for bare POSTs
+    return decode(request.get_data(cache=True) or b"{}", type=model)
+
+
+def parse_args(model):
+    return msgspec.convert(request.args.to_dict(), type=model, strict=False)
+
+
+def _iter_list(rows, chunk_rows):
+    yield b"["
+    for start in range(0, len(rows), chunk_rows):
+        if start:
+            yield b","
+        yield encode(rows[start:start + chunk_rows])[1:-1]
+    yield b"]"
+
+
+def iter_json(obj, list_key=None, chunk_rows=JSON_STREAM_CHUNK_ROWS):
+    # Encodes obj (a list, or a dict whose list_key holds the big list) piece by piece
+    if list_key is None:
+        yield from _iter_list(obj, chunk_rows)
+        return
+    head = encode({k: v for k, v in obj.items() if k != list_key})
+    yield head[:-1] + (b"," if len(head) > 2 else b"") + encode(list_key) + b":"
+    yield from _iter_list(obj[list_key], chunk_rows)
+    yield b"}"
+
+
+def json_response(app, obj, list_key=None, min_rows=JSON_STREAM_MIN_ROWS):
+    # jsonify, except that large lists are sent as a chunked stream
+    rows = obj if list_key is None else obj[list_key]
+    if len(rows) < min_rows:
+        return app.json.response(obj)
+    return app.response_class(iter_json(obj, list_key), mimetype="application/json")
@@ -0,0 +1,134 @@
+# backend/static_assets.py
+# Serves the built frontend (campus-well-link/dist).
+# - Precompressed variants written at build time (file.js.br / file.js.gz, see
+#   vite.config.ts) are sent when the client accepts them, so nothing is
+#   compressed per request.
+# - Vite's content-hashed files under assets/ are cached as immutable;
+#   index.html always revalidates; other public files (audio, PDFs) get
+#   STATIC_MAX_AGE.
+# - Everything goes through send_file with conditional=True: ETag/Last-Modified
+#   304s and Range requests (206), which audio seeking relies on.
+# Run `python static_assets.py` to precompress a dist built without the Vite plugin.
+import os
+import re
+import sys
+import gzip
+import mimetypes
+
+from flask import send_file, abort
+from werkzeug.security import safe_join
+
+STATIC_DIR = os.environ.get(
+    "STATIC_DIR", os.path.join(os.path.dirname(__file__), "..", "campus-well-link", "dist")
+)
+# Cache lifetime for public files that aren't content-hashed (seconds)
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", "86400"))
+IMMUTABLE_MAX_AGE = 31536000
+
+# Vite output names look like assets/index-B1a2c3D4.js
+HASHED_ASSET = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".ico", ".webmanifest"}
+# Preferred order when the client accepts several
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Smaller files aren't worth a compressed variant
+MIN_COMPRESS_SIZE = 1024
+
+
+def accepted_encodings(header):
+    # Accept-Encoding codings with a non-zero q-value
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def cache_control(filename):
+    if filename == "index.html":
+        return "no-cache"
+    if HASHED_ASSET.match(filename):
+        return f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    return f"public, max-age={STATIC_MAX_AGE}"
+
+
+class StaticFiles:
+    def __init__(self, root=STATIC_DIR):
+        self.root = root
+
+    def _variant(self, path, accept_encoding):
+        # (content encoding or None, path to send)
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and os.path.isfile(path + suffix):
+                return encoding, path + suffix
+        return None, path
+
+    def response(self, filename, request):
+        path = safe_join(self.root, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        compressible = os.path.splitext(filename)[1].lower() in COMPRESSIBLE
+        encoding, served = self._variant(path, request.headers.get("Accept-Encoding")) if compressible else (None, path)
+
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        # The ETag comes from the file actually sent, so each encoding validates separately
+        response = send_file(served, mimetype=mimetype, conditional=True, etag=True, max_age=None)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if compressible:
+            response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = cache_control(filename)
+        return response
+
+
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def precompress(root=STATIC_DIR):
+    # Write .gz (and .br when the brotli module is installed) next to every
+    # compressible file that doesn't already have them. Returns files written.
+    brotli = _brotli()
+    written = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+                continue
+            path = os.path.join(directory, name)
+            if os.path.getsize(path) < MIN_COMPRESS_SIZE:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            variants = [(".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append((".br", lambda d: brotli.compress(d, quality=11)))
+            for suffix, compress in variants:
+                target = path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    continue
+                compressed = compress(data)
+                # A variant that doesn't save anything would only cost a lookup
+                if len(compressed) >= len(data):
+                    continue
+                with open(target, "wb") as f:
+                    f.write(compressed)
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR
+    print(f"Wrote {precompress(root)} compressed files under {root}")
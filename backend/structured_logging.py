@@ -0,0 +1,81 @@
+# backend/structured_logging.py
+# Leveled, structured logging for the backend, replacing print().
+# Modules log with logging.getLogger(__name__) and pass fields via extra=;
+# with LOG_FORMAT=json each record is one JSON object per line. Records logged
+# with extra={"sampled": True} (e.g. the per-request access log) are kept
+# only at LOG_SAMPLE_RATE so high-volume lines don't flood the output.
+import os
+import sys
+import json
+import random
+import logging
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.1"))
+
+# Attributes every LogRecord has; anything else came from extra=
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sampled"}
+
+
+def record_fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _RESERVED}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class SampleFilter(logging.Filter):
+    def __init__(self, rate=LOG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if getattr(record, "sampled", False):
+            return random.random() < self.rate
+        return True
+
+
+_configured = False
+
+
+def configure(level=LOG_LEVEL, fmt=LOG_FORMAT, sample_rate=LOG_SAMPLE_RATE):
+    # Idempotent; called once when the app module is imported
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    handler.addFilter(SampleFilter(sample_rate))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+    # Per-request HTTP client chatter would drown out everything else
+    for noisy in ("httpx", "httpcore", "urllib3", "hpack"):
+        logging.getLogger(noisy).setLevel(max(logging.WARNING, root.level))
@@ -0,0 +1,109 @@
+# backend/supabase_clients.py
+# Reuse Supabase clients across requests instead of calling create_client
+# for every authenticated call.
+# All per-user clients share one pooled httpx transport, so connections to
+# PostgREST stay open; each client only carries its own bearer header.
+# Every query through that transport is timed per table (see metrics.py).
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import httpx
+from supabase import create_client, Client, ClientOptions
+
+import metrics
+
+SUPABASE_CLIENT_CACHE_SIZE = int(os.environ.get("SUPABASE_CLIENT_CACHE_SIZE", "256"))
+# Access tokens are short-lived; don't keep their clients around much longer
+SUPABASE_CLIENT_TTL = float(os.environ.get("SUPABASE_CLIENT_TTL", "3600"))
+SUPABASE_HTTP_TIMEOUT = float(os.environ.get("SUPABASE_HTTP_TIMEOUT", "120"))
+SUPABASE_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_CONNECTIONS", "50"))
+
+QUERY_SECONDS = metrics.histogram(
+    "supabase_query_seconds",
+    "Supabase REST call duration up to response headers, per table or RPC",
+    ["table", "method", "status"]
+)
+
+
+def _resource(path):
+    # /rest/v1/<table> or /rest/v1/rpc/<function>; anything else is grouped by service
+    parts = [p for p in path.split("/") if p]
+    if len(parts) >= 3 and parts[0] == "rest":
+        return "/".join(parts[2:4]) if parts[2] == "rpc" else parts[2]
+    return parts[0] if parts else ""
+
+
+def _on_request(req):
+    req.extensions["started"] = time.perf_counter()
+
+
+def _on_response(resp):
+    started = resp.request.extensions.get("started")
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    QUERY_SECONDS.observe(elapsed, table=_resource(resp.request.url.path), method=resp.request.method,
+                          status=resp.status_code)
+    metrics.record_phase("supabase", elapsed)
+
+
+http_client = httpx.Client(
+    timeout=SUPABASE_HTTP_TIMEOUT,
+    limits=httpx.Limits(
+        max_connections=SUPABASE_MAX_CONNECTIONS,
+        max_keepalive_connections=SUPABASE_MAX_CONNECTIONS
+    ),
+    event_hooks={"request": [_on_request], "response": [_on_response]}
+)
+
+
+def create_shared_client(url, key) -> Client:
+    # A client on the shared transport that authenticates with the key itself
+    # (anon or service role), for app-wide use
+    options = ClientOptions(httpx_client=http_client, auto_refresh_token=False, persist_session=False)
+    return create_client(url, key, options=options)
+
+
+class ClientCache:
+    def __init__(self, url, key, max_entries=SUPABASE_CLIENT_CACHE_SIZE, ttl=SUPABASE_CLIENT_TTL):
+        self.url = url
+        self.key = key
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _create(self, token) -> Client:
+        options = ClientOptions(
+            headers={"Authorization": f"Bearer {token}"},
+            httpx_client=http_client,
+            auto_refresh_token=False,
+            persist_session=False
+        )
+        return create_client(self.url, self.key, options=options)
+
+    def get(self, token) -> Client:
+        now = time.time()
+        with self._lock:
+            entry = self._clients.get(token)
+            if entry is not None and entry[0] > now:
+                self._clients.move_to_end(token)
+                return entry[1]
+
+        client = self._create(token)
+
+        with self._lock:
+            self._clients[token] = (now + self.ttl, client)
+            self._clients.move_to_end(token)
+            while len(self._clients) > self.max_entries:
+                self._clients.popitem(last=False)
+        return client
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def __len__(self):
+        return len(self._clients)
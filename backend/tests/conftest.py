@@ -0,0 +1,7 @@
+# backend/tests/conftest.py
+# The backend modules import each other as siblings (as app.py and wsgi.py
+# run them), so put backend/ on the path.
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,63 @@
+import msgspec
+import pytest
+from flask import Flask
+
+import api_models
+from serialization import decode, parse_args, parse_body
+
+
+def test_submit_request_decodes_and_coerces_numbers():
+    body = b'{"user_id": "u1", "assessment_id": "a1", "responses": [{"question_id": "q1", "value": "3"}], "extra": 1}'
+    req = decode(body, type=api_models.SubmitRequest)
+    assert req.responses[0].value == 3
+    assert req.responses[0].text is None
+
+
+@pytest.mark.parametrize("body", [
+    b'{"assessment_id": "a1", "responses": [{"question_id": "q1"}]}',
+    b'{"user_id": "u1", "assessment_id": "a1", "responses": []}',
+    b'{"user_id": "", "assessment_id": "a1", "responses": [{"question_id": "q1"}]}',
+    b'{"user_id": "u1", "assessment_id": "a1", "responses": [{"question_id": "q1", "value": "lots"}]}',
+    b'{"user_id": "u1", "assessment_id": "a1", "responses": "q1=3"}',
+])
+def test_submit_request_rejects_bad_bodies(body):
+    with pytest.raises(msgspec.ValidationError):
+        decode(body, type=api_models.SubmitRequest)
+
+
+def test_malformed_json_is_a_decode_error():
+    with pytest.raises(msgspec.DecodeError):
+        decode(b'{"message": ', type=api_models.ChatRequest)
+
+
+def test_text_length_limits():
+    decode(msgspec.json.encode({"message": "x" * 20_000}), type=api_models.ChatRequest)
+    with pytest.raises(msgspec.ValidationError):
+        decode(msgspec.json.encode({"message": "x" * 20_001}), type=api_models.ChatRequest)
+
+
+def test_chat_session_id_absent_vs_null():
+    assert decode(b'{"message": "hi"}', type=api_models.ChatRequest).session_id is msgspec.UNSET
+    assert decode(b'{"message": "hi", "session_id": null}', type=api_models.ChatRequest).session_id is None
+
+
+def test_recommend_request_bounds():
+    req = decode(b'{"mood": "anxious", "kinds": ["resource"]}', type=api_models.RecommendRequest)
+    assert req.k == 3
+    for body in (b'{"k": 0}', b'{"k": 21}', b'{"kinds": ["video"]}'):
+        with pytest.raises(msgspec.ValidationError):
+            decode(body, type=api_models.RecommendRequest)
+
+
+def test_parse_body_and_args_in_a_request():
+    app = Flask(__name__)
+    with app.test_request_context("/?wait=2.5", method="POST", data=b""):
+        # An empty body counts as {}
+        assert parse_body(api_models.AnalyzeRequest).content == ""
+        assert parse_args(api_models.AnalysisWaitQuery).wait == 2.5
+    with app.test_request_context("/?wait=-1"):
+        with pytest.raises(msgspec.ValidationError):
+            parse_args(api_models.AnalysisWaitQuery)
+    with app.test_request_context("/?days=seven&user_id=u1"):
+        with pytest.raises(msgspec.ValidationError):
+            parse_args(api_models.DashboardQuery)
@@ -0,0 +1,69 @@
+import pytest
+
+import crisis_detector
+from crisis_detector import CrisisMatcher
+
+LEXICON = {
+    "High": ["suicide", "kill myself", "end it all"],
+    "Medium": ["hopeless", "can't go on", "self-harm", "he", "she", "hers"],
+}
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return CrisisMatcher(LEXICON)
+
+
+def test_clean_text_is_not_flagged(matcher):
+    assert matcher.scan("Exams went fine and I slept well.") == {"flagged": False, "risk_level": "Low", "matches": []}
+
+
+def test_most_severe_match_wins(matcher):
+    result = matcher.scan("I feel hopeless and want to end it all")
+    assert result["flagged"]
+    assert result["risk_level"] == "High"
+    assert result["matches"] == ["hopeless", "end it all"]
+
+
+def test_matches_whole_words_only(matcher):
+    # "suicide" inside a longer word, "hopeless" as a prefix
+    assert matcher.scan("suicides-prevention hopelessness")["matches"] == []
+
+
+def test_normalizes_case_quotes_and_separators(matcher):
+    assert matcher.scan("I CAN’T  GO-ON")["matches"] == ["can't go on"]
+    assert matcher.scan("thinking about self harm")["matches"] == ["self harm"]
+    assert matcher.scan("Kill_Myself")["matches"] == ["kill myself"]
+
+
+def test_overlapping_terms_are_all_found(matcher):
+    # "he" and "she" end at the same character, "hers" continues past it
+    assert sorted(matcher.scan("she said hers")["matches"]) == ["hers", "she"]
+    assert matcher.scan("he")["matches"] == ["he"]
+
+
+def test_each_term_reported_once_in_order_of_first_appearance(matcher):
+    assert matcher.scan("hopeless, suicide, hopeless")["matches"] == ["hopeless", "suicide"]
+
+
+def test_empty_and_none_text(matcher):
+    assert matcher.scan("")["risk_level"] == "Low"
+    assert matcher.scan(None)["risk_level"] == "Low"
+
+
+def test_shipped_lexicon():
+    compiled = CrisisMatcher(crisis_detector.load_lexicon())
+    result = compiled.scan("Honestly I feel worthless and suicidal, like there's no way out. Can't go on.")
+    assert result["risk_level"] == "High"
+    assert result["matches"] == ["worthless", "suicidal", "no way out", "can't go on"]
+
+
+@pytest.mark.parametrize("llm, crisis, expected", [
+    ("Low", {"flagged": True, "risk_level": "High"}, "High"),
+    ("High", {"flagged": True, "risk_level": "Medium"}, "High"),
+    ("Medium", {"flagged": False, "risk_level": "Low"}, "Medium"),
+    ("Unknown", {"flagged": True, "risk_level": "Medium"}, "Medium"),
+    ("Unknown", {"flagged": False, "risk_level": "Low"}, "Unknown"),
+])
+def test_escalate(llm, crisis, expected):
+    assert crisis_detector.escalate(llm, crisis) == expected
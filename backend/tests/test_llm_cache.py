@@ -0,0 +1,59 @@
+import pytest
+
+import llm_cache
+from llm_cache import LLMCache, MemoryBackend, SQLiteBackend, make_key
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend(max_entries=3)
+    return SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=3)
+
+
+def test_key_depends_on_every_part():
+    keys = {
+        make_key("llama3", "system", "input"),
+        make_key("mistral", "system", "input"),
+        make_key("llama3", "other", "input"),
+        make_key("llama3", "system", "other"),
+    }
+    assert len(keys) == 4
+    assert make_key("llama3", None, None) == make_key("llama3", "", "")
+
+
+def test_get_returns_what_was_set(backend):
+    backend.set("k", {"mood": "calm", "terms": ["a"]}, expires_at=200)
+    assert backend.get("k", now=100) == {"mood": "calm", "terms": ["a"]}
+
+
+def test_expired_entries_are_dropped(backend):
+    backend.set("k", {"v": 1}, expires_at=200)
+    assert backend.get("k", now=200) is None
+    assert len(backend) == 0
+
+
+def test_least_recently_used_is_evicted(backend, monkeypatch):
+    clock = iter(range(1000))
+    monkeypatch.setattr(llm_cache.time, "time", lambda: next(clock))
+    for key in ("a", "b", "c"):
+        backend.set(key, {"v": key}, expires_at=10_000)
+    # Touch "a" so "b" becomes the oldest
+    assert backend.get("a", now=next(clock)) == {"v": "a"}
+    backend.set("d", {"v": "d"}, expires_at=10_000)
+    assert len(backend) == 3
+    assert backend.get("b", now=next(clock)) is None
+    assert all(backend.get(k, now=next(clock)) is not None for k in ("a", "c", "d"))
+
+
+def test_cache_ttl_and_stats(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = LLMCache(MemoryBackend(max_entries=10), ttl=60)
+    cache.set("k", {"v": 1})
+    assert cache.get("k") == {"v": 1}
+    now[0] += 59
+    assert cache.get("k") == {"v": 1}
+    now[0] += 1
+    assert cache.get("k") is None
+    assert cache.stats() == {"backend": "MemoryBackend", "entries": 0, "hits": 2, "misses": 1}
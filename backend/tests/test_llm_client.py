@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+import requests
+
+import llm_client
+from llm_client import CircuitBreaker, ConcurrencyLimiter, OllamaOverloaded, OllamaUnavailable
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(llm_client.time, "monotonic", lambda: now[0])
+    return now
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+def test_outages_are_connection_errors_timeouts_and_5xx():
+    assert llm_client.is_outage(requests.ConnectionError())
+    assert llm_client.is_outage(requests.Timeout())
+    assert llm_client.is_outage(http_error(503))
+    assert not llm_client.is_outage(http_error(400))
+    assert not llm_client.is_outage(ValueError("bad json"))
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure(requests.ConnectionError())
+    breaker.before_call()
+    breaker.record_failure(requests.Timeout())
+    clock[0] += 10
+    with pytest.raises(OllamaUnavailable) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == 20
+    assert breaker.stats()["open"]
+    assert breaker.stats()["opened"] == 1
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=30)
+    breaker.record_failure(requests.ConnectionError())
+    breaker.record_success()
+    breaker.record_failure(requests.ConnectionError())
+    breaker.before_call()
+    assert not breaker.stats()["open"]
+
+
+def test_client_errors_do_not_open_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure(http_error(404))
+    breaker.before_call()
+    assert not breaker.stats()["open"]
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure(requests.ConnectionError())
+    clock[0] += 30
+    breaker.before_call()
+    assert breaker.stats()["half_open"]
+    with pytest.raises(OllamaUnavailable):
+        breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+    assert not breaker.stats()["open"]
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure(requests.ConnectionError())
+    clock[0] += 31
+    breaker.before_call()
+    breaker.record_failure(http_error(502))
+    assert breaker.stats()["opened"] == 2
+    with pytest.raises(OllamaUnavailable) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == 30
+
+
+def test_skipped_probe_lets_another_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure(requests.ConnectionError())
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_skipped()
+    breaker.before_call()
+    assert breaker.stats()["half_open"]
+
+
+def test_limiter_rejects_when_queue_is_full():
+    limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=0, queue_timeout=1)
+    limiter.acquire()
+    with pytest.raises(OllamaOverloaded):
+        limiter.acquire()
+    limiter.release()
+    with limiter.slot():
+        assert limiter.stats()["in_flight"] == 1
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_limiter_times_out_waiting():
+    limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    limiter.acquire()
+    with pytest.raises(OllamaOverloaded, match="Timed out"):
+        limiter.acquire()
+    assert limiter.stats()["waiting"] == 0
+
+
+def test_limiter_hands_the_slot_to_a_waiter():
+    limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=1, queue_timeout=5)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def waiter():
+        limiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    assert not acquired.wait(0.05)
+    assert limiter.stats()["waiting"] == 1
+    limiter.release()
+    assert acquired.wait(2)
+    thread.join()
+    assert limiter.stats() == {"in_flight": 1, "waiting": 0, "max_in_flight": 1, "max_queue": 1}
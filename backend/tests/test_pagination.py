@@ -0,0 +1,71 @@
+import base64
+import json
+
+import pytest
+
+from pagination import BadRequest, build_select, decode_cursor, encode_cursor, keyset_filter, parse_limit
+
+TS = "2026-03-01T12:30:00.123456+00:00"
+ROW_ID = "3f2b8c1e-7d4a-4e8b-9c0d-1a2b3c4d5e6f"
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(TS, ROW_ID)) == (TS, ROW_ID)
+
+
+def test_cursor_accepts_z_suffix_and_normalizes_uuid():
+    ts, row_id = decode_cursor(encode_cursor("2026-03-01T12:30:00Z", ROW_ID.upper()))
+    assert ts == "2026-03-01T12:30:00Z"
+    assert row_id == ROW_ID
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64 at all!",
+    raw_cursor("just a string"),
+    raw_cursor([TS]),
+    raw_cursor([TS, "not-a-uuid"]),
+    raw_cursor(["yesterday", ROW_ID]),
+    raw_cursor([12345, ROW_ID]),
+    raw_cursor([TS, None]),
+    # Would break out of the quoted or=() filter
+    raw_cursor(['2026-03-01",id.gt."0', ROW_ID]),
+    raw_cursor([TS, ROW_ID + '")']),
+])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(BadRequest):
+        decode_cursor(cursor)
+
+
+def test_keyset_filter_descending():
+    assert keyset_filter("completed_at", TS, ROW_ID) == (
+        f'completed_at.lt."{TS}",and(completed_at.eq."{TS}",id.lt."{ROW_ID}")'
+    )
+
+
+def test_keyset_filter_ascending():
+    assert keyset_filter("created_at", TS, ROW_ID, descending=False) == (
+        f'created_at.gt."{TS}",and(created_at.eq."{TS}",id.gt."{ROW_ID}")'
+    )
+
+
+@pytest.mark.parametrize("value, limit", [(None, 20), ("5", 5), ("0", 1), ("-3", 1), ("1000", 100)])
+def test_parse_limit_clamps(value, limit):
+    assert parse_limit(value, 20, 100) == limit
+
+
+def test_parse_limit_rejects_non_integers():
+    with pytest.raises(BadRequest):
+        parse_limit("ten", 20, 100)
+
+
+def test_build_select_adds_required_fields_and_rejects_unknown():
+    allowed = {"id": "id", "score": "total_score", "assessment": "assessments(code)"}
+    assert build_select(None, allowed, ["score"], ["id"]) == "total_score, id"
+    assert build_select("assessment, score", allowed, ["score"], ["id"]) == "assessments(code), total_score, id"
+    with pytest.raises(BadRequest):
+        build_select("score,password", allowed, ["score"], ["id"])
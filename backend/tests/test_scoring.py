@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from scoring import DEFAULT_RISK_LEVEL, Instrument, ScoringEngine, load_instruments
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return ScoringEngine(load_instruments())
+
+
+@pytest.mark.parametrize("total, level", [
+    (0, "Low"), (4, "Low"), (5, "Mild"), (9, "Mild"), (10, "Moderate"),
+    (14.5, "Moderate"), (15, "Moderately Severe"), (20, "Severe"), (27, "Severe"),
+])
+def test_phq9_bands(engine, total, level):
+    assert engine.risk_level("PHQ-9", total) == level
+
+
+def test_band_edges_are_inclusive_lower_bounds():
+    instrument = Instrument("X", "X", [{"min": 10, "label": "High"}, {"min": 3, "label": "Mid"}])
+    assert [instrument.band(s) for s in (2.9, 3, 9.99, 10)] == ["Low", "Mid", "Mid", "High"]
+
+
+def test_unknown_code_gets_default(engine):
+    assert engine.risk_level("NOPE", 100) == DEFAULT_RISK_LEVEL
+
+
+def test_score_sums_values_and_ignores_blanks(engine):
+    responses = [{"value": 3}, {"value": None}, {}, {"value": 2}]
+    assert engine.score("GAD-7", responses) == (5, "Mild")
+
+
+def test_score_batch_matches_score(engine):
+    codes = ["PHQ-9", "GAD-7", "C-SSRS", "NOPE", "GAD-7"]
+    values = [[3, 3, 3, 3], [1, None, 1], [0, 1], [50], []]
+    totals, levels = engine.score_batch(codes, values)
+    assert totals.dtype == np.int64
+    expected = [engine.score(c, [{"value": v} for v in vs]) for c, vs in zip(codes, values)]
+    assert list(zip(totals.tolist(), levels.tolist())) == expected
+
+
+def test_score_batch_keeps_fractional_totals(engine):
+    totals, levels = engine.score_batch(["GAD-7"], [[2.5, 2.5, 0.5]])
+    assert totals.tolist() == [5.5]
+    assert levels.tolist() == ["Mild"]
+
+
+def test_unknown_assessment_id_is_remembered_as_missing():
+    class Client:
+        calls = 0
+
+        def table(self, name):
+            return self
+
+        def select(self, columns):
+            return self
+
+        def execute(self):
+            Client.calls += 1
+            return type("Result", (), {"data": [{"id": "a1", "code": "PHQ-9"}]})()
+
+    engine = ScoringEngine({}, miss_ttl=60, refresh_interval=0)
+    client = Client()
+    assert engine.code_for("a1", client) == "PHQ-9"
+    assert engine.code_for("made-up", client) is None
+    assert engine.code_for("made-up", client) is None
+    assert Client.calls == 2
@@ -0,0 +1,147 @@
+# backend/time_tracking.py
+# Aggregates session-time heartbeats in memory and writes them in bulk.
+# Each heartbeat credits the time since the user's previous one (capped, so a
+# second tab or a sleeping laptop doesn't inflate totals) to the user's
+# current UTC day. The previous heartbeat is kept in the database by the
+# record_heartbeat RPC, so it is the same whichever worker a tab's requests
+# land on. Every TIME_FLUSH_INTERVAL seconds the whole minutes per
+# (user, day) go to the apply_time_deltas RPC (see time_tracking.sql) in one
+# call; leftover seconds carry over to the next flush.
+import os
+import logging
+import time
+import atexit
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Clients send a heartbeat this often; it is also the most a single heartbeat can credit
+TIME_HEARTBEAT_INTERVAL = int(os.environ.get("TIME_HEARTBEAT_INTERVAL", "60"))
+TIME_FLUSH_INTERVAL = float(os.environ.get("TIME_FLUSH_INTERVAL", "300"))
+
+
+def utc_day(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).date().isoformat()
+
+
+class TimeTracker:
+    def __init__(self, client_for, service_client=None, heartbeat_interval=TIME_HEARTBEAT_INTERVAL,
+                 flush_interval=TIME_FLUSH_INTERVAL):
+        # client_for(token) returns a user's client; used when there is no service client
+        self.client_for = client_for
+        self.service_client = service_client
+        self.heartbeat_interval = heartbeat_interval
+        self.flush_interval = flush_interval
+        self._seconds = {}    # (user_id, day) -> uncredited seconds
+        self._tokens = {}     # user_id -> latest token, for per-user fallback flushes
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.heartbeats = 0
+        self.flushed_minutes = 0
+        self.failed_flushes = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="time-flusher", daemon=True)
+                self._thread.start()
+
+    def heartbeat(self, user_id, token, now=None):
+        # Returns the seconds credited
+        self.start()
+        client = self.service_client or self.client_for(token)
+        result = client.rpc("record_heartbeat", {"p_user_id": user_id,
+                                                 "max_seconds": int(self.heartbeat_interval)}).execute()
+        credit = float(result.data or 0)
+        now = time.time() if now is None else now
+        with self._lock:
+            self._tokens[user_id] = token
+            key = (user_id, utc_day(now))
+            self._seconds[key] = self._seconds.get(key, 0) + credit
+            self.heartbeats += 1
+        return credit
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _take(self, final):
+        # Whole minutes per (user, day); keep the remainder for the next flush
+        with self._lock:
+            deltas = []
+            for (user_id, day), seconds in list(self._seconds.items()):
+                minutes = int(round(seconds / 60)) if final else int(seconds // 60)
+                remainder = 0 if final else seconds - minutes * 60
+                if minutes:
+                    deltas.append({"user_id": user_id, "day": day, "minutes": minutes})
+                if remainder:
+                    self._seconds[(user_id, day)] = remainder
+                else:
+                    del self._seconds[(user_id, day)]
+
+            tokens = {d["user_id"]: self._tokens.get(d["user_id"]) for d in deltas}
+            # Forget tokens of users with nothing left to flush
+            pending_users = {user_id for user_id, _ in self._seconds}
+            for user_id in list(self._tokens):
+                if user_id not in pending_users:
+                    del self._tokens[user_id]
+        return deltas, tokens
+
+    def _restore(self, deltas):
+        with self._lock:
+            for d in deltas:
+                key = (d["user_id"], d["day"])
+                self._seconds[key] = self._seconds.get(key, 0) + d["minutes"] * 60
+
+    def flush(self, final=False):
+        with self._flush_lock:
+            deltas, tokens = self._take(final)
+            if not deltas:
+                return 0
+
+            if self.service_client is not None:
+                batches = [(self.service_client, deltas)]
+            else:
+                # Without the service role each user's token can only write that user's rows
+                by_user = {}
+                for d in deltas:
+                    by_user.setdefault(d["user_id"], []).append(d)
+                batches = [(self.client_for(tokens.get(user_id)), rows) for user_id, rows in by_user.items()]
+
+            written = 0
+            for client, rows in batches:
+                try:
+                    client.rpc("apply_time_deltas", {"deltas": rows}).execute()
+                    written += sum(d["minutes"] for d in rows)
+                except Exception as e:
+                    self.failed_flushes += 1
+                    logger.warning("Time tracking flush failed, keeping deltas for the next one",
+                                   extra={"deltas": len(rows), "error": str(e)})
+                    self._restore(rows)
+            self.flushed_minutes += written
+            return written
+
+    def close(self):
+        self._stop.set()
+        self.flush(final=True)
+
+    def stats(self):
+        with self._lock:
+            pending = sum(self._seconds.values())
+            users = len({user_id for user_id, _ in self._seconds})
+        return {
+            "active_users": users,
+            "pending_seconds": pending,
+            "heartbeats": self.heartbeats,
+            "flushed_minutes": self.flushed_minutes,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+def create_tracker(client_for, service_client=None):
+    tracker = TimeTracker(client_for, service_client)
+    atexit.register(tracker.close)
+    return tracker
@@ -0,0 +1,126 @@
+# backend/wsgi.py
+# Production entry point: `python wsgi.py` from the backend directory.
+# On Linux/macOS it runs gunicorn with WEB_WORKERS processes of WEB_THREADS
+# threads each (gthread workers), so a request blocked on Ollama ties up one
+# thread instead of the whole server. Windows has no gunicorn, so there (or
+# with WEB_SERVER=waitress) it runs waitress with WEB_THREADS threads.
+# `gunicorn wsgi:application` also works, but skips the settings below.
+#
+# Workers are forked before the app is imported (no preload): the app starts
+# background threads and connection pools that must not be shared across a fork.
+# Each worker has its own Ollama limiter, so the model server sees up to
+# WEB_WORKERS * OLLAMA_MAX_IN_FLIGHT generations at once.
+import os
+import sys
+import signal
+import logging
+
+WEB_SERVER = os.environ.get("WEB_SERVER", "auto")
+WEB_HOST = os.environ.get("WEB_HOST", "127.0.0.1")
+WEB_PORT = int(os.environ.get("WEB_PORT", "5000"))
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "2"))
+WEB_THREADS = int(os.environ.get("WEB_THREADS", "32"))
+# Longest a request may run before gunicorn restarts the worker (the Ollama timeout is 60s)
+WEB_TIMEOUT = int(os.environ.get("WEB_TIMEOUT", "120"))
+# On SIGTERM: time for in-flight requests to finish
+WEB_GRACEFUL_TIMEOUT = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", "30"))
+# Then, once a worker has stopped serving: time for queued analyses to finish
+WEB_SHUTDOWN_TIMEOUT = int(os.environ.get("WEB_SHUTDOWN_TIMEOUT", "15"))
+# Then for buffered activity, session time and the rest of app.shutdown
+SHUTDOWN_FLUSH_SECONDS = 5
+
+logger = logging.getLogger("wsgi")
+
+
+def application(environ, start_response):
+    # Imported on first use so each gunicorn worker builds its own app state
+    from app import app
+    return app.wsgi_app(environ, start_response)
+
+
+def check_thread_budget():
+    # Requests waiting on Ollama hold a thread each; keep some free for everything else
+    import llm_client
+    llm_threads = llm_client.OLLAMA_MAX_IN_FLIGHT + llm_client.OLLAMA_MAX_QUEUE
+    if llm_threads >= WEB_THREADS:
+        logger.warning(
+            "LLM requests can occupy every worker thread; raise WEB_THREADS or lower OLLAMA_MAX_QUEUE",
+            extra={"web_threads": WEB_THREADS, "llm_threads": llm_threads}
+        )
+
+
+def _post_worker_init(worker):
+    # gunicorn uses graceful_timeout both for the worker's drain and for the
+    # master's deadline before SIGKILL. The master's covers drain + shutdown;
+    # this (forked) copy of the config limits the drain alone, so app.shutdown
+    # still has its own budget when it runs.
+    worker.cfg.set("graceful_timeout", WEB_GRACEFUL_TIMEOUT)
+
+
+def _worker_exit(server, worker):
+    import app
+    app.shutdown(WEB_SHUTDOWN_TIMEOUT)
+
+
+def run_gunicorn():
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": f"{WEB_HOST}:{WEB_PORT}",
+                "workers": WEB_WORKERS,
+                "threads": WEB_THREADS,
+                "worker_class": "gthread",
+                "timeout": WEB_TIMEOUT,
+                "graceful_timeout": WEB_GRACEFUL_TIMEOUT + WEB_SHUTDOWN_TIMEOUT + SHUTDOWN_FLUSH_SECONDS,
+                "keepalive": 5,
+                "preload_app": False,
+                "post_worker_init": _post_worker_init,
+                "worker_exit": _worker_exit,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import app
+            return app.app
+
+    Server().run()
+
+
+def run_waitress():
+    from waitress import serve
+    import app
+
+    # waitress only stops on KeyboardInterrupt; turn SIGTERM into the same clean exit
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        serve(app.app, host=WEB_HOST, port=WEB_PORT, threads=WEB_THREADS, channel_timeout=WEB_TIMEOUT)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        app.shutdown(WEB_SHUTDOWN_TIMEOUT)
+
+
+def main():
+    import structured_logging
+    structured_logging.configure()
+    check_thread_budget()
+
+    server = WEB_SERVER
+    if server == "auto":
+        server = "waitress" if os.name == "nt" else "gunicorn"
+    logger.info("Starting server", extra={"server": server, "bind": f"{WEB_HOST}:{WEB_PORT}",
+                                          "workers": WEB_WORKERS if server == "gunicorn" else 1,
+                                          "threads": WEB_THREADS})
+    if server == "gunicorn":
+        run_gunicorn()
+    elif server == "waitress":
+        run_waitress()
+    else:
+        raise SystemExit(f"Unknown WEB_SERVER: {server}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Input } from '@/components/ui/input';
@@ -67,6 +67,8 @@ export const AIInterfaceStandalone: React.FC = () => {
   const [isExpanded, setIsExpanded] = useState(false);
   const [isListening, setIsListening] = useState(false);
   const [recognition, setRecognition] = useState<any>(null);
+  // Server-side conversation id; the backend keeps the history between turns
+  const chatSessionId = useRef('');
 
   // Real Data State
   const [chartData, setChartData] = useState<any[]>(mockData);
@@ -79,74 +81,20 @@ export const AIInterfaceStandalone: React.FC = () => {
         const { data: { user } } = await supabase.auth.getUser();
         if (!user) return;
 
-        const today = new Date();
-        const sevenDaysAgo = new Date();
-        sevenDaysAgo.setDate(today.getDate() - 6);
-
-        // Fetch Journals (Mood)
-        const { data: journals } = await supabase
-          .from('journals')
-          .select('created_at, mood')
-          .eq('user_id', user.id)
-          .gte('created_at', sevenDaysAgo.toISOString());
-
-        // Fetch Stress Assessments (Score)
-        const { data: assessments } = await supabase
-          .from('stress_assessments')
-          .select('created_at, score')
-          .eq('user_id', user.id)
-          .gte('created_at', sevenDaysAgo.toISOString());
-
-        // Process Data
-        const days = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'];
-        const processedData = [];
-        let lastScore = 50; // Default start
-
-        for (let i = 0; i < 7; i++) {
-          const d = new Date(sevenDaysAgo);
-          d.setDate(d.getDate() + i);
-          const dateStr = d.toISOString().split('T')[0];
-          const dayName = days[d.getDay()];
-
-          // Filter for this day
-          const dayJournals = journals?.filter(j => j.created_at.startsWith(dateStr)) || [];
-          const dayAssessments = assessments?.filter(a => a.created_at.startsWith(dateStr)) || [];
-
-          // Calculate Mood Score
-          let moodScore = 50;
-          if (dayJournals.length > 0) {
-            const moodMap: any = { 'Great': 100, 'Good': 75, 'Okay': 50, 'Not Good': 25, 'Awful': 0 };
-            const totalMood = dayJournals.reduce((acc, j) => acc + (moodMap[j.mood] || 50), 0);
-            moodScore = totalMood / dayJournals.length;
-          }
+        const { data: { session } } = await supabase.auth.getSession();
 
-          // Calculate Anxiety Score (Inverted: High Score = Low Anxiety = Good Wellness)
-          let anxietyScore = 50;
-          if (dayAssessments.length > 0) {
-            const totalAnxiety = dayAssessments.reduce((acc, a) => {
-              // Max score is 24. Normalize to 0-100. Invert.
-              return acc + (100 - ((a.score / 24) * 100));
-            }, 0);
-            anxietyScore = totalAnxiety / dayAssessments.length;
-          }
+        // Daily rollups are precomputed server-side
+        const response = await fetch(`/api/student/dashboard?user_id=${user.id}&days=7`, {
+          headers: session ? { 'Authorization': `Bearer ${session.access_token}` } : {}
+        });
+        if (!response.ok) throw new Error('Failed to fetch dashboard');
+        const { daily } = await response.json();
 
-          // Wellness Score
-          let dailyScore = lastScore;
-          if (dayJournals.length > 0 && dayAssessments.length > 0) {
-            dailyScore = (moodScore + anxietyScore) / 2;
-          } else if (dayJournals.length > 0) {
-            dailyScore = moodScore;
-          } else if (dayAssessments.length > 0) {
-            dailyScore = anxietyScore;
-          }
-
-          lastScore = dailyScore;
-
-          processedData.push({
-            name: dayName,
-            wellness: Math.round(dailyScore),
-          });
-        }
+        const days = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'];
+        const processedData = daily.map((d: any) => ({
+          name: days[new Date(`${d.day}T00:00:00Z`).getUTCDay()],
+          wellness: d.wellness,
+        }));
 
         setChartData(processedData);
         const todayVal = processedData[processedData.length - 1].wellness;
@@ -195,16 +143,60 @@ export const AIInterfaceStandalone: React.FC = () => {
     try {
       const response = await fetch("http://127.0.0.1:5000/chat", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ message: userMessageContent, model: "llama3" }) // model name optional
+        headers: { "Content-Type": "application/json", "Accept": "text/event-stream" },
+        body: JSON.stringify({ message: userMessageContent, model: "llama3", stream: true, session_id: chatSessionId.current }) // model name optional
       });
 
       if (!response.ok) throw new Error("Server error");
 
-      const data = await response.json();
-      const aiContent = data.reply || "No reply from AI";
-      const aiResponse = { role: "ai", content: aiContent };
-      setChatMessages(prev => [...prev, aiResponse]);
+      let aiContent = "";
+      const contentType = response.headers.get("Content-Type") || "";
+
+      if (response.body && contentType.includes("text/event-stream")) {
+        // Render the reply incrementally as tokens arrive
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let started = false;
+
+        while (true) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+
+          const events = buffer.split("\n\n");
+          buffer = events.pop() || "";
+
+          for (const event of events) {
+            if (!event.startsWith("data: ")) continue;
+            const chunk = JSON.parse(event.slice(6));
+            if (chunk.error) throw new Error(chunk.error);
+            if (chunk.session_id) chatSessionId.current = chunk.session_id;
+            if (!chunk.token) continue;
+
+            aiContent += chunk.token;
+            const partial = aiContent;
+            if (!started) {
+              started = true;
+              setIsTyping(false);
+              setChatMessages(prev => [...prev, { role: "ai", content: partial }]);
+            } else {
+              setChatMessages(prev => [...prev.slice(0, -1), { role: "ai", content: partial }]);
+            }
+          }
+        }
+
+        if (!started) {
+          aiContent = "No reply from AI";
+          setChatMessages(prev => [...prev, { role: "ai", content: aiContent }]);
+        }
+      } else {
+        const data = await response.json();
+        if (data.session_id) chatSessionId.current = data.session_id;
+        aiContent = data.reply || "No reply from AI";
+        const aiResponse = { role: "ai", content: aiContent };
+        setChatMessages(prev => [...prev, aiResponse]);
+      }
 
       // Save AI message
       saveMessage('ai', aiContent);
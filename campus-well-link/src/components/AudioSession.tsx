@@ -9,6 +9,8 @@ import {
 } from 'lucide-react';
 import { Badge } from '@/components/ui/badge';
 import { Alert, AlertDescription, AlertTitle } from '@/components/ui/alert';
+import { mediaUrl } from '@/lib/utils';
+import { supabase } from '@/integrations/supabase/client';
 
 interface AudioSessionProps {
     resource: any;
@@ -69,21 +71,29 @@ export const AudioSession: React.FC<AudioSessionProps> = ({ resource, onBack })
     const ambientRefs = useRef<Record<string, HTMLAudioElement | null>>({});
     const [currentTrack, setCurrentTrack] = useState(resource);
     const [currentTrackUrl, setCurrentTrackUrl] = useState(MAIN_TRACK_URL);
+    // Access token for remote audio served through /api/media
+    const mediaTokenRef = useRef<string | undefined>(undefined);
 
     // Initialize Ambient Sounds
     useEffect(() => {
-        AMBIENT_SOUNDS.forEach(sound => {
-            if (!ambientRefs.current[sound.id]) {
-                const audio = new Audio(sound.url);
-                audio.loop = true;
-                audio.volume = 0;
-                audio.preload = 'auto';
-                audio.onerror = (e) => console.error(`Error loading ambient sound ${sound.id}:`, e);
-                ambientRefs.current[sound.id] = audio;
-            }
+        let cancelled = false;
+        supabase.auth.getSession().then(({ data: { session } }) => {
+            if (cancelled) return;
+            mediaTokenRef.current = session?.access_token;
+            AMBIENT_SOUNDS.forEach(sound => {
+                if (!ambientRefs.current[sound.id]) {
+                    const audio = new Audio(mediaUrl(sound.url, mediaTokenRef.current));
+                    audio.loop = true;
+                    audio.volume = 0;
+                    audio.preload = 'auto';
+                    audio.onerror = (e) => console.error(`Error loading ambient sound ${sound.id}:`, e);
+                    ambientRefs.current[sound.id] = audio;
+                }
+            });
         });
 
         return () => {
+            cancelled = true;
             Object.values(ambientRefs.current).forEach(audio => {
                 if (audio) {
                     audio.pause();
@@ -192,7 +202,7 @@ export const AudioSession: React.FC<AudioSessionProps> = ({ resource, onBack })
     const handleTrackChange = (track: any) => {
         setIsPlaying(false);
         setCurrentTrack(track);
-        setCurrentTrackUrl(track.url);
+        setCurrentTrackUrl(mediaUrl(track.url, mediaTokenRef.current));
         setProgress(0);
         setCurrentTime(0);
         setError(null);
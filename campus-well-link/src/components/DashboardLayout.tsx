@@ -13,13 +13,18 @@ export const DashboardLayout: React.FC<DashboardLayoutProps> = ({ children, user
   const [sidebarOpen, setSidebarOpen] = useState(false);
 
   useEffect(() => {
+    // Heartbeat to the backend, which aggregates session time and writes it in bulk
     const interval = setInterval(async () => {
       const { data: { session } } = await supabase.auth.getSession();
       if (session) {
         try {
-          await supabase.rpc('increment_time_spent', { increment_amount: 1 });
+          await fetch('/api/time/heartbeat', {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${session.access_token}` },
+            keepalive: true
+          });
         } catch (error) {
-          console.error('Error incrementing time spent:', error);
+          console.error('Error sending time heartbeat:', error);
         }
       }
     }, 60000); // Run every minute
@@ -4,3 +4,13 @@ import { twMerge } from "tailwind-merge";
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs));
 }
+
+// Remote audio goes through the backend's caching proxy (/api/media), which
+// fetches each file once and serves it with Range support; local paths are unchanged.
+// The proxy needs the session's access token, passed in the query because
+// <audio> can't send headers.
+export function mediaUrl(url: string, accessToken?: string) {
+  if (!/^https?:\/\//i.test(url)) return url;
+  const token = accessToken ? `&access_token=${encodeURIComponent(accessToken)}` : '';
+  return `/api/media?url=${encodeURIComponent(url)}${token}`;
+}
@@ -38,6 +38,7 @@ export const AssessmentRunner = () => {
     const [answers, setAnswers] = useState<Record<string, any>>({});
     const [submitting, setSubmitting] = useState(false);
     const [result, setResult] = useState<any>(null);
+    const [analysisPending, setAnalysisPending] = useState(false);
 
     useEffect(() => {
         const fetchAssessment = async () => {
@@ -77,6 +78,37 @@ export const AssessmentRunner = () => {
         }
     };
 
+    const pollAnalysis = async (url: string, accessToken: string) => {
+        setAnalysisPending(true);
+        try {
+            await fetchAnalysis(url, accessToken);
+        } finally {
+            setAnalysisPending(false);
+        }
+    };
+
+    const fetchAnalysis = async (url: string, accessToken: string) => {
+        for (let attempt = 0; attempt < 10; attempt++) {
+            try {
+                const response = await fetch(`${url}?wait=20`, {
+                    headers: { 'Authorization': `Bearer ${accessToken}` }
+                });
+                if (!response.ok) return;
+
+                const status = await response.json();
+                if (status.status === 'done' || status.status === 'failed') {
+                    if (status.ai_analysis) {
+                        setResult((prev: any) => prev ? { ...prev, ai_analysis: status.ai_analysis } : prev);
+                    }
+                    return;
+                }
+            } catch (error) {
+                console.error('Error fetching AI analysis:', error);
+                return;
+            }
+        }
+    };
+
     const handleSubmit = async () => {
         if (!data) return;
         setSubmitting(true);
@@ -112,6 +144,11 @@ export const AssessmentRunner = () => {
             const resultData = await response.json();
             setResult(resultData.result);
 
+            // The AI summary is generated in the background; long-poll for it
+            if (resultData.analysis_status === 'pending' && resultData.analysis_url) {
+                pollAnalysis(resultData.analysis_url, session.access_token);
+            }
+
         } catch (error) {
             console.error('Submission error:', error);
             toast({
@@ -157,6 +194,13 @@ export const AssessmentRunner = () => {
                                 </div>
                             </div>
 
+                            {!result.ai_analysis && analysisPending && (
+                                <div className="flex items-center justify-center gap-2 text-sm text-muted-foreground">
+                                    <Loader2 className="w-4 h-4 animate-spin" />
+                                    Generating AI analysis...
+                                </div>
+                            )}
+
                             {result.ai_analysis && (
                                 <div className="bg-secondary/50 p-6 rounded-lg text-left space-y-4">
                                     <h3 className="font-semibold flex items-center gap-2">
@@ -23,6 +23,8 @@ export const StudentAssessments = () => {
 
     const [history, setHistory] = useState<any[]>([]);
     const [historyLoading, setHistoryLoading] = useState(true);
+    const [historyCursor, setHistoryCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
     useEffect(() => {
         const fetchData = async () => {
@@ -45,6 +47,7 @@ export const StudentAssessments = () => {
                     if (historyResponse.ok) {
                         const historyData = await historyResponse.json();
                         setHistory(historyData);
+                        setHistoryCursor(historyResponse.headers.get('X-Next-Cursor'));
                     }
                 }
             } catch (error) {
@@ -63,6 +66,29 @@ export const StudentAssessments = () => {
         fetchData();
     }, [toast]);
 
+    const loadMoreHistory = async () => {
+        if (!historyCursor) return;
+        setLoadingMore(true);
+        try {
+            const { data: { session } } = await supabase.auth.getSession();
+            if (!session?.user) return;
+            const response = await fetch(`/api/student/results?user_id=${session.user.id}&cursor=${historyCursor}`, {
+                headers: {
+                    'Authorization': `Bearer ${session.access_token}`
+                }
+            });
+            if (response.ok) {
+                const more = await response.json();
+                setHistory(prev => [...prev, ...more]);
+                setHistoryCursor(response.headers.get('X-Next-Cursor'));
+            }
+        } catch (error) {
+            console.error('Error fetching more history:', error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     return (
         <DashboardLayout userType="student">
             <div className="space-y-6">
@@ -150,6 +176,11 @@ export const StudentAssessments = () => {
                                         </div>
                                     </div>
                                 ))}
+                                {historyCursor && (
+                                    <Button variant="outline" className="w-full" onClick={loadMoreHistory} disabled={loadingMore}>
+                                        {loadingMore ? 'Loading...' : 'Load more'}
+                                    </Button>
+                                )}
                             </div>
                         ) : (
                             <p className="text-muted-foreground text-sm">
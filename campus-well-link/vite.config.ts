@@ -1,8 +1,44 @@
-import { defineConfig } from "vite";
+import { defineConfig, type Plugin } from "vite";
 import react from "@vitejs/plugin-react-swc";
 import path from "path";
+import fs from "fs";
+import zlib from "zlib";
 import { componentTagger } from "lovable-tagger";
 
+// Writes .br and .gz next to each compressible build file; the backend
+// (backend/static_assets.py) serves them so nothing is compressed per request.
+const COMPRESSIBLE = /\.(html|js|mjs|css|json|map|svg|txt|xml|ico|webmanifest)$/i;
+const MIN_COMPRESS_SIZE = 1024;
+
+function precompress(): Plugin {
+  let outDir = "dist";
+  return {
+    name: "precompress",
+    apply: "build",
+    configResolved(config) {
+      outDir = path.resolve(config.root, config.build.outDir);
+    },
+    closeBundle() {
+      const walk = (dir: string): string[] =>
+        fs.readdirSync(dir, { withFileTypes: true }).flatMap((entry) => {
+          const full = path.join(dir, entry.name);
+          return entry.isDirectory() ? walk(full) : [full];
+        });
+      for (const file of walk(outDir)) {
+        if (!COMPRESSIBLE.test(file)) continue;
+        const data = fs.readFileSync(file);
+        if (data.length < MIN_COMPRESS_SIZE) continue;
+        const br = zlib.brotliCompressSync(data, {
+          params: { [zlib.constants.BROTLI_PARAM_QUALITY]: zlib.constants.BROTLI_MAX_QUALITY },
+        });
+        const gz = zlib.gzipSync(data, { level: zlib.constants.Z_BEST_COMPRESSION });
+        if (br.length < data.length) fs.writeFileSync(`${file}.br`, br);
+        if (gz.length < data.length) fs.writeFileSync(`${file}.gz`, gz);
+      }
+    },
+  };
+}
+
 // https://vitejs.dev/config/
 export default defineConfig(({ mode }) => ({
   server: {
@@ -22,7 +58,7 @@ export default defineConfig(({ mode }) => ({
       },
     },
   },
-  plugins: [react()].filter(Boolean),
+  plugins: [react(), precompress()].filter(Boolean),
   resolve: {
     alias: {
       "@": path.resolve(__dirname, "./src"),
@@ -0,0 +1,35 @@
+-- Supporting changes for the counselor cohort analytics (/api/analytics/cohort/*).
+--
+-- 1. profiles.role decides who counts as staff, so users must not be able to
+--    change it themselves. The "Users can update own profile" policy allows
+--    updating the whole row; this trigger rejects role changes (and
+--    non-student roles on insert) made with a user's token. Roles are set from
+--    the SQL editor or with the service role.
+create or replace function public.protect_profile_role()
+returns trigger as $$
+begin
+  if coalesce(auth.role(), '') in ('authenticated', 'anon') then
+    if tg_op = 'INSERT' and new.role is distinct from 'student' then
+      raise exception 'New profiles must have role student';
+    end if;
+    if tg_op = 'UPDATE' and new.role is distinct from old.role then
+      raise exception 'profiles.role can only be changed by an administrator';
+    end if;
+  end if;
+  return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists protect_profile_role on profiles;
+create trigger protect_profile_role
+  before insert or update on profiles
+  for each row execute procedure public.protect_profile_role();
+
+-- 2. The export follows insertion order, not completed_at: bulk imports
+--    insert rows with an earlier completed_at, which a completed_at
+--    watermark would skip. Existing rows all get the time this runs.
+alter table user_assessments
+  add column if not exists created_at timestamp with time zone default timezone('utc'::text, now()) not null;
+
+create index if not exists idx_user_assessments_created_at_id
+  on user_assessments (created_at, id);
@@ -0,0 +1,169 @@
+-- Per-user daily rollups for the student dashboard.
+-- Maintained incrementally by triggers on journals, stress_assessments,
+-- user_assessments and user_activities, so the dashboard reads at most one
+-- small row per day instead of scanning raw history.
+
+create table if not exists user_daily_rollups (
+  user_id uuid references auth.users(id) on delete cascade not null,
+  day date not null,
+  journal_count integer not null default 0,
+  mood_score_sum numeric not null default 0,
+  journal_low_risk integer not null default 0,
+  journal_medium_risk integer not null default 0,
+  journal_high_risk integer not null default 0,
+  stress_count integer not null default 0,
+  stress_score_sum integer not null default 0,
+  assessment_count integer not null default 0,
+  assessment_high_risk integer not null default 0,
+  activity_count integer not null default 0,
+  updated_at timestamp with time zone default timezone('utc'::text, now()) not null,
+  primary key (user_id, day)
+);
+
+alter table user_daily_rollups enable row level security;
+
+drop policy if exists "Users can view their own rollups" on user_daily_rollups;
+create policy "Users can view their own rollups"
+  on user_daily_rollups for select
+  using (auth.uid() = user_id);
+
+-- Same mapping the dashboard chart used client-side
+create or replace function mood_score(mood text)
+returns numeric as $$
+  select case mood
+    when 'Great' then 100
+    when 'Good' then 75
+    when 'Okay' then 50
+    when 'Not Good' then 25
+    when 'Awful' then 0
+    else 50
+  end;
+$$ language sql immutable;
+
+create or replace function rollup_journal()
+returns trigger as $$
+begin
+  insert into user_daily_rollups (user_id, day, journal_count, mood_score_sum,
+                                  journal_low_risk, journal_medium_risk, journal_high_risk)
+  values (new.user_id, (new.created_at at time zone 'utc')::date, 1, mood_score(new.mood),
+          (new.risk_level = 'Low')::int, (new.risk_level = 'Medium')::int, (new.risk_level = 'High')::int)
+  on conflict (user_id, day) do update set
+    journal_count = user_daily_rollups.journal_count + 1,
+    mood_score_sum = user_daily_rollups.mood_score_sum + excluded.mood_score_sum,
+    journal_low_risk = user_daily_rollups.journal_low_risk + excluded.journal_low_risk,
+    journal_medium_risk = user_daily_rollups.journal_medium_risk + excluded.journal_medium_risk,
+    journal_high_risk = user_daily_rollups.journal_high_risk + excluded.journal_high_risk,
+    updated_at = timezone('utc'::text, now());
+  return new;
+end;
+$$ language plpgsql security definer;
+
+create or replace function rollup_stress_assessment()
+returns trigger as $$
+begin
+  insert into user_daily_rollups (user_id, day, stress_count, stress_score_sum)
+  values (new.user_id, (new.created_at at time zone 'utc')::date, 1, new.score)
+  on conflict (user_id, day) do update set
+    stress_count = user_daily_rollups.stress_count + 1,
+    stress_score_sum = user_daily_rollups.stress_score_sum + excluded.stress_score_sum,
+    updated_at = timezone('utc'::text, now());
+  return new;
+end;
+$$ language plpgsql security definer;
+
+create or replace function rollup_user_assessment()
+returns trigger as $$
+begin
+  insert into user_daily_rollups (user_id, day, assessment_count, assessment_high_risk)
+  values (new.user_id, (new.completed_at at time zone 'utc')::date, 1,
+          (new.risk_level in ('High', 'Severe', 'Moderately Severe'))::int)
+  on conflict (user_id, day) do update set
+    assessment_count = user_daily_rollups.assessment_count + 1,
+    assessment_high_risk = user_daily_rollups.assessment_high_risk + excluded.assessment_high_risk,
+    updated_at = timezone('utc'::text, now());
+  return new;
+end;
+$$ language plpgsql security definer;
+
+create or replace function rollup_user_activity()
+returns trigger as $$
+begin
+  insert into user_daily_rollups (user_id, day, activity_count)
+  values (new.user_id, (new.created_at at time zone 'utc')::date, 1)
+  on conflict (user_id, day) do update set
+    activity_count = user_daily_rollups.activity_count + 1,
+    updated_at = timezone('utc'::text, now());
+  return new;
+end;
+$$ language plpgsql security definer;
+
+drop trigger if exists on_journal_rollup on journals;
+create trigger on_journal_rollup
+  after insert on journals
+  for each row execute procedure rollup_journal();
+
+drop trigger if exists on_stress_assessment_rollup on stress_assessments;
+create trigger on_stress_assessment_rollup
+  after insert on stress_assessments
+  for each row execute procedure rollup_stress_assessment();
+
+drop trigger if exists on_user_assessment_rollup on user_assessments;
+create trigger on_user_assessment_rollup
+  after insert on user_assessments
+  for each row execute procedure rollup_user_assessment();
+
+drop trigger if exists on_user_activity_rollup on user_activities;
+create trigger on_user_activity_rollup
+  after insert on user_activities
+  for each row execute procedure rollup_user_activity();
+
+-- Backfill from existing history (safe to re-run: recomputes the counts
+-- derived from history). Rows are reset and upserted rather than truncated:
+-- other columns, such as time_spent_minutes from time_tracking.sql, are
+-- stored only here and can't be rebuilt.
+update user_daily_rollups set
+  journal_count = 0, mood_score_sum = 0,
+  journal_low_risk = 0, journal_medium_risk = 0, journal_high_risk = 0,
+  stress_count = 0, stress_score_sum = 0,
+  assessment_count = 0, assessment_high_risk = 0,
+  activity_count = 0;
+
+insert into user_daily_rollups (user_id, day, journal_count, mood_score_sum,
+                                journal_low_risk, journal_medium_risk, journal_high_risk)
+select user_id, (created_at at time zone 'utc')::date, count(*), sum(mood_score(mood)),
+       count(*) filter (where risk_level = 'Low'),
+       count(*) filter (where risk_level = 'Medium'),
+       count(*) filter (where risk_level = 'High')
+from journals
+group by 1, 2
+on conflict (user_id, day) do update set
+  journal_count = excluded.journal_count,
+  mood_score_sum = excluded.mood_score_sum,
+  journal_low_risk = excluded.journal_low_risk,
+  journal_medium_risk = excluded.journal_medium_risk,
+  journal_high_risk = excluded.journal_high_risk;
+
+insert into user_daily_rollups (user_id, day, stress_count, stress_score_sum)
+select user_id, (created_at at time zone 'utc')::date, count(*), sum(score)
+from stress_assessments
+group by 1, 2
+on conflict (user_id, day) do update set
+  stress_count = excluded.stress_count,
+  stress_score_sum = excluded.stress_score_sum;
+
+insert into user_daily_rollups (user_id, day, assessment_count, assessment_high_risk)
+select user_id, (completed_at at time zone 'utc')::date, count(*),
+       count(*) filter (where risk_level in ('High', 'Severe', 'Moderately Severe'))
+from user_assessments
+group by 1, 2
+on conflict (user_id, day) do update set
+  assessment_count = excluded.assessment_count,
+  assessment_high_risk = excluded.assessment_high_risk;
+
+insert into user_daily_rollups (user_id, day, activity_count)
+select user_id, (created_at at time zone 'utc')::date, count(*)
+from user_activities
+where user_id is not null
+group by 1, 2
+on conflict (user_id, day) do update set
+  activity_count = excluded.activity_count;
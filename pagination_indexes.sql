@@ -0,0 +1,6 @@
+-- Index for keyset pagination of student assessment history.
+-- /api/student/results pages user_assessments by (completed_at, id).
+-- /api/student/recent-activity pages user_activities by (created_at, id) and is
+-- already served by idx_user_activities_user_id_created_at.
+create index if not exists idx_user_assessments_user_id_completed_at
+  on user_assessments (user_id, completed_at desc, id desc);
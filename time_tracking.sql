@@ -0,0 +1,73 @@
+-- Batched time tracking.
+-- The backend's /api/time/heartbeat asks record_heartbeat() how much time a
+-- heartbeat is worth, accumulates it in memory and calls apply_time_deltas()
+-- on an interval with every user's whole minutes at once, instead of one
+-- increment_time_spent() UPDATE per user per minute.
+-- Requires add_time_tracking.sql (profiles.total_time_spent) and
+-- dashboard_rollups.sql (user_daily_rollups).
+
+-- Per-day minutes for reporting; served with the rest of the dashboard rollups.
+-- This column is the only record of per-day time, so the dashboard_rollups.sql
+-- backfill leaves it alone when re-run.
+alter table user_daily_rollups add column if not exists time_spent_minutes integer not null default 0;
+
+-- deltas: [{"user_id": uuid, "day": "YYYY-MM-DD", "minutes": int}, ...]
+-- With the service role every row is applied; with a user's token only that
+-- user's rows are.
+create or replace function apply_time_deltas(deltas jsonb)
+returns void as $$
+  with d as (
+    select d.user_id, d.day, sum(d.minutes)::int as minutes
+    from jsonb_to_recordset(deltas) as d(user_id uuid, day date, minutes int)
+    where d.minutes > 0
+      and (auth.role() = 'service_role' or d.user_id = auth.uid())
+    group by d.user_id, d.day
+  ), daily as (
+    insert into user_daily_rollups (user_id, day, time_spent_minutes)
+    select user_id, day, minutes from d
+    on conflict (user_id, day) do update set
+      time_spent_minutes = user_daily_rollups.time_spent_minutes + excluded.time_spent_minutes,
+      updated_at = timezone('utc'::text, now())
+  )
+  -- One UPDATE for the whole flush instead of one per user per minute
+  update profiles p
+  set total_time_spent = coalesce(p.total_time_spent, 0) + t.minutes
+  from (select user_id, sum(minutes)::int as minutes from d group by user_id) t
+  where p.id = t.user_id;
+$$ language sql security definer;
+
+revoke all on function apply_time_deltas(jsonb) from public, anon;
+grant execute on function apply_time_deltas(jsonb) to authenticated, service_role;
+
+-- Time of each user's latest heartbeat, whichever backend worker received it.
+-- Only record_heartbeat() touches it.
+create table if not exists time_heartbeats (
+  user_id uuid primary key references auth.users(id) on delete cascade,
+  last_heartbeat timestamptz not null
+);
+alter table time_heartbeats enable row level security;
+
+-- Seconds to credit for a heartbeat arriving now: the time since the user's
+-- previous one, capped at max_seconds. Heartbeats from two tabs therefore
+-- share the time between them. The first heartbeat of a session (none in the
+-- last two intervals) credits nothing.
+create or replace function record_heartbeat(p_user_id uuid, max_seconds int)
+returns double precision as $$
+declare
+  previous timestamptz;
+begin
+  if auth.role() <> 'service_role' and p_user_id is distinct from auth.uid() then
+    raise exception 'not allowed' using errcode = '42501';
+  end if;
+  select last_heartbeat into previous from time_heartbeats where user_id = p_user_id for update;
+  insert into time_heartbeats (user_id, last_heartbeat) values (p_user_id, now())
+  on conflict (user_id) do update set last_heartbeat = greatest(time_heartbeats.last_heartbeat, excluded.last_heartbeat);
+  if previous is null or now() - previous > make_interval(secs => 2 * max_seconds) then
+    return 0;
+  end if;
+  return least(greatest(extract(epoch from now() - previous), 0), max_seconds);
+end;
+$$ language plpgsql security definer;
+
+revoke all on function record_heartbeat(uuid, int) from public, anon;
+grant execute on function record_heartbeat(uuid, int) to authenticated, service_role;